@@ -1,435 +1,1523 @@
-from flask import Flask, request, jsonify
+import argparse
+import base64
+import cProfile
+import functools
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, Request, g, request, jsonify, Response, send_file, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import numpy as np
+
+import apsp
+import batch
+from cache import ResultCache, cache_key
+import closure as closure_engine
+from dag import CycleError, DynamicDAG
+import executor
+import frames as frame_store
+import intervals
+import knapsack as knapsack_engine
+import mst as mst_engine
+import opcount
+import recurrence
+import scheduler
+import spool
+from sessions import SessionStore
+import spt
+import timing
+import tracing
+import wire
+from graph import parse_graph
+
+class AnalyserRequest(Request):
+    # Bodies may also be wire.ARRAYS / wire.MSGPACK, and gzip-compressed
+    def get_json(self, force=False, silent=False, cache=True):
+        with timing.phase(g.get('timer'), 'parse'):
+            return self._decode_json(force, silent, cache)
+
+    def _decode_json(self, force, silent, cache):
+        if not wire.is_binary(self.mimetype) and self.content_encoding != 'gzip':
+            return super().get_json(force, silent, cache)
+        if cache and hasattr(self, '_decoded_body'):
+            return self._decoded_body
+        try:
+            data = self.get_data(cache=cache)
+            if self.content_encoding == 'gzip':
+                data = gzip.decompress(data)
+            body = wire.decode(self.mimetype if wire.is_binary(self.mimetype) else wire.JSON, data)
+        except Exception as e:
+            if silent:
+                return None
+            return self.on_json_loading_failed(e)
+        if cache:
+            self._decoded_body = body
+        return body
+
+class AnalyserJSONProvider(DefaultJSONProvider):
+    # jsonify() answers in the format picked by the Accept header (see wire.py);
+    # NumPy arrays and scalars in a payload become lists and numbers in JSON
+    @staticmethod
+    def default(o):
+        if isinstance(o, np.ndarray):
+            return o.tolist()
+        if isinstance(o, np.generic):
+            return o.item()
+        return DefaultJSONProvider.default(o)
+
+    def response(self, *args, **kwargs):
+        if g.get('profiler') is not None and len(args) == 1 and isinstance(args[0], dict):
+            args = (dict(args[0], profile=finish_profile()),)
+        with g.timer.phase('serialize'):
+            fmt = response_format()
+            if fmt == wire.JSON:
+                return super().response(*args, **kwargs)
+            payload = args[0] if len(args) == 1 else (args or kwargs)
+            return self._app.response_class(wire.encode(fmt, payload), mimetype=fmt)
 
 app = Flask(__name__)
+app.request_class = AnalyserRequest
+app.json = AnalyserJSONProvider(app)
 CORS(app)
 
-def merge_sort_steps(arr):
-    steps = []
-    def ms(a, l, r, depth=0):
-        if l < r:
-            m = (l + r) // 2
-            steps.append(f"{'  '*depth}Dividing: {a[l:r+1]}")
-            ms(a, l, m, depth+1)
-            ms(a, m+1, r, depth+1)
-            left = a[l:m+1]
-            right = a[m+1:r+1]
-            i = j = 0
-            k = l
-            steps.append(f"{'  '*depth}Merging: {left} and {right}")
-            while i < len(left) and j < len(right):
-                steps.append(f"{'  '*depth}Compare {left[i]} and {right[j]}")
-                if left[i] < right[j]:
-                    a[k] = left[i]
-                    steps.append(f"{'  '*depth}Insert {left[i]} at position {k}")
-                    i += 1
-                else:
-                    a[k] = right[j]
-                    steps.append(f"{'  '*depth}Insert {right[j]} at position {k}")
-                    j += 1
-                k += 1
-            while i < len(left):
-                a[k] = left[i]
-                steps.append(f"{'  '*depth}Insert {left[i]} at position {k}")
-                i += 1
-                k += 1
-            while j < len(right):
-                a[k] = right[j]
-                steps.append(f"{'  '*depth}Insert {right[j]} at position {k}")
-                j += 1
-                k += 1
-            steps.append(f"{'  '*depth}After merge: {a[l:r+1]}")
-    arr_copy = arr[:]
-    ms(arr_copy, 0, len(arr_copy)-1)
-    steps.append(f"Sorted array: {arr_copy}")
-    return steps
+# Responses of at least GZIP_MIN_BYTES are gzipped for clients that accept it (0: never)
+GZIP_MIN_BYTES = int(os.environ.get('ANALYSER_GZIP_MIN_BYTES', 1024 * 1024))
+GZIP_LEVEL = int(os.environ.get('ANALYSER_GZIP_LEVEL', 1))
 
-def quick_sort_steps(arr, pivot_strategy='last', pivot_index=None):
-    steps = []
-    def qs(a, l, r, depth=0):
-        if l < r:
-            # Handle pivot selection as per strategy
-            if pivot_strategy == 'first':
-                a[l], a[r] = a[r], a[l]
-                steps.append(f"{'  '*depth}Pivot strategy: first element (index {l})")
-            elif pivot_strategy == 'random':
-                import random
-                idx = random.randint(l, r)
-                a[idx], a[r] = a[r], a[idx]
-                steps.append(f"{'  '*depth}Pivot strategy: random element (index {idx})")
-            elif pivot_strategy == 'custom' and pivot_index is not None and l <= pivot_index <= r:
-                a[pivot_index], a[r] = a[r], a[pivot_index]
-                steps.append(f"{'  '*depth}Pivot strategy: custom index {pivot_index}")
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_CHUNK_LINES = 256
+
+BENCHMARK_BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'backend', 'baselines')
+
+result_cache = ResultCache(
+    max_bytes=int(os.environ.get('ANALYSER_CACHE_BYTES', 64 * 1024 * 1024)),
+    ttl=float(os.environ.get('ANALYSER_CACHE_TTL', 0)),
+)
+
+dag_sessions = SessionStore(
+    max_sessions=int(os.environ.get('ANALYSER_DAG_SESSIONS', 256)),
+    ttl=float(os.environ.get('ANALYSER_DAG_SESSION_TTL', 3600)),
+)
+
+# Each APSP session holds two n x n float64 matrices, so keep fewer of them
+apsp_sessions = SessionStore(
+    max_sessions=int(os.environ.get('ANALYSER_APSP_SESSIONS', 16)),
+    ttl=float(os.environ.get('ANALYSER_APSP_SESSION_TTL', 3600)),
+)
+
+# Binary matrices uploaded to /api/matrices and the results computed from them, as
+# .npy files that the workers memory-map (see spool.py)
+matrix_spool = spool.Spool(
+    os.environ.get('ANALYSER_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'analyser-spool')),
+    max_bytes=int(float(os.environ.get('ANALYSER_SPOOL_BYTES', 8 * 2**30))),
+    ttl=float(os.environ.get('ANALYSER_SPOOL_TTL', 3600)),
+)
+
+# Algorithm work runs in this pool of pre-warmed processes (ANALYSER_WORKERS=0 runs
+# it inline on the request thread, without timeouts). Requests may lower the time
+# limits with `timeout` / `cpu_timeout`, but not raise them.
+worker_pool = executor.WorkerPool(
+    size=int(os.environ.get('ANALYSER_WORKERS', os.cpu_count() or 1)),
+    preload=('numpy', 'apsp', 'closure', 'frames', 'graph', 'intervals', 'knapsack', 'mst', 'opcount', 'recurrence', 'spool', 'tracing'),
+)
+TASK_TIMEOUT = float(os.environ.get('ANALYSER_TASK_TIMEOUT', 60))
+TASK_CPU_TIMEOUT = float(os.environ.get('ANALYSER_TASK_CPU_TIMEOUT', 60))
+
+# Admission control (scheduler.py): a request whose estimated run time is over
+# COST_BUDGET seconds gets 413, one whose trace would exceed TRACE_LIMIT lines is
+# answered result-only, and past QUEUE_BUDGET seconds of waiting work new requests
+# get 429. Pool slots go to the shortest estimated job first. 0 disables a limit.
+COST_BUDGET = float(os.environ.get('ANALYSER_COST_BUDGET', 60)) * 1e9
+TRACE_LIMIT = int(os.environ.get('ANALYSER_TRACE_LIMIT', 2_000_000))
+job_scheduler = scheduler.Scheduler(worker_pool.size, float(os.environ.get('ANALYSER_QUEUE_BUDGET', 300)) * 1e9)
+
+BATCH_LIMIT = int(os.environ.get('ANALYSER_BATCH_LIMIT', 10000))
+
+# Dijkstra shortest-path trees, by content hash of (graph, source), for path queries
+spt_trees = SessionStore(
+    max_sessions=int(os.environ.get('ANALYSER_SPT_TREES', 1024)),
+    ttl=float(os.environ.get('ANALYSER_SPT_TREE_TTL', 3600)),
+)
+
+# Floyd-Warshall / Warshall frame logs (include=frames), by content hash of the request,
+# for the frame seek endpoints; each holds up to FRAME_CHECKPOINT_BYTES of checkpoints
+# plus its deltas, so keep few
+frame_logs = SessionStore(
+    max_sessions=int(os.environ.get('ANALYSER_FRAME_LOGS', 8)),
+    ttl=float(os.environ.get('ANALYSER_FRAME_LOG_TTL', 3600)),
+)
+FRAME_CHECKPOINT_BYTES = int(float(os.environ.get('ANALYSER_FRAME_CHECKPOINT_BYTES', frame_store.CHECKPOINT_BYTES)))
+
+# Per-endpoint request metrics for GET /metrics (timing.py); profile=1 responses list
+# the PROFILE_TOP most expensive functions of the request thread and of each worker
+# task, from a deterministic cProfile of the whole request (every call, not a sample)
+metrics = timing.Metrics()
+metrics.counter('analyser_requests_total', 'Requests by endpoint, method and status.')
+metrics.histogram('analyser_request_seconds', 'Wall time of a request, until its response is built (streams: sent).', timing.SECONDS)
+metrics.histogram('analyser_phase_seconds', 'Wall time of a request phase (see Server-Timing).', timing.SECONDS)
+metrics.histogram('analyser_request_bytes', 'Size of the request body.', timing.BYTES)
+metrics.histogram('analyser_response_bytes', 'Size of the response body as sent (not measured for streams).', timing.BYTES)
+metrics.histogram('analyser_trace_lines', 'Steps or events in a traced response.', timing.LINES)
+PROFILE_TOP = int(os.environ.get('ANALYSER_PROFILE_TOP', timing.PROFILE_TOP))
+
+def collect_steps(gen):
+    # Drain a step generator, returning (steps, value returned by the generator)
+    returned = []
+    def drain():
+        returned.append((yield from gen))
+    steps = list(drain())
+    return steps, returned[0]
+
+def collect_trace(make_gen, *args):
+    # collect_steps for a generator built in a worker (generators cannot be pickled)
+    return collect_steps(make_gen(*args))
+
+def task_timeout(data, name, limit):
+    # The request's own limit in seconds (query or body), capped at the server's
+    value = request_option(data, name)
+    if value is None:
+        return limit
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        seconds = None
+    if seconds is None or isinstance(value, bool) or not seconds > 0:
+        raise ValueError(f'{name} must be a positive number of seconds.')
+    return min(seconds, limit)
+
+def compute(func, *args, phase='compute'):
+    # func(*args) in the worker pool, under the request's time limits; the response is
+    # still built and serialized on the request thread. Requests wait for a pool slot
+    # in order of their estimated cost (see admitted). phase names the run in
+    # Server-Timing ('trace' when it also builds the steps).
+    if not worker_pool.enabled:
+        with g.timer.phase(phase):
+            return func(*args)
+    limits = g.limits
+    if g.get('profiler') is None:
+        return run_task(func, args, g.get('cost', 0), *limits, timer=g.timer, phase=phase)
+    profiled = functools.partial(timing.profiled, top=PROFILE_TOP)
+    result, profile = run_task(profiled, (func,) + args, g.get('cost', 0), *limits, timer=g.timer, phase=phase)
+    g.worker_profiles.append(profile)
+    return result
+
+def run_task(func, args, cost, timeout, cpu_timeout, timer=None, phase='compute'):
+    waited = time.perf_counter()
+    if not job_scheduler.acquire(cost, timeout):
+        raise executor.PoolBusy('All workers are busy; try again later.')
+    if timer is not None:
+        timer.add('queue', time.perf_counter() - waited)
+    try:
+        with timing.phase(timer, phase):
+            return worker_pool.run(func, *args, timeout=timeout, cpu_timeout=cpu_timeout)
+    finally:
+        job_scheduler.release()
+
+def compute_chunks(func, chunks, *args):
+    # [func(chunk, *args) for chunk in chunks], with the chunks running on the pool's
+    # workers at the same time; each one gets its share of the request's cost
+    if not worker_pool.enabled or len(chunks) <= 1:
+        return [compute(func, chunk, *args) for chunk in chunks]
+    cost = g.get('cost', 0) / len(chunks)
+    limits = g.limits
+    with g.timer.phase('compute'), ThreadPoolExecutor(len(chunks)) as threads:
+        return list(threads.map(lambda chunk: run_task(func, (chunk,) + args, cost, *limits), chunks))
+
+def compute_each(func, items, *args):
+    # func(item_chunk, *args) over batch.split chunks of items, flattened back in order
+    chunks = batch.split(items, max(1, worker_pool.size))
+    return [out for chunk in compute_chunks(func, chunks, *args) for out in chunk]
+
+def error_response(e):
+    # 429 when too much work is queued, 503 when no worker came free in time,
+    # 504 when the task hit its time limit
+    if isinstance(e, scheduler.QueueFull):
+        return jsonify({'error': str(e)}), 429, {'Retry-After': str(e.retry_after)}
+    if isinstance(e, executor.PoolBusy):
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+    if isinstance(e, executor.TaskTimeout):
+        return jsonify({'error': str(e), 'limit': e.limit, 'seconds': e.seconds}), 504
+    return jsonify({'error': str(e)}), 500
+
+def admitted(estimate):
+    # Price the request with estimate(options) from scheduler.py before it runs. Over
+    # COST_BUDGET it is refused with 413; with a trace over TRACE_LIMIT lines it runs
+    # result-only (X-Downgraded: result-only), or is refused if it sent downgrade=0.
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                return view(*args, **kwargs)
+            est = estimate(dict(data, **request.args))
+            g.downgraded = bool(TRACE_LIMIT) and est.trace > TRACE_LIMIT
+            if g.downgraded:
+                if request_option(data, 'downgrade') in ('0', 0, False, 'false', 'no'):
+                    return over_budget(f'The trace would hold about {est.trace} lines, over the limit of {TRACE_LIMIT}.', est)
+                est = est.result_only()
+            if COST_BUDGET and est.total > COST_BUDGET:
+                return over_budget(f'Estimated run time {est.seconds:.3g} s is over the budget of {COST_BUDGET / 1e9:g} s.', est)
+            g.cost = est.total
+            response = app.make_response(view(*args, **kwargs))
+            if g.downgraded:
+                response.headers['X-Downgraded'] = 'result-only'
+            return response
+        return wrapper
+    return decorate
+
+def over_budget(message, est):
+    return jsonify({'error': message, 'estimated_seconds': est.seconds, 'trace_lines': est.trace}), 413
+
+def downgraded():
+    return g.get('downgraded', False)
+
+def with_steps(payload, steps):
+    if steps is not None:
+        payload['steps'] = steps
+    return payload
+
+def trace_result(make_gen, *args):
+    # Run a step generator for its result alone, keeping none of the steps
+    gen = make_gen(*args)
+    while True:
+        try:
+            next(gen)
+        except StopIteration as stop:
+            return stop.value
+
+def run_trace(make_gen, *args):
+    # (steps, result) of make_gen(*args); steps is None when the request was downgraded
+    if downgraded():
+        return None, compute(trace_result, make_gen, *args)
+    steps, result = compute(collect_trace, make_gen, *args, phase='trace')
+    g.timer.lines = len(steps)
+    return steps, result
+
+def response_format():
+    return request.accept_mimetypes.best_match(wire.formats(), default=wire.JSON)
+
+def binary_response():
+    # Matrices can then stay NumPy arrays all the way to the encoder
+    return wire.is_binary(response_format()) and not wants_stream()
+
+def profiling():
+    return request.args.get('profile', '').lower() in ('1', 'true', 'yes')
+
+@app.before_request
+def start_timer():
+    g.timer = timing.Timer()
+    g.profiler = None
+    if profiling():
+        g.worker_profiles = []
+        g.profiler = cProfile.Profile()
+        try:
+            g.profiler.enable()
+        except ValueError:
+            # Another request's profiler is running (one per process on Python 3.12+)
+            g.profiler = None
+
+@app.before_request
+def read_options():
+    # timeout / cpu_timeout and checkpoint_every are checked up front, so a bad one is
+    # a 400 before any work
+    # (the endpoints that read the raw body as a stream take them from the query string)
+    raw = request.endpoint in ('api_matrices', 'api_activity_selection_stream')
+    data = {} if raw else request.get_json(silent=True)
+    data = data if isinstance(data, dict) else {}
+    try:
+        g.limits = task_timeout(data, 'timeout', TASK_TIMEOUT), task_timeout(data, 'cpu_timeout', TASK_CPU_TIMEOUT)
+        g.checkpoint_every = positive_int_option(data, 'checkpoint_every')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+def finish_profile():
+    # profile=1: the request thread's profile so far and the profiles of its worker tasks
+    g.profiler.disable()
+    payload = {'request': timing.summary(g.profiler, PROFILE_TOP), 'workers': g.worker_profiles}
+    g.profiler = None
+    return payload
+
+def record_request(timer, endpoint, method, status, request_bytes, response_bytes):
+    labels = {'endpoint': endpoint}
+    metrics.inc('analyser_requests_total', dict(labels, method=method, status=str(status)))
+    metrics.observe('analyser_request_seconds', labels, timer.elapsed())
+    for name, seconds in timer.phases.items():
+        metrics.observe('analyser_phase_seconds', dict(labels, phase=name), seconds)
+    if request_bytes is not None:
+        metrics.observe('analyser_request_bytes', labels, request_bytes)
+    if response_bytes is not None:
+        metrics.observe('analyser_response_bytes', labels, response_bytes)
+    if timer.lines is not None:
+        metrics.observe('analyser_trace_lines', labels, timer.lines)
+
+@app.after_request
+def finish_timer(response):
+    # Server-Timing for every response (a stream's covers what ran before its first
+    # line); the metrics are recorded once the response is complete
+    timer = g.get('timer')
+    if timer is None:
+        return response
+    if g.get('profiler') is not None:
+        g.profiler.disable()
+    response.headers['Server-Timing'] = timer.header()
+    response.headers['Timing-Allow-Origin'] = '*'
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    args = (timer, endpoint, request.method, response.status_code, request.content_length)
+    if response.is_streamed:
+        response.call_on_close(lambda: record_request(*args, None))
+    else:
+        record_request(*args, response.content_length)
+    return response
+
+@app.after_request
+def compress_response(response):
+    if not GZIP_MIN_BYTES or response.is_streamed or response.direct_passthrough:
+        return response
+    if 'Content-Encoding' in response.headers or 'gzip' not in request.accept_encodings:
+        return response
+    if response.mimetype not in wire.formats() or (response.content_length or 0) < GZIP_MIN_BYTES:
+        return response
+    with g.timer.phase('gzip'):
+        response.set_data(gzip.compress(response.get_data(), GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def wants_stream():
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return NDJSON_MIMETYPE in request.headers.get('Accept', '')
+
+def request_option(data, name, default=None):
+    # Options can be given in the query string or in the JSON body
+    if name in request.args:
+        return request.args[name]
+    return data.get(name, default)
+
+def request_flag(data, name):
+    return str(request_option(data, name, '')).lower() in ('1', 'true', 'yes')
+
+def positive_int_option(data, name, default=None):
+    # An option that must be a positive integer when given; ValueError otherwise
+    value = request_option(data, name)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not (isinstance(value, int) or str(value).strip().isdigit()) or int(value) < 1:
+        raise ValueError(f'{name} must be a positive integer.')
+    return int(value)
+
+def wants_events(data):
+    return request_option(data, 'trace') == 'events' and not downgraded()
+
+def checkpoint_every():
+    # The events' checkpoint interval or the frame log's (None: the default), read in read_options
+    return g.checkpoint_every
+
+def requested_outputs(data, available, optional=()):
+    # include=tree,steps picks which trace outputs to build (default: all of them, but
+    # not the optional ones); include=result, or any list without them, is a
+    # result-only call
+    value = request_option(data, 'include')
+    if downgraded():
+        return set()
+    if value is None:
+        return set(available)
+    names = value if isinstance(value, list) else str(value).split(',')
+    return {name.strip() for name in names} & (set(available) | set(optional))
+
+def trace_key(data, include):
+    # Which lines a traced run yields: events, steps, or none
+    if wants_events(data):
+        return 'event'
+    return 'step' if 'steps' in include else None
+
+def count_ops(data, kernel, *args):
+    # metrics=1 adds operation counts to the usual response, metrics=only returns just the
+    # result and the counts (no trace). Either way the counting kernel from opcount runs;
+    # without the option this is (None, None) and nothing is counted.
+    if not (metrics_only(data) or request_flag(data, 'metrics')):
+        return None, None
+    return compute(kernel, *args)
+
+def metrics_only(data):
+    return request_option(data, 'metrics') == 'only'
+
+def with_metrics(finish, counts):
+    # Wrap a function returning a response payload so the payload also carries the counts
+    if counts is None:
+        return finish
+    return lambda *args: dict(finish(*args), metrics=counts)
+
+def cached_endpoint(view):
+    # Serve repeated (endpoint, body, options) requests from result_cache. Streams,
+    # cache=0 requests and unseeded random pivots always run the algorithm, and so does
+    # a hit naming a tree or frame log that has since left its store (see keep_session).
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        data = request.get_json(silent=True)
+        if not result_cache.enabled or not isinstance(data, dict) or wants_stream():
+            return view(*args, **kwargs)
+        if request_option(data, 'cache') in ('0', 0, False, 'false', 'no'):
+            return view(*args, **kwargs)
+        if 'matrix_id' in data:
+            # The result lives in the spool, which expires on its own schedule
+            return view(*args, **kwargs)
+        if profiling():
+            return view(*args, **kwargs)
+        if data.get('pivot_strategy') == 'random' and data.get('seed') is None:
+            return view(*args, **kwargs)
+        options = {k: v for k, v in request.args.items() if k != 'cache'}
+        key = cache_key(request.path, data, dict(options, format=response_format()))
+        hit = result_cache.get(key)
+        if hit is not None and all(store.get(session_id) is not None for store, session_id in hit[4]):
+            body, status, mimetype, _, _ = hit
+            response = app.response_class(body, status=status, mimetype=mimetype)
+            response.headers['X-Cache'] = 'HIT'
+            return response
+        response = app.make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            result_cache.put(key, response.get_data(), response.status_code, response.mimetype, g.get('session_refs', ()))
+        response.headers['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+@app.route('/api/cache', methods=['GET', 'DELETE'])
+def api_cache():
+    if request.method == 'DELETE':
+        result_cache.clear()
+    return jsonify(result_cache.stats())
+
+@app.route('/api/workers', methods=['GET'])
+def api_workers():
+    payload = dict(worker_pool.stats(), timeout=TASK_TIMEOUT, cpu_timeout=TASK_CPU_TIMEOUT)
+    payload['scheduler'] = dict(job_scheduler.stats(), cost_budget=COST_BUDGET / 1e9, trace_limit=TRACE_LIMIT)
+    return jsonify(payload)
+
+@app.route('/metrics', methods=['GET'])
+def api_metrics():
+    # Prometheus text format: the request metrics, plus the pool's, scheduler's and
+    # result cache's counters as gauges
+    def gauges(name, help, stats):
+        return name, help, [({'stat': k}, v) for k, v in stats.items() if isinstance(v, (int, float))]
+    body = metrics.render([
+        gauges('analyser_workers', 'Worker pool counters (see /api/workers).', worker_pool.stats()),
+        gauges('analyser_scheduler', 'Admission scheduler counters (see /api/workers).', job_scheduler.stats()),
+        gauges('analyser_result_cache', 'Result cache counters.', result_cache.stats()),
+    ])
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+def streamed_task(make_gen, args):
+    # The items of make_gen(*args) in lists, as a worker sends them, under the request's
+    # limits and pool slot; returns the generator's result. Inline when the pool is off.
+    if not worker_pool.enabled:
+        gen = make_gen(*args)
+        while True:
+            try:
+                item = next(gen)
+            except StopIteration as stop:
+                return stop.value
+            yield [item]
+    timeout, cpu_timeout = g.limits
+    if not job_scheduler.acquire(g.get('cost', 0), timeout):
+        raise executor.PoolBusy('All workers are busy; try again later.')
+    try:
+        task = worker_pool.stream(make_gen, *args, timeout=timeout, cpu_timeout=cpu_timeout, chunk=STREAM_CHUNK_LINES)
+        return (yield from task)
+    finally:
+        job_scheduler.release()
+
+def stream_error(e):
+    # The last line of a stream that failed part way (the status is already sent)
+    if isinstance(e, executor.TaskTimeout):
+        return {'error': str(e), 'limit': e.limit, 'seconds': e.seconds}
+    return {'error': str(e)}
+
+def stream_steps(make_gen, args, finish, key='step'):
+    # One JSON object per line: {key: ...} for every step of make_gen(*args), run in a
+    # worker like compute(), then finish(result) as the last line; a downgraded request
+    # gets only the last line
+    timer = g.timer
+    def generate():
+        buf = []
+        task = None
+        try:
+            if downgraded():
+                final = finish(compute(trace_result, make_gen, *args))
             else:
-                steps.append(f"{'  '*depth}Pivot strategy: last element (index {r})")
-            pivot = a[r]
-            i = l - 1
-            steps.append(f"{'  '*depth}Partitioning: {a[l:r+1]}, pivot={pivot}")
-            for j in range(l, r):
-                steps.append(f"{'  '*depth}Compare a[{j}]={a[j]} with pivot={pivot}")
-                if a[j] <= pivot:
-                    i += 1
-                    a[i], a[j] = a[j], a[i]
-                    steps.append(f"{'  '*depth}Swap a[{i}] and a[{j}]: {a}")
-            a[i+1], a[r] = a[r], a[i+1]
-            steps.append(f"{'  '*depth}Swap a[{i+1}] and a[{r}]: {a}")
-            pi = i+1
-            steps.append(f"{'  '*depth}Pivot {pivot} placed at index {pi}")
-            qs(a, l, pi-1, depth+1)
-            qs(a, pi+1, r, depth+1)
-    arr_copy = arr[:]
-    qs(arr_copy, 0, len(arr_copy)-1)
-    steps.append(f"Sorted array: {arr_copy}")
-    return steps
+                task = streamed_task(make_gen, args)
+                while True:
+                    try:
+                        lines = next(task)
+                    except StopIteration as stop:
+                        final = finish(stop.value)
+                        break
+                    timer.lines = (timer.lines or 0) + len(lines)
+                    buf.extend(json.dumps({key: line}) for line in lines)
+                    if len(buf) >= STREAM_CHUNK_LINES:
+                        buf.append('')
+                        yield '\n'.join(buf)
+                        buf = []
+        except Exception as e:
+            final = stream_error(e)
+        finally:
+            if task is not None:
+                task.close()
+        buf.append(json.dumps(final))
+        buf.append('')
+        yield '\n'.join(buf)
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
 
-def merge_sort_tree(arr):
-    def ms(a, l, r):
-        node = {'range': [l, r], 'array': a[l:r+1]}
-        if l < r:
-            m = (l + r) // 2
-            node['left'] = ms(a, l, m)
-            node['right'] = ms(a, m+1, r)
-            merged = []
-            left = a[l:m+1]
-            right = a[m+1:r+1]
-            i = j = 0
-            while i < len(left) and j < len(right):
-                if left[i] < right[j]:
-                    merged.append(left[i])
-                    i += 1
-                else:
-                    merged.append(right[j])
-                    j += 1
-            while i < len(left):
-                merged.append(left[i])
+def stream_result(payload):
+    # A result computed up front, as the one-line stream a streaming request expects
+    return Response(json.dumps(payload) + '\n', mimetype=NDJSON_MIMETYPE)
+
+def trace_response(make_gen, args, finish, key):
+    # Serve the step/event generator make_gen(*args) either streamed or as
+    # {key + 's': [...], **finish(result)}; with key=None the generator yields nothing and
+    # only its result is sent. Streams are relayed from the worker as it runs.
+    if wants_stream():
+        return stream_steps(make_gen, args, finish, key=key or 'step')
+    lines, result = compute(collect_trace, make_gen, *args, phase='trace' if key else 'compute')
+    payload = finish(result)
+    if key:
+        payload[key + 's'] = lines
+        g.timer.lines = len(lines)
+    return jsonify(payload)
+
+def batch_endpoint(prepare, func, finish, run=batch.run_each, with_input=False):
+    # {"inputs": [body, ...]}: prepare(body) checks one input and returns the args for
+    # func (a ValueError is that item's error); the items run result-only across the
+    # workers, and finish(value) (finish(body, value) with_input) is each item's
+    # payload. Results keep the input order.
+    data = request.get_json(silent=True) or {}
+    inputs = data.get('inputs')
+    if not isinstance(inputs, list):
+        return jsonify({'error': 'Input must be {"inputs": [...]}, one request body per item.'}), 400
+    if BATCH_LIMIT and len(inputs) > BATCH_LIMIT:
+        return jsonify({'error': f'A batch holds at most {BATCH_LIMIT} inputs.'}), 413
+    results = [None] * len(inputs)
+    jobs = []
+    for i, item in enumerate(inputs):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('Each input must be an object.')
+            jobs.append((i, prepare(item)))
+        except ValueError as e:
+            results[i] = {'error': str(e)}
+    try:
+        done = compute_each(run, [args for _, args in jobs], func)
+    except Exception as e:
+        return error_response(e)
+    for (i, _), (ok, value) in zip(jobs, done):
+        if not ok:
+            results[i] = {'error': value}
+        else:
+            results[i] = finish(inputs[i], value) if with_input else finish(value)
+    return jsonify({'results': results, 'errors': sum('error' in r for r in results)})
+
+def batch_array(item):
+    arr = item.get('array')
+    if not isinstance(arr, list):
+        raise ValueError('Input must be a list.')
+    return arr
+
+def merge_sort(a):
+    if len(a) <= 1:
+        return a
+    m = len(a) // 2
+    L = merge_sort(a[:m])
+    R = merge_sort(a[m:])
+    res = []
+    i = j = 0
+    while i < len(L) and j < len(R):
+        if L[i] < R[j]:
+            res.append(L[i])
+            i += 1
+        else:
+            res.append(R[j])
+            j += 1
+    while i < len(L):
+        res.append(L[i])
+        i += 1
+    while j < len(R):
+        res.append(R[j])
+        j += 1
+    return res
+
+def quick_sort(arr, pivot_strategy='last', pivot_index=None, rng=random):
+    def partition(a, l, r):
+        if pivot_strategy == 'first':
+            a[l], a[r] = a[r], a[l]
+        elif pivot_strategy == 'random':
+            idx = rng.randint(l, r)
+            a[idx], a[r] = a[r], a[idx]
+        elif pivot_strategy == 'custom' and pivot_index is not None and l <= pivot_index <= r:
+            a[pivot_index], a[r] = a[r], a[pivot_index]
+        # else: default is last element as pivot
+        pivot = a[r]
+        i = l - 1
+        for j in range(l, r):
+            if a[j] <= pivot:
                 i += 1
-            while j < len(right):
-                merged.append(right[j])
-                j += 1
-            node['merged'] = merged
-        return node
+                a[i], a[j] = a[j], a[i]
+        a[i+1], a[r] = a[r], a[i+1]
+        return i+1
+    # Explicit stack: sorted input with the last-element pivot recurses n deep
     arr_copy = arr[:]
-    return ms(arr_copy, 0, len(arr_copy)-1)
+    stack = [(0, len(arr_copy)-1)]
+    while stack:
+        l, r = stack.pop()
+        if l < r:
+            pi = partition(arr_copy, l, r)
+            stack.append((pi+1, r))
+            stack.append((l, pi-1))
+    return arr_copy
 
-def selection_sort_steps(arr):
-    steps = []
-    arr_copy = arr[:]
+def selection_sort(a):
+    arr_copy = a[:]
     n = len(arr_copy)
     for i in range(n):
         min_idx = i
-        steps.append(f"Step {i+1}: Start from index {i}, current array: {arr_copy}")
-        for j in range(i+1, n):
-            steps.append(f"  Compare arr[{j}]={arr_copy[j]} with current min arr[{min_idx}]={arr_copy[min_idx]}")
+        for j in range(i + 1, n):
             if arr_copy[j] < arr_copy[min_idx]:
                 min_idx = j
-                steps.append(f"  New min found at index {min_idx}: {arr_copy[min_idx]}")
         arr_copy[i], arr_copy[min_idx] = arr_copy[min_idx], arr_copy[i]
-        steps.append(f"  Swap arr[{i}] and arr[{min_idx}]: {arr_copy}")
-    steps.append(f"Sorted array: {arr_copy}")
-    return steps
-
-def topo_sort_steps(graph):
-    visited = set()
-    stack = []
-    steps = []
-    def dfs(v, depth=0):
-        visited.add(v)
-        steps.append(f"{'  '*depth}Visit {v}, stack: {stack}, visited: {sorted(visited)}")
-        for neighbor in graph.get(v, []):
-            if neighbor not in visited:
-                steps.append(f"{'  '*depth}Go deeper from {v} to {neighbor}")
-                dfs(neighbor, depth+1)
-            else:
-                steps.append(f"{'  '*depth}Already visited {neighbor}")
-        stack.append(v)
-        steps.append(f"{'  '*depth}Push {v} to stack: {stack}")
-    for node in graph:
-        if node not in visited:
-            steps.append(f"Start DFS from {node}")
-            dfs(node)
-    stack.reverse()
-    steps.append(f"Topological order: {stack}")
-    return steps, stack
-
-def activity_selection_steps(activities):
-    acts = sorted(activities, key=lambda x: x[1])
+    return arr_copy
+
+def traced_sort(trace, arr, events, every, include, *args):
+    # One run of a tracing.*_trace sort: yields its events (if events, checkpointed every
+    # `every` ops) or steps (if included) and returns (result, the other included outputs,
+    # e.g. the tree)
+    a = arr[:]
+    outputs = {} if 'tree' in include else None
+    if events:
+        gen = tracing.checkpointed(trace(a, *args, emit='events', outputs=outputs), lambda: {'array': a[:]}, every, len(a))
+    else:
+        gen = trace(a, *args, emit='steps' if 'steps' in include else None, outputs=outputs)
+    result = yield from gen
+    return result, outputs or {}
+
+def traced_final(res):
+    result, outputs = res
+    return dict(outputs, result=result)
+
+def iter_activity_selection_steps(activities, emit='steps', outputs=None):
+    # emit='counts' yields nothing and puts the comparisons (the sort's and the scan's)
+    # and writes in outputs['counts'], like the tracing.*_trace sorts
+    steps, counting = emit == 'steps', emit == 'counts'
+    sort_comparisons = 0
+    if counting:
+        def by_end(x, y):
+            # Called once per comparison the sort would make on the end keys
+            nonlocal sort_comparisons
+            sort_comparisons += 1
+            return (x[1] > y[1]) - (x[1] < y[1])
+        acts = sorted(activities, key=functools.cmp_to_key(by_end))
+    else:
+        acts = sorted(activities, key=lambda x: x[1])
     selected = []
     last_end = -1
-    steps = []
     for start, end in acts:
         if start >= last_end:
             selected.append((start, end))
-            steps.append(f"Select activity ({start}, {end})")
+            if steps:
+                yield f"Select activity ({start}, {end})"
             last_end = end
-        else:
-            steps.append(f"Skip activity ({start}, {end})")
-    steps.append(f"Selected: {selected}")
-    return steps, selected
-
-def floyd_warshall_steps(matrix):
-    n = len(matrix)
-    dist = [row[:] for row in matrix]
-    steps = [f"Initial matrix: {dist}"]
-    matrices = [[row[:] for row in dist]]  # Store initial matrix
-    for k in range(n):
-        steps.append(f"Using node {k} as intermediate:")
-        for i in range(n):
-            for j in range(n):
-                if dist[i][j] > dist[i][k] + dist[k][j]:
-                    old = dist[i][j]
-                    dist[i][j] = dist[i][k] + dist[k][j]
-                    steps.append(f"  Update dist[{i}][{j}] from {old} to {dist[i][j]} (via {k})")
-        matrices.append([row[:] for row in dist])  # Store after each k
-    steps.append(f"Final matrix: {dist}")
-    return steps, dist, matrices
+        elif steps:
+            yield f"Skip activity ({start}, {end})"
+    if steps:
+        yield f"Selected: {selected}"
+    if counting:
+        outputs['counts'] = {'comparisons': sort_comparisons + len(acts), 'sort_comparisons': sort_comparisons,
+                             'writes': len(selected)}
+    return selected
+
+def iter_floyd_warshall_steps(dist, integral=True, steps=True, snapshots=True, arrays=False, every=None):
+    # dist: float64 distance matrix from apsp.dist_array, updated in place.
+    # steps/snapshots=False skip the step strings / the per-k matrices (matrices is None).
+    # arrays=True keeps the result and matrices as float64 arrays (binary responses).
+    # every: log the frames in a FrameLog checkpointed every `every` k (None: no log).
+    snapshot = dist.copy if arrays else lambda: apsp.matrix_to_list(dist, integral)
+    matrices = [snapshot()] if snapshots else None  # Store initial matrix
+    log = frame_store.FrameLog(dist, every, integral) if every else None
+    if steps:
+        yield f"Initial matrix: {matrices[0] if snapshots and not arrays else apsp.matrix_to_list(dist, integral)}"
+    for k, rows, cols, old, new in apsp.floyd_warshall_updates(dist):
+        if steps:
+            yield f"Using node {k} as intermediate:"
+            for i, j, o, v in zip(rows.tolist(), cols.tolist(), old.tolist(), new.tolist()):
+                yield f"  Update dist[{i}][{j}] from {apsp.scalar(o, integral)} to {apsp.scalar(v, integral)} (via {k})"
+        if snapshots:
+            matrices.append(snapshot())  # Store after each k
+        if log is not None:
+            log.record(dist, rows, cols, new)
+    result = matrices[-1] if snapshots else snapshot()
+    negative = apsp.negative_cycle_nodes(dist)
+    if steps:
+        if negative:
+            yield f"Negative cycle detected through nodes {negative}"
+        yield f"Final matrix: {apsp.matrix_to_list(dist, integral) if arrays else result}"
+    return result, matrices, negative, log
+
+def dist_output(dist, integral):
+    # Binary responses take the float64 matrix as is
+    return dist if binary_response() else apsp.matrix_to_list(dist, integral)
+
+def reach_output(reach):
+    return reach.astype(np.uint8) if binary_response() else closure_engine.matrix_to_list(reach)
+
+def keep_session(store, state, session_id):
+    # store.create() for an id the response hands out; cached_endpoint keeps the list
+    # with the cached body, so it is only replayed while every id is still live
+    session_id = store.create(state, session_id)
+    g.setdefault('session_refs', []).append((store, session_id))
+    return session_id
+
+def frames_payload(log, frames_id):
+    # Keep a run's FrameLog for GET /api/<algorithm>/frames/<id>?k=
+    return dict(log.summary(), id=keep_session(frame_logs, log, frames_id))
+
+def frames_id(algorithm, data, every):
+    return cache_key(algorithm + '-frames', data.get('matrix'), {'checkpoint_every': every})[:32]
+
+def checkpoint_interval(data, n, itemsize):
+    # checkpoint_every for the frame log; by default the checkpoints fit FRAME_CHECKPOINT_BYTES
+    return checkpoint_every() or frame_store.default_every(n, itemsize, FRAME_CHECKPOINT_BYTES)
+
+def floyd_warshall_final(res, frames_id=None):
+    payload = {'result': res[0], 'negative_cycle': bool(res[2])}
+    if res[1] is not None:
+        payload['matrices'] = res[1]
+    if res[3] is not None:
+        payload['frames'] = frames_payload(res[3], frames_id)
+    return payload
+
+def blocked_floyd_warshall_result(data, dist, integral, tile_size, workers):
+    # Result-only tiled Floyd-Warshall over `workers` processes (None: one per CPU);
+    # verify=1 checks it against the single-process kernel
+    out = compute(apsp.blocked_floyd_warshall, dist, tile_size, workers)
+    payload = {
+        'result': dist_output(out, integral),
+        'negative_cycle': bool(apsp.negative_cycle_nodes(out)),
+        'mode': 'blocked',
+        'tile_size': tile_size,
+    }
+    if request_flag(data, 'verify'):
+        payload['verified'] = bool(np.array_equal(out, compute(apsp.floyd_warshall, dist.copy())))
+    return payload
+
+def spooled(estimate):
+    # A cost function that also prices {"matrix_id": ...} bodies, by the spooled n
+    def cost(opts):
+        info = matrix_spool.info(opts.get('matrix_id')) if 'matrix_id' in opts else None
+        return estimate(dict(opts, n=info['shape'][0]) if info else opts)
+    return cost
+
+def spooled_response(data, algorithm, run):
+    # Result-only run(src, out) on a spooled matrix, in a worker that memory-maps both
+    # files; the result is spooled as well, fetched with GET /api/matrices/<result_id>
+    src = matrix_spool.path(data.get('matrix_id'))
+    if src is None:
+        return jsonify({'error': 'No spooled matrix with that matrix_id.'}), 404
+    result_id, out = matrix_spool.result_path(data['matrix_id'], algorithm)
+    try:
+        info = compute(run, src, out)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return error_response(e)
+    return jsonify(dict(info, result_id=result_id))
+
+@app.route('/api/matrices', methods=['GET', 'POST'])
+def api_matrices():
+    # POST a binary matrix as the raw body: an .npy file, or little-endian values with
+    # ?dtype=float64&shape=5000,5000 (gzip bodies too). GET lists the spool's usage.
+    if request.method == 'GET':
+        return jsonify(matrix_spool.stats())
+    dtype = request.args.get('dtype')
+    shape = request.args.get('shape')
+    stream = request.stream
+    size = request.content_length
+    if request.content_encoding == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream)
+        size = None
+    try:
+        if dtype is not None:
+            try:
+                shape = tuple(int(x) for x in (shape or '').split(','))
+            except ValueError:
+                raise ValueError('shape must be two non-negative integers, e.g. 5000,5000.') from None
+        matrix_id, info = matrix_spool.save(stream, dtype, shape, size)
+    except spool.SpoolFull as e:
+        return jsonify({'error': str(e)}), 413
+    except (ValueError, OSError, EOFError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(dict(info, matrix_id=matrix_id)), 201
+
+@app.route('/api/matrices/<matrix_id>', methods=['GET', 'DELETE'])
+def api_matrix(matrix_id):
+    # GET returns the .npy file, or with format=raw only its values (dtype and shape in
+    # X-Matrix-Dtype / X-Matrix-Shape)
+    if request.method == 'DELETE':
+        if not matrix_spool.drop(matrix_id):
+            return jsonify({'error': 'No such matrix.'}), 404
+        return '', 204
+    path = matrix_spool.path(matrix_id)
+    if path is None:
+        return jsonify({'error': 'No such matrix.'}), 404
+    if request.args.get('format') != 'raw':
+        return send_file(path, mimetype='application/x-npy', download_name=matrix_id + '.npy')
+    arr = np.load(path, mmap_mode='r', allow_pickle=False)
+    headers = {'X-Matrix-Dtype': arr.dtype.newbyteorder('<').name, 'X-Matrix-Shape': ','.join(map(str, arr.shape))}
+    offset = arr.offset
+    del arr
+    def generate():
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while True:
+                block = f.read(spool.BLOCK)
+                if not block:
+                    break
+                yield block
+    return Response(generate(), mimetype='application/octet-stream', headers=headers)
 
 @app.route('/api/floyd-warshall', methods=['POST'])
+@admitted(spooled(scheduler.floyd_warshall_cost))
+@cached_endpoint
 def api_floyd_warshall():
     data = request.get_json()
+    if 'matrix_id' in data:
+        return spooled_response(data, 'floyd-warshall', spool.floyd_warshall_file)
     matrix = data.get('matrix')
     if not (isinstance(matrix, list) and all(isinstance(row, list) and len(row) == len(matrix) for row in matrix)):
         return jsonify({'error': 'Input must be a square adjacency matrix.'}), 400
     try:
-        n = len(matrix)
-        mat = []
-        for i in range(n):
-            row = []
-            for j in range(n):
-                val = matrix[i][j]
-                if i == j:
-                    row.append(0)
-                elif val == 0:
-                    row.append(float('inf'))
-                else:
-                    row.append(val)
-            mat.append(row)
-        steps, result, matrices = floyd_warshall_steps(mat)
-        return jsonify({'result': result, 'steps': steps, 'matrices': matrices})
+        try:
+            with g.timer.phase('validate'):
+                dist, integral = apsp.dist_array(matrix)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        out, counts = count_ops(data, opcount.floyd_warshall, dist.copy())
+        if metrics_only(data):
+            return jsonify({
+                'result': dist_output(out, integral),
+                'negative_cycle': bool(apsp.negative_cycle_nodes(out)),
+                'metrics': counts,
+            })
+        if request_option(data, 'mode') == 'blocked':
+            try:
+                with g.timer.phase('validate'):
+                    tile_size = positive_int_option(data, 'tile_size', apsp.DEFAULT_TILE_SIZE)
+                    workers = positive_int_option(data, 'workers')
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            blocked = with_metrics(blocked_floyd_warshall_result, counts)
+            return jsonify(blocked(data, dist, integral, tile_size, workers))
+        include = requested_outputs(data, ('steps', 'matrices'), optional=('frames',))
+        every = checkpoint_interval(data, len(matrix), 8) if 'frames' in include else None
+        finish = with_metrics(lambda res: floyd_warshall_final(res, frames_id('floyd-warshall', data, every)), counts)
+        if not include and not wants_stream():
+            out = compute(apsp.floyd_warshall, dist)
+            return jsonify(finish((dist_output(out, integral), None, apsp.negative_cycle_nodes(out), None)))
+        args = (dist, integral, 'steps' in include, 'matrices' in include, binary_response(), every)
+        return trace_response(iter_floyd_warshall_steps, args, finish, trace_key(data, include))
+    except Exception as e:
+        return error_response(e)
+
+def frame_response(frames_id, output):
+    # ?k= gives the matrix after the first k intermediate nodes (default: the last
+    # frame); with delta=1 only the cells frame k changed, as [i, j, value]
+    entry = frame_logs.get(frames_id)
+    if entry is None:
+        return jsonify({'error': f'No frame log {frames_id!r}; it may have expired. Send the request again with cache=0.'}), 404
+    log, lock = entry
+    k = request.args.get('k', str(log.count - 1)).strip()
+    if not (k.isdecimal() and int(k) < log.count):
+        return jsonify({'error': f'k must be a frame index from 0 to {log.count - 1}.'}), 400
+    k = int(k)
+    payload = {'frames': frames_id, 'k': k, 'count': log.count}
+    with lock:
+        if request_flag({}, 'delta'):
+            rows, cols, values = log.delta(k) if k else ([], [], [])
+            payload['cells'] = [[i, j, apsp.scalar(v, log.integral)] for i, j, v in zip(np.asarray(rows).tolist(), np.asarray(cols).tolist(), np.asarray(values).tolist())]
+        else:
+            payload['matrix'] = output(log, log.frame(k))
+    return jsonify(payload)
+
+@app.route('/api/floyd-warshall/frames/<frames_id>', methods=['GET'])
+def api_floyd_warshall_frames(frames_id):
+    return frame_response(frames_id, lambda log, dist: dist_output(dist, log.integral))
+
+def apsp_state(session_id, engine):
+    payload = {'session': session_id, 'n': engine.n, 'negative_cycle': engine.negative_cycle}
+    if request_flag({}, 'result'):
+        payload['result'] = engine.result()
+    return payload
+
+@app.route('/api/apsp-sessions', methods=['POST'])
+def api_apsp_session_create():
+    # Run Floyd-Warshall once and keep the matrices for incremental edits
+    data = request.get_json(silent=True) or {}
+    matrix = data.get('matrix')
+    if not (isinstance(matrix, list) and all(isinstance(row, list) and len(row) == len(matrix) for row in matrix)):
+        return jsonify({'error': 'Input must be a square adjacency matrix.'}), 400
+    try:
+        with g.timer.phase('validate'):
+            dist, integral = apsp.dist_array(matrix)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        engine = apsp.IncrementalAPSP(dist, integral)
+        return jsonify(apsp_state(apsp_sessions.create(engine), engine)), 201
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/api/apsp-sessions/<session_id>', methods=['GET', 'DELETE'])
+def api_apsp_session(session_id):
+    # GET ?source=u returns dist[u], ?source=u&target=v a single distance
+    if request.method == 'DELETE':
+        if not apsp_sessions.drop(session_id):
+            return jsonify({'error': f'No APSP session {session_id!r}.'}), 404
+        return jsonify({'session': session_id, 'deleted': True})
+    entry = apsp_sessions.get(session_id)
+    if entry is None:
+        return jsonify({'error': f'No APSP session {session_id!r}.'}), 404
+    engine, lock = entry
+    source = request.args.get('source', type=int)
+    target = request.args.get('target', type=int)
+    try:
+        with lock:
+            payload = apsp_state(session_id, engine)
+            if source is not None and target is not None:
+                payload.update(source=source, target=target, distance=engine.distance(source, target))
+            elif source is not None:
+                payload.update(source=source, distances=engine.row(source))
+            return jsonify(payload)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/apsp-sessions/<session_id>/edges', methods=['POST'])
+def api_apsp_session_edges(session_id):
+    # {"edges": [[u, v, w], ...]} or {"u": u, "v": v, "w": w}, applied in order;
+    # w = null removes the edge. Each edit reports how it was applied.
+    data = request.get_json(silent=True) or {}
+    raw = data.get('edges')
+    if raw is None:
+        raw = [[data.get('u'), data.get('v'), data.get('w')]]
+    if not (isinstance(raw, list) and all(isinstance(e, list) and len(e) == 3 for e in raw)):
+        return jsonify({'error': 'edges must be a list of [u, v, w] entries.'}), 400
+    entry = apsp_sessions.get(session_id)
+    if entry is None:
+        return jsonify({'error': f'No APSP session {session_id!r}.'}), 404
+    engine, lock = entry
+    with lock:
+        updates = []
+        try:
+            for u, v, w in raw:
+                updates.append(engine.set_edge(u, v, w))
+        except ValueError as e:
+            return jsonify({'error': str(e), 'edge': raw[len(updates)], 'applied': len(updates), 'updates': updates}), 400
+        payload = apsp_state(session_id, engine)
+        payload.update(applied=len(updates), updates=updates)
+        return jsonify(payload)
+
+def iter_warshall_steps(reach, steps=True, snapshots=True, arrays=False, every=None):
+    # reach: boolean matrix from closure.bool_array, updated in place.
+    # steps/snapshots=False skip the step strings / the per-k matrices (matrices is None).
+    # arrays=True keeps the closure and matrices as uint8 arrays (binary responses).
+    # every: log the frames in a FrameLog checkpointed every `every` k (None: no log).
+    snapshot = (lambda: reach.astype(np.uint8)) if arrays else lambda: closure_engine.matrix_to_list(reach)
+    matrices = [snapshot()] if snapshots else None
+    log = frame_store.FrameLog(reach, every) if every else None
+    if steps:
+        yield f"Initial matrix: {matrices[0] if snapshots and not arrays else closure_engine.matrix_to_list(reach)}"
+    for k, rows, cols in closure_engine.warshall_updates(reach):
+        if steps:
+            yield f"Using node {k} as intermediate:"
+            for i, j in zip(rows.tolist(), cols.tolist()):
+                yield f"  Path from {i} to {j} via {k} found. Set closure[{i}][{j}] = 1"
+        if snapshots:
+            matrices.append(snapshot())
+        if log is not None:
+            log.record(reach, rows, cols)
+    closure = matrices[-1] if snapshots else snapshot()
+    if steps:
+        yield f"Transitive closure: {closure_engine.matrix_to_list(reach) if arrays else closure}"
+    return closure, matrices, log
+
+def warshall_final(res, frames_id=None):
+    payload = {'result': res[0]}
+    if res[1] is not None:
+        payload['matrices'] = res[1]
+    if res[2] is not None:
+        payload['frames'] = frames_payload(res[2], frames_id)
+    return payload
+
+def bitset_warshall_response(data, packed, n, packed_output):
+    # Result-only closure on uint64 row bitsets; `queries` is a list of [u, v] reachability checks
+    queries = data.get('queries') or []
+    if not all(isinstance(q, list) and len(q) == 2 and all(isinstance(x, int) and 0 <= x < n for x in q) for q in queries):
+        return jsonify({'error': 'Queries must be [u, v] pairs of node indices.'}), 400
+    try:
+        packed = compute(closure_engine.bitset_warshall, packed)
+        payload = {'mode': 'bitset', 'n': n}
+        if request_option(data, 'output', 'packed' if packed_output else 'matrix') == 'packed':
+            payload['packed'] = base64.b64encode(closure_engine.to_bytes(packed, n)).decode('ascii')
+        else:
+            payload['result'] = reach_output(closure_engine.unpack(packed, n))
+        if queries:
+            payload['reachable'] = [closure_engine.reachable(packed, u, v) for u, v in queries]
+        return jsonify(payload)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-def warshall_steps(matrix):
-    n = len(matrix)
-    closure = [row[:] for row in matrix]
-    steps = [f"Initial matrix: {closure}"]
-    matrices = [[row[:] for row in closure]]
-    for k in range(n):
-        steps.append(f"Using node {k} as intermediate:")
-        for i in range(n):
-            for j in range(n):
-                if closure[i][j] or (closure[i][k] and closure[k][j]):
-                    if not closure[i][j]:
-                        steps.append(f"  Path from {i} to {j} via {k} found. Set closure[{i}][{j}] = 1")
-                    closure[i][j] = 1
-        matrices.append([row[:] for row in closure])
-    steps.append(f"Transitive closure: {closure}")
-    return steps, closure, matrices
+        return error_response(e)
 
 @app.route('/api/warshall', methods=['POST'])
+@admitted(spooled(scheduler.warshall_cost))
+@cached_endpoint
 def api_warshall():
     data = request.get_json()
+    if 'matrix_id' in data:
+        return spooled_response(data, 'warshall', spool.warshall_file)
+    if 'packed' in data:
+        # Bit-packed input needs no per-cell validation
+        try:
+            n = int(data.get('n'))
+            packed = closure_engine.from_bytes(base64.b64decode(data['packed']), n)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid packed matrix: {e}'}), 400
+        return bitset_warshall_response(data, packed, n, packed_output=True)
     matrix = data.get('matrix')
     if not (isinstance(matrix, list) and all(isinstance(row, list) and len(row) == len(matrix) for row in matrix)):
         return jsonify({'error': 'Input must be a square adjacency matrix.'}), 400
     try:
         # Ensure all values are 0 or 1
-        for row in matrix:
-            for x in row:
-                if x not in (0, 1):
-                    return jsonify({'error': 'Matrix must contain only 0 or 1.'}), 400
-        steps, closure, matrices = warshall_steps(matrix)
-        return jsonify({'result': closure, 'steps': steps, 'matrices': matrices})
+        try:
+            with g.timer.phase('validate'):
+                reach = closure_engine.bool_array(matrix)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        out, counts = count_ops(data, opcount.warshall, reach.copy())
+        if metrics_only(data):
+            return jsonify({'result': reach_output(out), 'metrics': counts})
+        if request_option(data, 'mode') == 'bitset':
+            return bitset_warshall_response(data, closure_engine.pack(reach), len(matrix), packed_output=False)
+        include = requested_outputs(data, ('steps', 'matrices'), optional=('frames',))
+        every = checkpoint_interval(data, len(matrix), 1) if 'frames' in include else None
+        finish = with_metrics(lambda res: warshall_final(res, frames_id('warshall', data, every)), counts)
+        if not include and not wants_stream():
+            return jsonify(finish((reach_output(compute(closure_engine.warshall, reach)), None, None)))
+        args = (reach, 'steps' in include, 'matrices' in include, binary_response(), every)
+        return trace_response(iter_warshall_steps, args, finish, trace_key(data, include))
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
-def topo_sort_kahn_steps(matrix):
-    n = len(matrix)
-    indegree = [0]*n
-    for i in range(n):
-        for j in range(n):
-            if matrix[i][j]:
-                indegree[j] += 1
+@app.route('/api/warshall/frames/<frames_id>', methods=['GET'])
+def api_warshall_frames(frames_id):
+    return frame_response(frames_id, lambda log, reach: reach_output(reach))
+
+def iter_topo_sort_kahn_steps(graph, emit='steps', outputs=None):
+    from collections import deque
+    steps, counting = emit == 'steps', emit == 'counts'
+    n = graph.n
+    indegree = graph.indegrees()
     order = []
-    steps = [f"Initial indegrees: {indegree}"]
+    scans = pushes = 0
+    if steps:
+        yield f"Initial indegrees: {indegree}"
     queue = [i for i in range(n) if indegree[i] == 0]
-    steps.append(f"Start with zero indegree nodes: {queue}")
+    if steps:
+        yield f"Start with zero indegree nodes: {queue}"
+    pushes += len(queue)
+    queue = deque(queue)
     while queue:
-        u = queue.pop(0)
+        u = queue.popleft()
         order.append(u)
-        steps.append(f"Remove vertex {u}, current order: {order}")
-        for v in range(n):
-            if matrix[u][v]:
-                indegree[v] -= 1
-                steps.append(f"  Decrement indegree of {v} to {indegree[v]}")
-                if indegree[v] == 0:
-                    queue.append(v)
-                    steps.append(f"  Add {v} to queue")
+        if steps:
+            yield f"Remove vertex {u}, current order: {order}"
+        for v, _ in graph.neighbors(u):
+            indegree[v] -= 1
+            if steps:
+                yield f"  Decrement indegree of {v} to {indegree[v]}"
+            elif counting:
+                scans += 1
+            if indegree[v] == 0:
+                queue.append(v)
+                if steps:
+                    yield f"  Add {v} to queue"
+                elif counting:
+                    pushes += 1
+    if counting:
+        outputs['counts'] = {'edge_scans': scans, 'queue_pushes': pushes, 'writes': scans}
     if len(order) != n:
-        steps.append("Cycle detected! No topological order.")
-        return steps, None
-    steps.append(f"Topological order: {order}")
-    return steps, order
+        if steps:
+            yield "Cycle detected! No topological order."
+        return None
+    if steps:
+        yield f"Topological order: {order}"
+    return order
+
+def topo_sort_final(order):
+    if order is None:
+        return {'error': 'Cycle detected! No topological order.'}
+    return {'result': order}
 
 @app.route('/api/topo-sort', methods=['POST'])
+@admitted(scheduler.topo_sort_cost)
+@cached_endpoint
 def api_topo_sort():
     data = request.get_json()
-    matrix = data.get('matrix')
-    if not (isinstance(matrix, list) and all(isinstance(row, list) and len(row) == len(matrix) for row in matrix)):
-        return jsonify({'error': 'Input must be a square adjacency matrix.'}), 400
     try:
-        steps, order = topo_sort_kahn_steps(matrix)
+        with g.timer.phase('validate'):
+            graph = parse_graph(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        order, counts = count_ops(data, opcount.counted, iter_topo_sort_kahn_steps, graph)
+        if metrics_only(data):
+            return jsonify(dict(topo_sort_final(order), metrics=counts))
+        finish = with_metrics(topo_sort_final, counts)
+        if wants_events(data):
+            return trace_response(tracing.topo_sort_kahn_events, (graph, checkpoint_every()), finish, 'event')
+        if wants_stream():
+            return stream_steps(iter_topo_sort_kahn_steps, (graph,), finish)
+        steps, order = run_trace(iter_topo_sort_kahn_steps, graph)
+        payload = with_steps(finish(order), steps)
         if order is None:
-            return jsonify({'error': 'Cycle detected! No topological order.', 'steps': steps})
-        return jsonify({'result': order, 'steps': steps, 'matrix': matrix})
+            return jsonify(payload)
+        if 'matrix' in data:
+            payload['matrix'] = data['matrix']
+        return jsonify(payload)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+def dag_state(session_id, dag):
+    return {'session': session_id, 'n': dag.n, 'edge_count': dag.edge_count, 'order': dag.order}
+
+def edge_pairs(data):
+    # [[u, v], ...] from "edges", or a single {"u": .., "v": ..}
+    raw = data.get('edges')
+    if raw is None:
+        raw = [[data.get('u'), data.get('v')]]
+    if not (isinstance(raw, list) and all(isinstance(e, list) and len(e) in (2, 3) for e in raw)):
+        raise ValueError('edges must be a list of [u, v] entries.')
+    return [(e[0], e[1]) for e in raw]
+
+@app.route('/api/dag-sessions', methods=['POST'])
+def api_dag_session_create():
+    # Start a session from any graph form (or {"n": k} for k isolated nodes)
+    data = request.get_json(silent=True) or {}
+    try:
+        if any(k in data for k in ('matrix', 'edges', 'indptr')):
+            with g.timer.phase('validate'):
+                dag = DynamicDAG.from_graph(parse_graph(data))
+        else:
+            n = data.get('n', 0)
+            if not isinstance(n, int) or isinstance(n, bool) or n < 0:
+                raise ValueError('n must be a non-negative integer.')
+            dag = DynamicDAG(n)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    session_id = dag_sessions.create(dag)
+    return jsonify(dag_state(session_id, dag)), 201
+
+@app.route('/api/dag-sessions/<session_id>', methods=['GET', 'DELETE'])
+def api_dag_session(session_id):
+    if request.method == 'DELETE':
+        if not dag_sessions.drop(session_id):
+            return jsonify({'error': f'No DAG session {session_id!r}.'}), 404
+        return jsonify({'session': session_id, 'deleted': True})
+    entry = dag_sessions.get(session_id)
+    if entry is None:
+        return jsonify({'error': f'No DAG session {session_id!r}.'}), 404
+    dag, lock = entry
+    with lock:
+        payload = dag_state(session_id, dag)
+        if request_flag({}, 'edges'):
+            payload['edges'] = dag.edges()
+        return jsonify(payload)
+
+@app.route('/api/dag-sessions/<session_id>/nodes', methods=['POST'])
+def api_dag_session_nodes(session_id):
+    data = request.get_json(silent=True) or {}
+    count = data.get('count', 1)
+    if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+        return jsonify({'error': 'count must be a non-negative integer.'}), 400
+    entry = dag_sessions.get(session_id)
+    if entry is None:
+        return jsonify({'error': f'No DAG session {session_id!r}.'}), 404
+    dag, lock = entry
+    with lock:
+        return jsonify({'session': session_id, 'added': dag.add_nodes(count), 'n': dag.n})
+
+@app.route('/api/dag-sessions/<session_id>/edges', methods=['POST', 'DELETE'])
+def api_dag_session_edges(session_id):
+    # POST inserts edges in the given order, DELETE removes them. Only the nodes the
+    # order had to move are returned (`moved`: [[node, position], ...]); add order=1
+    # for the whole order. An insertion that would close a cycle stops the batch with
+    # 409: earlier edges of the batch stay applied and `applied` says how many.
+    data = request.get_json(silent=True) or {}
+    try:
+        pairs = edge_pairs(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    entry = dag_sessions.get(session_id)
+    if entry is None:
+        return jsonify({'error': f'No DAG session {session_id!r}.'}), 404
+    dag, lock = entry
+    with lock:
+        moved = {}
+        applied = 0
+        try:
+            for u, v in pairs:
+                if request.method == 'DELETE':
+                    dag.remove_edge(u, v)
+                else:
+                    moved.update(dag.add_edge(u, v))
+                applied += 1
+            status = 200
+            payload = {}
+        except CycleError as e:
+            status = 409
+            payload = {'error': str(e), 'cycle': e.cycle, 'edge': list(pairs[applied])}
+        except ValueError as e:
+            status = 400
+            payload = {'error': str(e), 'edge': list(pairs[applied])}
+        payload.update(session=session_id, applied=applied, edge_count=dag.edge_count,
+                       moved=[[u, i] for u, i in moved.items()])
+        if request_flag(data, 'order'):
+            payload['order'] = dag.order
+        return jsonify(payload), status
 
 @app.route('/api/activity-selection', methods=['POST'])
+@admitted(scheduler.activity_selection_cost)
+@cached_endpoint
 def api_activity_selection():
     data = request.get_json()
+    mode = request_option(data, 'mode')
+    if mode in ('sorted', 'weighted'):
+        return activity_selection_mode(data, mode)
     activities = data.get('activities')
     if not (isinstance(activities, list) and all(isinstance(x, list) and len(x) == 2 for x in activities)):
         return jsonify({'error': 'Input must be a list of [start, end] pairs.'}), 400
     try:
-        steps, selected = activity_selection_steps(activities)
-        return jsonify({'result': selected, 'steps': steps})
+        selected, counts = count_ops(data, opcount.counted, iter_activity_selection_steps, activities)
+        if metrics_only(data):
+            return jsonify({'result': selected, 'metrics': counts})
+        finish = with_metrics(lambda selected: {'result': selected}, counts)
+        if wants_stream():
+            return stream_steps(iter_activity_selection_steps, (activities,), finish)
+        steps, selected = run_trace(iter_activity_selection_steps, activities)
+        return jsonify(with_steps(finish(selected), steps))
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-def build_merge_sort_tree(arr, l, r):
-    node = {
-        'range': [l, r],
-        'array': arr[l:r+1],
-        'left': None,
-        'right': None,
-        'merged': None
-    }
-    if l == r:
-        return node
-    m = (l + r) // 2
-    node['left'] = build_merge_sort_tree(arr, l, m)
-    node['right'] = build_merge_sort_tree(arr, m+1, r)
-    merged = []
-    L = arr[l:m+1]
-    R = arr[m+1:r+1]
-    i = j = 0
-    while i < len(L) and j < len(R):
-        if L[i] < R[j]:
-            merged.append(L[i])
-            i += 1
-        else:
-            merged.append(R[j])
-            j += 1
-    while i < len(L):
-        merged.append(L[i])
-        i += 1
-    while j < len(R):
-        merged.append(R[j])
-        j += 1
-    node['merged'] = merged
-    return node
+        return error_response(e)
+
+def activity_selection_mode(data, mode):
+    # Result-only. mode=sorted: activities already sorted by end, selected in one pass
+    # with no sort; mode=weighted: [start, end, weight] activities, the compatible set of
+    # largest total weight
+    activities = data.get('activities')
+    try:
+        if not isinstance(activities, list):
+            raise ValueError('activities must be a list.')
+        for x in activities:
+            intervals.check_interval(x, weighted=mode == 'weighted')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        if mode == 'sorted':
+            return jsonify({'result': compute(intervals.select_sorted_list, activities)})
+        total, chosen = compute(intervals.weighted, activities)
+        return jsonify({'result': chosen, 'total': total})
+    except intervals.UnsortedInput as e:
+        return jsonify({'error': str(e), 'index': e.index}), 400
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/api/activity-selection/stream', methods=['POST'])
+def api_activity_selection_stream():
+    # NDJSON [start, end] lines sorted by end, read as they arrive (a chunked or gzip
+    # body works too) and selected in one pass in O(1) memory. Every selected interval
+    # is sent back as {"select": [start, end]} and the last line is {"read", "selected"},
+    # or an error with the counts so far. It reads the client's body, so it runs on the
+    # request thread, held to the request's wall-time limit as a deadline.
+    stream = request.stream
+    if request.content_encoding == 'gzip':
+        stream = gzip.GzipFile(fileobj=stream)
+    timeout = g.limits[0]
+    deadline = time.monotonic() + timeout
+    def generate():
+        read = selected = 0
+        def counted():
+            nonlocal read
+            for x in intervals.read_lines(stream):
+                read += 1
+                if read % 1024 == 0 and time.monotonic() > deadline:
+                    raise executor.TaskTimeout('wall', timeout)
+                yield x
+        buf = []
+        try:
+            for start, end in intervals.select_sorted(counted()):
+                selected += 1
+                buf.append(json.dumps({'select': [start, end]}))
+                if len(buf) >= STREAM_CHUNK_LINES:
+                    buf.append('')
+                    yield '\n'.join(buf)
+                    buf = []
+            final = {'read': read, 'selected': selected}
+        except (ValueError, OSError, EOFError, executor.TaskTimeout) as e:
+            final = dict(stream_error(e), read=read, selected=selected)
+        buf.append(json.dumps(final))
+        buf.append('')
+        yield '\n'.join(buf)
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
 
 @app.route('/api/merge-sort', methods=['POST'])
+@admitted(scheduler.merge_sort_cost)
+@cached_endpoint
 def api_merge_sort():
     data = request.get_json()
     arr = data.get('array')
     if not isinstance(arr, list):
         return jsonify({'error': 'Input must be a list.'}), 400
-    arr_copy = arr[:]
-    def merge_sort(a):
-        if len(a) <= 1:
-            return a
-        m = len(a) // 2
-        L = merge_sort(a[:m])
-        R = merge_sort(a[m:])
-        res = []
-        i = j = 0
-        while i < len(L) and j < len(R):
-            if L[i] < R[j]:
-                res.append(L[i])
-                i += 1
-            else:
-                res.append(R[j])
-                j += 1
-        while i < len(L):
-            res.append(L[i])
-            i += 1
-        while j < len(R):
-            res.append(R[j])
-            j += 1
-        return res
-    sorted_arr = merge_sort(arr_copy)
-    tree = build_merge_sort_tree(arr_copy, 0, len(arr_copy)-1) if arr_copy else None
-    steps = merge_sort_steps(arr[:])
-    return jsonify({'result': sorted_arr, 'tree': tree, 'steps': steps})
+    try:
+        result, counts = count_ops(data, opcount.merge_sort, arr)
+        if metrics_only(data):
+            return jsonify({'result': result, 'metrics': counts})
+        finish = with_metrics(traced_final, counts)
+        include = requested_outputs(data, ('steps', 'tree'))
+        if not include and not wants_events(data) and not wants_stream():
+            return jsonify(finish((compute(merge_sort, arr[:]), {})))
+        args = (tracing.merge_sort_trace, arr, wants_events(data), checkpoint_every(), include)
+        return trace_response(traced_sort, args, finish, trace_key(data, include))
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/api/merge-sort/batch', methods=['POST'])
+@admitted(scheduler.batch_cost(scheduler.merge_sort_cost))
+@cached_endpoint
+def api_merge_sort_batch():
+    return batch_endpoint(lambda item: (batch_array(item),), merge_sort, lambda res: {'result': res}, batch.sort_each)
 
 @app.route('/api/quick-sort', methods=['POST'])
+@admitted(scheduler.quick_sort_cost)
+@cached_endpoint
 def api_quick_sort():
     data = request.get_json()
     arr = data.get('array')
     pivot_strategy = data.get('pivot_strategy', 'last')
     pivot_index = data.get('pivot_index', None)
+    seed = data.get('seed')
     if not isinstance(arr, list):
         return jsonify({'error': 'Input must be a list.'}), 400
+    # A seed makes random pivots reproducible (and the response cacheable); without one
+    # Random(None) seeds itself from the OS. Random objects, unlike the module, pickle.
+    make_rng = lambda: random.Random(seed)
     try:
-        def quick_sort(arr):
-            def partition(a, l, r):
-                if pivot_strategy == 'first':
-                    a[l], a[r] = a[r], a[l]
-                elif pivot_strategy == 'random':
-                    import random
-                    idx = random.randint(l, r)
-                    a[idx], a[r] = a[r], a[idx]
-                elif pivot_strategy == 'custom' and pivot_index is not None and l <= pivot_index <= r:
-                    a[pivot_index], a[r] = a[r], a[pivot_index]
-                # else: default is last element as pivot
-                pivot = a[r]
-                i = l - 1
-                for j in range(l, r):
-                    if a[j] <= pivot:
-                        i += 1
-                        a[i], a[j] = a[j], a[i]
-                a[i+1], a[r] = a[r], a[i+1]
-                return i+1
-            def qs(a, l, r):
-                if l < r:
-                    pi = partition(a, l, r)
-                    qs(a, l, pi-1)
-                    qs(a, pi+1, r)
-            arr_copy = arr[:]
-            qs(arr_copy, 0, len(arr_copy)-1)
-            return arr_copy
-        result = quick_sort(arr[:])
-        steps = quick_sort_steps(arr[:], pivot_strategy, pivot_index)
-        return jsonify({'result': result, 'steps': steps})
+        result, counts = count_ops(data, opcount.quick_sort, arr, pivot_strategy, pivot_index, make_rng())
+        if metrics_only(data):
+            return jsonify({'result': result, 'metrics': counts})
+        finish = with_metrics(traced_final, counts)
+        include = requested_outputs(data, ('steps',))
+        if not include and not wants_events(data) and not wants_stream():
+            return jsonify(finish((compute(quick_sort, arr, pivot_strategy, pivot_index, make_rng()), {})))
+        args = (tracing.quick_sort_trace, arr, wants_events(data), checkpoint_every(), include, pivot_strategy, pivot_index, make_rng())
+        return trace_response(traced_sort, args, finish, trace_key(data, include))
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+@app.route('/api/quick-sort/batch', methods=['POST'])
+@admitted(scheduler.batch_cost(scheduler.quick_sort_cost))
+@cached_endpoint
+def api_quick_sort_batch():
+    # Every pivot strategy gives the same sorted result, so int arrays share one NumPy sort
+    def prepare(item):
+        return batch_array(item), item.get('pivot_strategy', 'last'), item.get('pivot_index'), random.Random(item.get('seed'))
+    return batch_endpoint(prepare, quick_sort, lambda res: {'result': res}, batch.sort_each)
 
 @app.route('/api/selection-sort', methods=['POST'])
+@admitted(scheduler.selection_sort_cost)
+@cached_endpoint
 def api_selection_sort():
     data = request.get_json()
     arr = data.get('array')
     if not isinstance(arr, list):
         return jsonify({'error': 'Input must be a list.'}), 400
     try:
-        # Define the sorting logic locally to remove external dependency
-        def local_selection_sort(a):
-            arr_copy = a[:]
-            n = len(arr_copy)
-            for i in range(n):
-                min_idx = i
-                for j in range(i + 1, n):
-                    if arr_copy[j] < arr_copy[min_idx]:
-                        min_idx = j
-                arr_copy[i], arr_copy[min_idx] = arr_copy[min_idx], arr_copy[i]
-            return arr_copy
-        result = local_selection_sort(arr[:])
-        steps = selection_sort_steps(arr[:])
-        return jsonify({'result': result, 'steps': steps})
+        result, counts = count_ops(data, opcount.selection_sort, arr)
+        if metrics_only(data):
+            return jsonify({'result': result, 'metrics': counts})
+        finish = with_metrics(traced_final, counts)
+        include = requested_outputs(data, ('steps',))
+        if not include and not wants_events(data) and not wants_stream():
+            return jsonify(finish((compute(selection_sort, arr), {})))
+        args = (tracing.selection_sort_trace, arr, wants_events(data), checkpoint_every(), include)
+        return trace_response(traced_sort, args, finish, trace_key(data, include))
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+def iter_knapsack_steps(weights, profits, W, emit='steps', outputs=None):
+    # The full (n+1) x (W+1) table; emit='counts' yields nothing and puts the cells
+    # compared and written in outputs['counts']
+    steps, counting = emit == 'steps', emit == 'counts'
+    n = len(weights)
+    dp = [[0]*(W+1) for _ in range(n+1)]
+    comparisons = 0
+    for i in range(1, n+1):
+        for w in range(W+1):
+            if weights[i-1] <= w:
+                include = profits[i-1] + dp[i-1][w-weights[i-1]]
+                exclude = dp[i-1][w]
+                dp[i][w] = max(exclude, include)
+                if steps:
+                    if include > exclude:
+                        yield f"dp[{i}][{w}] = {dp[i][w]} (Include item {i-1}: profit={profits[i-1]}, weight={weights[i-1]}; compare {exclude} (exclude) vs {include} (include))"
+                    else:
+                        yield f"dp[{i}][{w}] = {dp[i][w]} (Exclude item {i-1}: profit={profits[i-1]}, weight={weights[i-1]}; compare {exclude} (exclude) vs {include} (include))"
+                elif counting:
+                    comparisons += 1
+            else:
+                dp[i][w] = dp[i-1][w]
+                if steps:
+                    yield f"dp[{i}][{w}] = {dp[i][w]} (Cannot include item {i-1}: weight={weights[i-1]} > capacity {w}; carry over {dp[i-1][w]})"
+    # Traceback to find selected items
+    res = dp[n][W]
+    w = W
+    items = []
+    for i in range(n, 0, -1):
+        if dp[i][w] != dp[i-1][w]:
+            items.append(i-1)
+            w -= weights[i-1]
+    items.reverse()
+    if steps:
+        yield f"Selected items: {items}"
+    if counting:
+        # Every cell past row 0 is written once; the traceback compares once per row
+        outputs['counts'] = {'comparisons': comparisons + n, 'writes': n * (W+1)}
+    return res, dp, items
+
+def lean_knapsack_result(data, weights, profits, capacity):
+    # O(W) values + 1 bit per table cell; the table itself only on request (table=1),
+    # sampled down to table_size rows/columns if given
+    table_limit = None
+    if request_flag(data, 'table') or request_option(data, 'table_size'):
+        table_limit = int(request_option(data, 'table_size', 0)) or max(len(weights), capacity) + 1
+    res, items, table = compute(knapsack_engine.knapsack_lean, weights, profits, capacity, table_limit)
+    payload = {'result': res, 'items': items, 'mode': 'lean'}
+    if table is not None:
+        payload['matrix'] = table['values']
+        payload['matrix_rows'] = table['rows']
+        payload['matrix_cols'] = table['cols']
+    return payload
 
 @app.route('/api/knapsack', methods=['POST'])
+@admitted(scheduler.knapsack_cost)
+@cached_endpoint
 def api_knapsack():
     data = request.get_json()
     weights = data.get('weights')
@@ -438,144 +1526,466 @@ def api_knapsack():
     if not (isinstance(weights, list) and isinstance(profits, list) and isinstance(capacity, int)):
         return jsonify({'error': 'Input must be weights (list), profits (list), and capacity (int).'}), 400
     try:
-        n = len(weights)
-        W = capacity
-        dp = [[0]*(W+1) for _ in range(n+1)]
-        steps = []
-        for i in range(1, n+1):
-            for w in range(W+1):
-                if weights[i-1] <= w:
-                    include = profits[i-1] + dp[i-1][w-weights[i-1]]
-                    exclude = dp[i-1][w]
-                    dp[i][w] = max(exclude, include)
-                    if include > exclude:
-                        steps.append(f"dp[{i}][{w}] = {dp[i][w]} (Include item {i-1}: profit={profits[i-1]}, weight={weights[i-1]}; compare {exclude} (exclude) vs {include} (include))")
-                    else:
-                        steps.append(f"dp[{i}][{w}] = {dp[i][w]} (Exclude item {i-1}: profit={profits[i-1]}, weight={weights[i-1]}; compare {exclude} (exclude) vs {include} (include))")
-                else:
-                    dp[i][w] = dp[i-1][w]
-                    steps.append(f"dp[{i}][{w}] = {dp[i][w]} (Cannot include item {i-1}: weight={weights[i-1]} > capacity {w}; carry over {dp[i-1][w]})")
-        # Traceback to find selected items
-        res = dp[n][W]
-        w = W
-        items = []
-        for i in range(n, 0, -1):
-            if dp[i][w] != dp[i-1][w]:
-                items.append(i-1)
-                w -= weights[i-1]
-        items.reverse()
-        steps.append(f"Selected items: {items}")
-        return jsonify({'result': res, 'matrix': dp, 'items': items, 'steps': steps})
+        with g.timer.phase('validate'):
+            knapsack_engine.validate(weights, profits, capacity)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        # Counted on the kernel that answers: the lean one, or the full traced table
+        if request_option(data, 'mode') == 'lean' or downgraded():
+            res, counts = count_ops(data, opcount.knapsack_lean, weights, profits, capacity)
+            if metrics_only(data):
+                return jsonify({'result': res[0], 'items': res[1], 'mode': 'lean', 'metrics': counts})
+            payload = with_metrics(lean_knapsack_result, counts)(data, weights, profits, capacity)
+            return stream_result(payload) if wants_stream() else jsonify(payload)
+        res, counts = count_ops(data, opcount.counted, iter_knapsack_steps, weights, profits, capacity)
+        if metrics_only(data):
+            return jsonify({'result': res[0], 'items': res[2], 'metrics': counts})
+        finish = with_metrics(lambda res: {'result': res[0], 'matrix': res[1], 'items': res[2]}, counts)
+        if wants_stream():
+            return stream_steps(iter_knapsack_steps, (weights, profits, capacity), finish)
+        steps, res = run_trace(iter_knapsack_steps, weights, profits, capacity)
+        return jsonify(finish(res) | {'steps': steps})
+    except Exception as e:
+        return error_response(e)
+
+@app.route('/api/knapsack/batch', methods=['POST'])
+@admitted(scheduler.batch_cost(scheduler.knapsack_cost))
+@cached_endpoint
+def api_knapsack_batch():
+    # Result-only, on the lean NumPy kernel
+    def prepare(item):
+        weights, profits, capacity = item.get('weights'), item.get('profits'), item.get('capacity')
+        if not (isinstance(weights, list) and isinstance(profits, list) and isinstance(capacity, int)):
+            raise ValueError('Input must be weights (list), profits (list), and capacity (int).')
+        with g.timer.phase('validate'):
+            knapsack_engine.validate(weights, profits, capacity)
+        return weights, profits, capacity
+    return batch_endpoint(prepare, knapsack_engine.knapsack_lean, lambda res: {'result': res[0], 'items': res[1]})
+
+def iter_fibonacci_steps(n, mod, base):
+    gen = recurrence.fib_doubling(n, mod)
+    suffix = f' (mod {mod})' if mod else ''
+    while True:
+        try:
+            bit, k, a, b = next(gen)
+        except StopIteration as stop:
+            f = stop.value[0]
+            break
+        rule = 'double and add one' if bit == '1' else 'double'
+        yield f"Bit {bit}: {rule}, F({k}) = {recurrence.brief(a)}, F({k + 1}) = {recurrence.brief(b)}{suffix}"
+    yield f"F({n}) = {recurrence.brief(f)}{suffix}"
+    return recurrence.output(f, base)
+
+def iter_recurrence_steps(coefficients, initial, n, mod, base):
+    gen = recurrence.recurrence_steps(coefficients, n, mod)
+    if gen is None:
+        value = initial[n] % mod if mod else initial[n]
+        yield f"a({n}) is an initial value: {value}"
+        return recurrence.output(value, base)
+    fib = tuple(coefficients) == (1, 1)
+    if fib:
+        yield "Coefficients (1, 1): a(n) = a(0) F(n-1) + a(1) F(n), by fast doubling"
+    while True:
+        try:
+            step = next(gen)
+        except StopIteration as stop:
+            solved = stop.value
+            break
+        if fib:
+            bit, k, a, b = step
+            yield f"Bit {bit}: F({k}) = {recurrence.brief(a)}, F({k + 1}) = {recurrence.brief(b)}"
+        else:
+            bit, m, poly = step
+            action = 'square, times x' if bit == '1' else 'square'
+            yield f"Bit {bit}: {action}, x^{m} mod P = [{', '.join(recurrence.brief(c) for c in poly)}]"
+    value = recurrence.combine(coefficients, initial, n, mod, solved)
+    yield f"a({n}) = {recurrence.brief(value)}" + (f' (mod {mod})' if mod else '')
+    return recurrence.output(value, base)
+
+def output_base(data):
+    return 16 if str(request_option(data, 'base', 10)) == '16' else 10
+
+def recurrence_response(data, coefficients, initial, n, mod, make_gen, args):
+    # result-only through the memoized solver, or the per-bit trace (include=steps,
+    # the default) with the same result
+    base = output_base(data)
+    try:
+        with g.timer.phase('validate'):
+            recurrence.validate(coefficients, initial, n, mod)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        finish = lambda res: {'result': res}
+        if 'steps' not in requested_outputs(data, ('steps',)) and not wants_stream():
+            return jsonify(finish(compute(recurrence.value, coefficients, initial, n, mod, base)))
+        if wants_stream():
+            return stream_steps(make_gen, (*args, mod, base), finish)
+        steps, res = run_trace(make_gen, *args, mod, base)
+        return jsonify(with_steps(finish(res), steps))
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+@app.route('/api/fibonacci', methods=['POST'])
+@admitted(scheduler.fibonacci_cost)
+@cached_endpoint
+def api_fibonacci():
+    # {"n": ..., "mod": optional}: F(n) by fast doubling
+    data = request.get_json()
+    n = data.get('n')
+    return recurrence_response(data, [1, 1], [0, 1], n, data.get('mod'), iter_fibonacci_steps, (n,))
+
+@app.route('/api/recurrence', methods=['POST'])
+@admitted(scheduler.recurrence_cost)
+@cached_endpoint
+def api_recurrence():
+    # {"coefficients": [c1..ck], "initial": [a0..a(k-1)], "n": ..., "mod": optional}:
+    # a(n) for a(i) = c1 a(i-1) + ... + ck a(i-k)
+    data = request.get_json()
+    coefficients, initial, n = data.get('coefficients'), data.get('initial'), data.get('n')
+    return recurrence_response(data, coefficients, initial, n, data.get('mod'), iter_recurrence_steps, (coefficients, initial, n))
+
+def mst_final(res):
+    return {'edges': res[0], 'total': res[1]}
+
+def iter_prims_steps(graph, emit='steps', outputs=None):
+    # Heap Prim from node 0, pushing every edge to an unselected node (the mst.py
+    # strategies serve /api/mst); emit='counts' as in iter_knapsack_steps
+    import heapq
+    steps, counting = emit == 'steps', emit == 'counts'
+    n = graph.n
+    selected = [False]*n
+    edges = []
+    min_e = [(0, 0, -1)] if n else [] # (cost, to, from)
+    total = 0
+    scans = pushes = pops = 0
+    pushes += len(min_e)
+    while min_e:
+        cost, u, frm = heapq.heappop(min_e)
+        if counting:
+            pops += 1
+        if selected[u]: continue
+        selected[u] = True
+        if frm != -1:
+            edges.append((frm, u, cost))
+            total += cost
+            if steps:
+                yield f"Add edge ({frm}, {u}) with cost {cost}"
+        for v, w in graph.neighbors(u):
+            if counting:
+                scans += 1
+            if not selected[v]:
+                heapq.heappush(min_e, (w, v, u))
+                if counting:
+                    pushes += 1
+    if steps:
+        yield f"MST edges: {edges}, total cost: {total}"
+    if counting:
+        outputs['counts'] = {'edge_scans': scans, 'heap_pushes': pushes, 'heap_pops': pops}
+    return edges, total
 
 @app.route('/api/prims', methods=['POST'])
+@admitted(scheduler.prims_cost)
+@cached_endpoint
 def api_prims():
     data = request.get_json()
-    matrix = data.get('matrix')
-    if not (isinstance(matrix, list) and all(isinstance(row, list) and len(row) == len(matrix) for row in matrix)):
-        return jsonify({'error': 'Input must be a square adjacency matrix.'}), 400
     try:
-        import heapq
-        n = len(matrix)
-        selected = [False]*n
-        edges = []
-        min_e = [(0, 0, -1)] # (cost, to, from)
-        total = 0
-        steps = []
-        while min_e:
-            cost, u, frm = heapq.heappop(min_e)
-            if selected[u]: continue
-            selected[u] = True
-            if frm != -1:
-                edges.append((frm, u, cost))
-                total += cost
-                steps.append(f"Add edge ({frm}, {u}) with cost {cost}")
-            for v in range(n):
-                if not selected[v] and matrix[u][v] and matrix[u][v] != float('inf'):
-                    heapq.heappush(min_e, (matrix[u][v], v, u))
-        steps.append(f"MST edges: {edges}, total cost: {total}")
-        return jsonify({'edges': edges, 'total': total, 'steps': steps})
+        with g.timer.phase('validate'):
+            graph = parse_graph(data, undirected=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        res, counts = count_ops(data, opcount.counted, iter_prims_steps, graph)
+        if metrics_only(data):
+            return jsonify(dict(mst_final(res), metrics=counts))
+        finish = with_metrics(mst_final, counts)
+        if wants_stream():
+            return stream_steps(iter_prims_steps, (graph,), finish)
+        steps, res = run_trace(iter_prims_steps, graph)
+        return jsonify(with_steps(finish(res), steps))
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+def iter_kruskal_steps(graph, emit='steps', outputs=None):
+    steps, counting = emit == 'steps', emit == 'counts'
+    n = graph.n
+    # Each undirected edge once, from its lower endpoint (the upper triangle of a matrix)
+    edges = [(w, u, v) for u, v, w in graph.edges() if u < v]
+    edges.sort()
+    dsu = mst_engine.DisjointSet(n)
+    mst = []
+    total = 0
+    for cost, u, v in edges:
+        if dsu.union(u, v):
+            mst.append((u, v, cost))
+            total += cost
+            if steps:
+                yield f"Add edge ({u}, {v}) with cost {cost}"
+    if steps:
+        yield f"MST edges: {mst}, total cost: {total}"
+    if counting:
+        # Two finds per union attempt, and the loop sees every edge
+        outputs['counts'] = {'edges_sorted': len(edges), 'finds': 2 * len(edges), 'unions': len(mst)}
+    return mst, total
 
 @app.route('/api/kruskal', methods=['POST'])
+@admitted(scheduler.kruskal_cost)
+@cached_endpoint
 def api_kruskal():
     data = request.get_json()
-    matrix = data.get('matrix')
-    if not (isinstance(matrix, list) and all(isinstance(row, list) and len(row) == len(matrix) for row in matrix)):
-        return jsonify({'error': 'Input must be a square adjacency matrix.'}), 400
     try:
-        n = len(matrix)
-        edges = []
-        for i in range(n):
-            for j in range(i+1, n):
-                if matrix[i][j] and matrix[i][j] != float('inf'):
-                    edges.append((matrix[i][j], i, j))
-        edges.sort()
-        parent = list(range(n))
-        def find(u):
-            while parent[u] != u:
-                parent[u] = parent[parent[u]]
-                u = parent[u]
-            return u
-        mst = []
-        total = 0
-        steps = []
-        for cost, u, v in edges:
-            pu, pv = find(u), find(v)
-            if pu != pv:
-                parent[pu] = pv
-                mst.append((u, v, cost))
-                total += cost
-                steps.append(f"Add edge ({u}, {v}) with cost {cost}")
-        steps.append(f"MST edges: {mst}, total cost: {total}")
-        return jsonify({'edges': mst, 'total': total, 'steps': steps})
+        with g.timer.phase('validate'):
+            graph = parse_graph(data, undirected=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        res, counts = count_ops(data, opcount.counted, iter_kruskal_steps, graph)
+        if metrics_only(data):
+            return jsonify(dict(mst_final(res), metrics=counts))
+        finish = with_metrics(mst_final, counts)
+        if wants_stream():
+            return stream_steps(iter_kruskal_steps, (graph,), finish)
+        steps, res = run_trace(iter_kruskal_steps, graph)
+        return jsonify(with_steps(finish(res), steps))
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+@app.route('/api/mst', methods=['POST'])
+@admitted(scheduler.mst_cost)
+@cached_endpoint
+def api_mst():
+    # Result-only minimum spanning forest; strategy=auto (default) picks one of
+    # mst.STRATEGIES from the graph's density, and the response says which
+    data = request.get_json()
+    strategy = request_option(data, 'strategy', 'auto')
+    if strategy != 'auto' and strategy not in mst_engine.STRATEGIES:
+        return jsonify({'error': f"strategy must be auto or one of {', '.join(mst_engine.STRATEGIES)}."}), 400
+    try:
+        with g.timer.phase('validate'):
+            graph = parse_graph(data, undirected=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        u, v, w, ids = mst_engine.edge_arrays(graph)
+        if strategy == 'auto':
+            strategy = mst_engine.choose(graph.n, len(ids))
+        elif strategy == 'dense-prim' and graph.n > mst_engine.DENSE_MAX_NODES:
+            return jsonify({'error': f'dense-prim is limited to {mst_engine.DENSE_MAX_NODES} nodes.'}), 400
+        counts = None
+        if metrics_only(data) or request_flag(data, 'metrics'):
+            # Counted on the chosen strategy's kernel, run in one piece
+            picked, counts = compute(opcount.spanning_forest, strategy, graph.n, u, v, w)
+        elif strategy == 'boruvka' and worker_pool.enabled and worker_pool.size > 1 and len(ids) > mst_engine.CHUNK_EDGES:
+            # Each round's component-minimum scan is spread over the workers; the
+            # rounds' merges run here
+            minima = lambda chunks, comp: compute_chunks(mst_engine.component_minima, chunks, comp)
+            picked = mst_engine.boruvka(graph.n, u, v, w, minima, max(1, worker_pool.size))
+        else:
+            picked = compute(mst_engine.spanning_forest, strategy, graph.n, u, v, w)
+        edges, total = mst_engine.forest_edges(graph, u, v, ids, picked)
+        payload = {
+            'edges': edges,
+            'total': total,
+            'components': graph.n - len(edges),
+            'strategy': strategy,
+            'density': mst_engine.density(graph.n, len(ids)),
+        }
+        return jsonify(payload if counts is None else dict(payload, metrics=counts))
+    except Exception as e:
+        return error_response(e)
+
+def iter_dijkstra_steps(graph, source, emit='steps', outputs=None):
+    # (distances, prev); emit='counts' as in iter_knapsack_steps, emit=None for the
+    # result alone (dijkstra_sources)
+    import heapq
+    steps, counting = emit == 'steps', emit == 'counts'
+    n = graph.n
+    dist = [float('inf')]*n
+    prev = [None]*n
+    dist[source] = 0
+    hq = [(0, source)]
+    relaxations = updates = pops = 0
+    if steps:
+        yield f"Start from source {source}"
+    while hq:
+        d, u = heapq.heappop(hq)
+        if counting:
+            pops += 1
+        if d > dist[u]: continue
+        if steps:
+            yield f"Visit node {u} with current distance {d}"
+        for v, w in graph.neighbors(u):
+            alt = dist[u] + w
+            if counting:
+                relaxations += 1
+            if alt < dist[v]:
+                dist[v] = alt
+                prev[v] = u
+                heapq.heappush(hq, (alt, v))
+                if steps:
+                    yield f"Update distance of {v} to {alt} via {u}"
+                elif counting:
+                    updates += 1
+    if steps:
+        yield f"Distances: {dist}"
+        yield f"Predecessors: {prev}"
+    if counting:
+        # Every update pushed once, after the source's push
+        outputs['counts'] = {'relaxations': relaxations, 'writes': updates, 'heap_pushes': updates + 1, 'heap_pops': pops}
+    return dist, prev
+
+def dijkstra_sources(sources, graph):
+    # (distances, prev) per source, from iter_dijkstra_steps without the steps
+    return [trace_result(iter_dijkstra_steps, graph, source, None) for source in sources]
+
+def dijkstra_item(graph, sources):
+    # One /api/dijkstra/batch input: (distances, prev), or a list of them for "sources"
+    if isinstance(sources, int):
+        return trace_result(iter_dijkstra_steps, graph, sources, None)
+    return dijkstra_sources(sources, graph)
+
+def dijkstra_source_list(data, graph):
+    # "sources": [...] (many sources, result-only) or "source" (default 0)
+    sources = data.get('sources')
+    if sources is None:
+        sources = data.get('source', 0)
+        if not (isinstance(sources, int) and 0 <= sources < graph.n):
+            raise ValueError('source must be a node index.')
+        return sources
+    if not (isinstance(sources, list) and all(isinstance(s, int) and 0 <= s < graph.n for s in sources)):
+        raise ValueError('sources must be a list of node indices.')
+    return sources
+
+def array_form(data):
+    # How Dijkstra sends distances/prev: plain lists with arrays=list, otherwise typed
+    # arrays (raw ones in a binary response)
+    if request_option(data, 'arrays', 'typed') == 'list':
+        return 'list'
+    return 'array' if binary_response() else 'typed'
+
+def spt_payload(data, graph_hash, source, dist, prev):
+    # O(n) result: distances and prev (typed arrays unless arrays=list) plus the id of
+    # the cached tree for path queries; the explicit paths only with paths=1
+    form = array_form(data)
+    payload = {
+        'source': source,
+        'distances': spt.distances(dist, form),
+        'prev': spt.predecessors(prev, form),
+        'tree': keep_session(spt_trees, (source, dist, prev), spt.tree_id(graph_hash, source)),
+    }
+    if request_flag(data, 'paths'):
+        payload['paths'] = spt.all_paths(prev, dist)
+    return payload
 
 @app.route('/api/dijkstra', methods=['POST'])
+@admitted(scheduler.dijkstra_cost)
+@cached_endpoint
 def api_dijkstra():
     data = request.get_json()
-    matrix = data.get('matrix')
-    source = data.get('source', 0)
-    if not (isinstance(matrix, list) and all(isinstance(row, list) and len(row) == len(matrix) for row in matrix)):
-        return jsonify({'error': 'Input must be a square adjacency matrix.'}), 400
     try:
-        import heapq
-        n = len(matrix)
-        dist = [float('inf')]*n
-        prev = [None]*n
-        dist[source] = 0
-        hq = [(0, source)]
-        steps = [f"Start from source {source}"]
-        while hq:
-            d, u = heapq.heappop(hq)
-            if d > dist[u]: continue
-            steps.append(f"Visit node {u} with current distance {d}")
-            for v in range(n):
-                if matrix[u][v] and matrix[u][v] != float('inf'):
-                    alt = dist[u] + matrix[u][v]
-                    if alt < dist[v]:
-                        dist[v] = alt
-                        prev[v] = u
-                        heapq.heappush(hq, (alt, v))
-                        steps.append(f"Update distance of {v} to {alt} via {u}")
-        # Reconstruct paths
-        paths = []
-        for t in range(n):
-            if dist[t] == float('inf'): continue
-            path = []
-            x = t
-            while x is not None:
-                path.append(x)
-                x = prev[x]
-            paths.append(path[::-1])
-        steps.append(f"Distances: {dist}")
-        steps.append(f"Paths: {paths}")
-        return jsonify({'distances': dist, 'paths': paths, 'steps': steps})
+        with g.timer.phase('validate'):
+            graph = parse_graph(data)
+        source = dijkstra_source_list(data, graph)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    graph_hash = spt.graph_key(data)
+    if isinstance(source, list):
+        # Many sources on one parsed graph, split across the workers
+        try:
+            trees = [r for chunk in compute_chunks(dijkstra_sources, batch.split(source, max(1, worker_pool.size), 1), graph) for r in chunk]
+            return jsonify({'results': [spt_payload(data, graph_hash, s, *tree) for s, tree in zip(source, trees)]})
+        except Exception as e:
+            return error_response(e)
+    try:
+        res, counts = count_ops(data, opcount.counted, iter_dijkstra_steps, graph, source)
+        if metrics_only(data):
+            return jsonify({'distances': spt.distances(res[0], array_form(data)), 'metrics': counts})
+        finish = with_metrics(lambda res: spt_payload(data, graph_hash, source, *res), counts)
+        if wants_stream():
+            return stream_steps(iter_dijkstra_steps, (graph, source), finish)
+        steps, res = run_trace(iter_dijkstra_steps, graph, source)
+        return jsonify(with_steps(finish(res), steps))
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+@app.route('/api/dijkstra/trees/<tree_id>', methods=['GET'])
+def api_dijkstra_tree(tree_id):
+    # ?target=v gives the path to v and its distance (repeat target for several);
+    # without a target, the whole tree
+    entry = spt_trees.get(tree_id)
+    if entry is None:
+        return jsonify({'error': f'No shortest-path tree {tree_id!r}; it may have expired. Send the Dijkstra request again with cache=0.'}), 404
+    (source, dist, prev), _ = entry
+    payload = {'tree': tree_id, 'source': source, 'n': len(dist)}
+    targets = request.args.getlist('target', type=int)
+    if not all(0 <= t < len(dist) for t in targets):
+        return jsonify({'error': 'target must be a node index.'}), 400
+    answers = [{'target': t, 'distance': spt.distances([dist[t]], 'list')[0], 'path': spt.path_to(prev, dist, t)} for t in targets]
+    if len(answers) == 1:
+        payload.update(answers[0])
+    elif answers:
+        payload['results'] = answers
+    else:
+        form = array_form({})
+        payload.update(distances=spt.distances(dist, form), prev=spt.predecessors(prev, form))
+    return jsonify(payload)
+
+@app.route('/api/dijkstra/batch', methods=['POST'])
+@admitted(scheduler.batch_cost(scheduler.dijkstra_cost))
+@cached_endpoint
+def api_dijkstra_batch():
+    def prepare(item):
+        with g.timer.phase('validate'):
+            graph = parse_graph(item)
+        return graph, dijkstra_source_list(item, graph)
+    def finish(item, res):
+        graph_hash = spt.graph_key(item)
+        if isinstance(res, tuple):
+            return spt_payload(item, graph_hash, item.get('source', 0), *res)
+        return {'results': [spt_payload(item, graph_hash, s, *tree) for s, tree in zip(item['sources'], res)]}
+    return batch_endpoint(prepare, dijkstra_item, finish, with_input=True)
+
+@app.route('/api/benchmark', methods=['GET'])
+def api_benchmark():
+    # Baselines written by backend/benchmark.py --save NAME
+    try:
+        names = sorted(f[:-len('.json')] for f in os.listdir(BENCHMARK_BASELINE_DIR) if f.endswith('.json'))
+    except FileNotFoundError:
+        names = []
+    name = request.args.get('name')
+    if name is not None:
+        if name not in names:
+            return jsonify({'error': f'No benchmark baseline named {name!r}.'}), 404
+        with open(os.path.join(BENCHMARK_BASELINE_DIR, f'{name}.json')) as f:
+            return jsonify(json.load(f))
+    summary = {}
+    for n in names:
+        with open(os.path.join(BENCHMARK_BASELINE_DIR, f'{n}.json')) as f:
+            report = json.load(f)
+        summary[n] = {
+            'created': report.get('created'),
+            'platform': report.get('platform'),
+            'host': report.get('host'),
+            'fits': {alg: {shape: res['fit']['class'] for shape, res in shapes.items()} for alg, shapes in report['results'].items()},
+        }
+    return jsonify({'baselines': summary})
+
+def main():
+    parser = argparse.ArgumentParser(description='Algorithm Analyzer API server.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5002)
+    parser.add_argument('--threads', type=int, default=None,
+                        help='request threads (default: worker pool size + 4)')
+    parser.add_argument('--dev', action='store_true',
+                        help='run the Flask development server with debug and reload')
+    args = parser.parse_args()
+    if args.dev:
+        app.run(host=args.host, port=args.port, debug=True)
+        return
+    # Request threads only parse, wait and serialize; the algorithms run in worker_pool
+    from waitress import serve
+    worker_pool.start()
+    serve(app, host=args.host, port=args.port, threads=args.threads or worker_pool.size + 4)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5002, debug=True)
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,274 @@
+# NumPy all-pairs shortest paths (Floyd-Warshall) engine.
+#
+# Each k-iteration is a single broadcast: dist = min(dist, dist[:, k] + dist[k, :]).
+# Distances are float64 with np.inf for "no path"; integral inputs are converted
+# back to Python ints when serialized so responses look the same as before.
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+INF = float('inf')
+DEFAULT_TILE_SIZE = 256
+
+def dist_array(matrix):
+    # Adjacency matrix (0 off the diagonal = no edge) -> (float64 distance matrix, integral?)
+    raw = np.asarray(matrix)
+    if raw.size == 0:
+        raw = raw.reshape(0, 0)
+    if raw.ndim != 2 or raw.shape[0] != raw.shape[1]:
+        raise ValueError('Input must be a square adjacency matrix.')
+    if raw.size and raw.dtype.kind not in 'biuf':
+        raise ValueError('Matrix entries must be numbers.')
+    dist = raw.astype(np.float64)
+    if np.isnan(dist).any() or np.isneginf(dist).any():
+        raise ValueError('Matrix entries must be finite numbers or Infinity.')
+    dist[dist == 0] = np.inf
+    np.fill_diagonal(dist, 0)
+    return dist, raw.dtype.kind != 'f'
+
+def floyd_warshall(dist):
+    # Result only, in place
+    for k in range(dist.shape[0]):
+        np.minimum(dist, dist[:, k, None] + dist[None, k, :], out=dist)
+    return dist
+
+def floyd_warshall_bands(dist, rows=256):
+    # floyd_warshall for memory-mapped matrices: each k goes through bands of rows
+    # against copies of row and column k, so no n x n temporary is allocated
+    n = dist.shape[0]
+    for k in range(n):
+        row = np.array(dist[k])
+        col = np.array(dist[:, k])
+        for r0 in range(0, n, rows):
+            band = dist[r0:r0 + rows]
+            np.minimum(band, col[r0:r0 + rows, None] + row[None, :], out=band)
+    return dist
+
+def floyd_warshall_updates(dist):
+    # In place; yields (k, rows, cols, old, new) for the cells improved by each k,
+    # found by diffing the iteration instead of testing cells one at a time
+    for k in range(dist.shape[0]):
+        cand = dist[:, k, None] + dist[None, k, :]
+        rows, cols = np.nonzero(cand < dist)
+        old = dist[rows, cols]
+        new = cand[rows, cols]
+        dist[rows, cols] = new
+        yield k, rows, cols, old, new
+
+def _relax_tile(dist, r0, r1, c0, c1, k0, k1):
+    # dist[r0:r1, c0:c1] = min(., dist[r0:r1, k] + dist[k, c0:c1]) for k in [k0, k1), in order.
+    # The same kernel serves all three phases of blocked Floyd-Warshall.
+    tile = dist[r0:r1, c0:c1]
+    for k in range(k0, k1):
+        np.minimum(tile, dist[r0:r1, k, None] + dist[None, k, c0:c1], out=tile)
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: pool workers share the parent's resource tracker, which
+        # already owns this block, so registering it again is harmless
+        return shared_memory.SharedMemory(name=name)
+
+def _relax_tiles_shared(name, n, tiles, k0, k1):
+    shm = _attach(name)
+    try:
+        dist = np.ndarray((n, n), dtype=np.float64, buffer=shm.buf)
+        for r0, r1, c0, c1 in tiles:
+            _relax_tile(dist, r0, r1, c0, c1, k0, k1)
+        del dist
+    finally:
+        shm.close()
+
+def _blocks(n, tile_size):
+    return [(b, min(b + tile_size, n)) for b in range(0, n, tile_size)]
+
+def _blocked_phases(n, tile_size):
+    # For every diagonal block: the diagonal tile, then its row and column tiles,
+    # then all remaining tiles grouped by row band. Tiles within a phase are independent.
+    blocks = _blocks(n, tile_size)
+    for kb, (k0, k1) in enumerate(blocks):
+        others = [blk for idx, blk in enumerate(blocks) if idx != kb]
+        cross = [(k0, k1, c0, c1) for c0, c1 in others] + [(r0, r1, k0, k1) for r0, r1 in others]
+        bands = [[(r0, r1, c0, c1) for c0, c1 in others] for r0, r1 in others]
+        yield k0, k1, [[(k0, k1, k0, k1)]], [[tile] for tile in cross], bands
+
+def blocked_floyd_warshall(dist, tile_size=DEFAULT_TILE_SIZE, workers=None):
+    # Tiled Floyd-Warshall; the independent tiles of phases 2 and 3 are spread over a
+    # process pool that shares one distance matrix. Returns a new array.
+    n = dist.shape[0]
+    tile_size = max(1, int(tile_size))
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(int(workers or cpus), cpus))
+    if workers == 1 or n <= tile_size:
+        out = np.array(dist, dtype=np.float64)
+        for k0, k1, diag, cross, bands in _blocked_phases(n, tile_size):
+            for group in diag + cross + bands:
+                for tile in group:
+                    _relax_tile(out, *tile, k0, k1)
+        return out
+    shm = shared_memory.SharedMemory(create=True, size=max(dist.nbytes, 1))
+    try:
+        shared = np.ndarray((n, n), dtype=np.float64, buffer=shm.buf)
+        shared[:] = dist
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for k0, k1, diag, cross, bands in _blocked_phases(n, tile_size):
+                for phase in (diag, cross, bands):
+                    futures = [pool.submit(_relax_tiles_shared, shm.name, n, group, k0, k1) for group in phase]
+                    for future in futures:
+                        future.result()
+        out = shared.copy()
+        del shared
+        return out
+    finally:
+        shm.close()
+        shm.unlink()
+
+def negative_cycle_nodes(dist):
+    # Nodes that lie on (or reach themselves through) a negative cycle
+    return np.flatnonzero(np.diagonal(dist) < 0).tolist()
+
+def scalar(x, integral):
+    if integral and x != INF:
+        return int(x)
+    return x
+
+def matrix_to_list(dist, integral):
+    rows = dist.tolist()
+    if not integral:
+        return rows
+    return [[x if x == INF else int(x) for x in row] for row in rows]
+
+# An increase falls back to a full Floyd-Warshall once the affected block would
+# cost more than this share of it (rows * cols^2 against n^3; a block cell costs
+# a few times a Floyd-Warshall cell)
+INCREMENTAL_BLOCK_FRACTION = 0.4
+
+class IncrementalAPSP:
+    # Keeps the adjacency (weights, inf = no edge) and its distance matrix so single
+    # edge edits don't rerun Floyd-Warshall. A decrease to w only improves pairs
+    # (i, j) with dist[i, u] + w + dist[v, j] < dist[i, j], which is one O(n^2)
+    # broadcast over the rows that get closer to v and the columns u gets closer to.
+    # An increase (or removal) of a tight edge only invalidates pairs whose shortest
+    # path ran through it; that block is repaired Dijkstra-style from the entries
+    # that stay valid, or by a full Floyd-Warshall when the block is too large or
+    # negative weights rule Dijkstra out.
+    def __init__(self, dist, integral=True):
+        self.weights = dist.copy()
+        self.dist = floyd_warshall(dist)
+        self.integral = integral
+        self.negative_cycle = bool(negative_cycle_nodes(self.dist))
+
+    @property
+    def n(self):
+        return self.dist.shape[0]
+
+    def _check(self, u):
+        if not isinstance(u, int) or isinstance(u, bool) or not 0 <= u < self.n:
+            raise ValueError(f'Node index {u!r} is out of range for {self.n} nodes.')
+
+    def set_edge(self, u, v, w):
+        # w=None (or inf) removes the edge. Returns how the update was applied:
+        # {'strategy': 'none' | 'decrease' | 'block' | 'full', 'changed': cells, 'rows': rows touched}
+        self._check(u)
+        self._check(v)
+        if u == v:
+            raise ValueError('The diagonal of the distance matrix is always 0.')
+        if w is None:
+            w = INF
+        if not isinstance(w, (int, float)) or isinstance(w, bool) or w != w or w == -INF:
+            raise ValueError(f'Edge weight {w!r} is not a number.')
+        if w != INF and w != int(w):
+            self.integral = False
+        old = self.weights[u, v]
+        self.weights[u, v] = w
+        if self.negative_cycle:
+            return self._recompute()
+        if w < old:
+            return self._decrease(u, v, w)
+        if w > old:
+            return self._increase(u, v, old)
+        return {'strategy': 'none', 'changed': 0, 'rows': 0}
+
+    def _decrease(self, u, v, w):
+        dist = self.dist
+        if w + dist[v, u] < 0:
+            return self._recompute()
+        rows = np.flatnonzero(dist[:, u] + w < dist[:, v])
+        cols = np.flatnonzero(w + dist[v, :] < dist[u, :])
+        if not len(rows) or not len(cols):
+            return {'strategy': 'none', 'changed': 0, 'rows': 0}
+        block = dist[np.ix_(rows, cols)]
+        cand = dist[rows, u, None] + w + dist[None, v, cols]
+        changed = int((cand < block).sum())
+        dist[np.ix_(rows, cols)] = np.minimum(block, cand)
+        return {'strategy': 'decrease', 'changed': changed, 'rows': len(rows)}
+
+    def _increase(self, u, v, old):
+        dist = self.dist
+        if old > dist[u, v]:
+            # Not on any shortest path: the detour u ~> v is strictly shorter
+            return {'strategy': 'none', 'changed': 0, 'rows': 0}
+        # Only sources whose shortest path to v used the edge (rows) and targets
+        # reached from u through it (cols) can change
+        rows = np.flatnonzero(np.isfinite(dist[:, u]) & np.isclose(dist[:, u] + old, dist[:, v]))
+        cols = np.flatnonzero(np.isfinite(dist[v, :]) & np.isclose(old + dist[v, :], dist[u, :]))
+        if (len(rows) * len(cols) ** 2 > INCREMENTAL_BLOCK_FRACTION * self.n ** 3
+                or (self.weights < 0).any()):
+            return self._recompute()
+        block = dist[np.ix_(rows, cols)]
+        fresh = self._repair_block(rows, cols, block, u, v, old)
+        changed = int((fresh != block).sum())
+        dist[np.ix_(rows, cols)] = fresh
+        return {'strategy': 'block', 'changed': changed, 'rows': len(rows)}
+
+    def _repair_block(self, rows, cols, block, u, v, old):
+        # Ramalingam-Reps on the block, every row at once. Entries whose shortest
+        # path avoided the edge keep their distance and count as settled; the rest
+        # start from their best in-edge from a settled node and are then settled in
+        # order of distance (Dijkstra restricted to cols), O(rows * cols^2).
+        dist, weights = self.dist, self.weights
+        affected = np.isclose(dist[rows, u, None] + old + dist[None, v, cols], block)
+        affected &= rows[:, None] != cols[None, :]
+        known = dist[rows].copy()
+        known[np.ix_(np.arange(len(rows)), cols)] = np.where(affected, np.inf, block)
+        out = block.copy()
+        for c, j in enumerate(cols):
+            preds = np.flatnonzero(np.isfinite(weights[:, j]))
+            preds = preds[preds != j]
+            seed = (known[:, preds] + weights[preds, j]).min(axis=1) if len(preds) else np.inf
+            out[:, c] = np.where(affected[:, c], seed, out[:, c])
+        inner = weights[np.ix_(cols, cols)]
+        idx = np.arange(len(rows))
+        settled = ~affected
+        for _ in range(len(cols)):
+            pending = np.where(settled, np.inf, out)
+            nearest = pending.argmin(axis=1)
+            d = pending[idx, nearest]
+            live = np.isfinite(d)
+            if not live.any():
+                break
+            r, c = idx[live], nearest[live]
+            settled[r, c] = True
+            out[r] = np.minimum(out[r], d[live, None] + inner[c])
+        return out
+
+    def _recompute(self):
+        old = self.dist
+        self.dist = floyd_warshall(self.weights.copy())
+        self.negative_cycle = bool(negative_cycle_nodes(self.dist))
+        return {'strategy': 'full', 'changed': int((self.dist != old).sum()), 'rows': self.n}
+
+    def distance(self, u, v):
+        self._check(u)
+        self._check(v)
+        return scalar(self.dist[u, v], self.integral)
+
+    def row(self, u):
+        self._check(u)
+        return matrix_to_list(self.dist[u:u+1], self.integral)[0]
+
+    def result(self):
+        return matrix_to_list(self.dist, self.integral)
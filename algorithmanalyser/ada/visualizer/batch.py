@@ -0,0 +1,52 @@
+# Helpers for the /batch endpoints.
+#
+# A batch is split into contiguous chunks, one task per worker, and each chunk runs
+# its items one after another with per-item errors: (True, value) or (False, message).
+# Integer arrays are sorted together in one NumPy lexsort over (array id, value)
+# rather than one sort call each; every sort endpoint returns the same sorted list.
+import itertools
+
+import numpy as np
+
+INT64 = (-2**63, 2**63)
+
+def split(items, parts, min_size=32):
+    # At most `parts` contiguous chunks of at least min_size items (bar the last)
+    if not items:
+        return []
+    size = max(min_size, -(-len(items) // max(1, parts)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def run_each(chunk, func):
+    # func(*args) for every args tuple in chunk
+    out = []
+    for args in chunk:
+        try:
+            out.append((True, func(*args)))
+        except Exception as e:
+            out.append((False, str(e)))
+    return out
+
+def is_int_array(arr):
+    return all(type(x) is int and INT64[0] <= x < INT64[1] for x in arr)
+
+def sort_int_arrays(arrays):
+    if not arrays:
+        return []
+    lengths = np.fromiter(map(len, arrays), dtype=np.int64, count=len(arrays))
+    values = np.fromiter(itertools.chain.from_iterable(arrays), dtype=np.int64, count=int(lengths.sum()))
+    ids = np.repeat(np.arange(len(arrays)), lengths)
+    flat = values[np.lexsort((values, ids))].tolist()
+    ends = np.cumsum(lengths).tolist()
+    return [flat[start:end] for start, end in zip([0] + ends[:-1], ends)]
+
+def sort_each(chunk, func):
+    # run_each for sorts whose first argument is the array; integer arrays skip func
+    out = [None] * len(chunk)
+    ints = [k for k, args in enumerate(chunk) if is_int_array(args[0])]
+    for k, result in zip(ints, sort_int_arrays([chunk[k][0] for k in ints])):
+        out[k] = (True, result)
+    rest = [k for k in range(len(chunk)) if out[k] is None]
+    for k, result in zip(rest, run_each([chunk[k] for k in rest], func)):
+        out[k] = result
+    return out
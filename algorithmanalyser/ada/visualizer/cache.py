@@ -0,0 +1,78 @@
+# Content-addressed cache for algorithm endpoint responses.
+#
+# Entries are keyed by a SHA-256 of (endpoint, canonical JSON body, query options)
+# and hold the serialized response bytes. Eviction is LRU, bounded by the total
+# size of the stored bodies; entries can also expire after a TTL. An entry can carry
+# refs, the (store, id) sessions its body names, for the caller to check on a hit.
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+def cache_key(endpoint, data, options=None):
+    canonical = json.dumps([endpoint, data, sorted((options or {}).items())], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class ResultCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+        self.entries = OrderedDict()  # key -> (body, status, mimetype, expires, refs)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[3] is not None and entry[3] <= time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, status=200, mimetype='application/json', refs=()):
+        if len(body) > self.max_bytes:
+            return False
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (body, status, mimetype, expires, tuple(refs))
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+        return True
+
+    def _drop(self, key):
+        body = self.entries.pop(key)[0]
+        self.size -= len(body)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
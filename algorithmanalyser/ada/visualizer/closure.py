@@ -0,0 +1,81 @@
+# Transitive closure (Warshall) engine on boolean NumPy matrices.
+#
+# Each k-iteration is a single broadcast: reach |= reach[:, k] & reach[k, :].
+# The bitset engine packs every row into little-endian uint64 words (bit j of
+# row i = edge i -> j), so a k-step is "OR row k into every row with bit k set".
+import numpy as np
+
+WORD = np.dtype('<u8')
+
+def bool_array(matrix):
+    raw = np.asarray(matrix)
+    if raw.size == 0:
+        raw = raw.reshape(0, 0)
+    if raw.ndim != 2 or raw.shape[0] != raw.shape[1]:
+        raise ValueError('Input must be a square adjacency matrix.')
+    if raw.size and (raw.dtype.kind not in 'biuf' or not np.isin(raw, (0, 1)).all()):
+        raise ValueError('Matrix must contain only 0 or 1.')
+    return raw.astype(bool)
+
+def warshall(reach):
+    # Result only, in place
+    for k in range(reach.shape[0]):
+        reach |= reach[:, k, None] & reach[None, k, :]
+    return reach
+
+def warshall_updates(reach):
+    # In place; yields (k, rows, cols) for the cells newly set by each k
+    for k in range(reach.shape[0]):
+        added = reach[:, k, None] & reach[None, k, :] & ~reach
+        rows, cols = np.nonzero(added)
+        reach[rows, cols] = True
+        yield k, rows, cols
+
+def matrix_to_list(reach):
+    return reach.astype(np.uint8).tolist()
+
+def pack(reach):
+    # (rows, n) bool -> (rows, ceil(n/64)) uint64
+    rows, n = reach.shape
+    words = (n + 63) // 64
+    bits = np.zeros((rows, words * 64), dtype=bool)
+    bits[:, :n] = reach
+    return np.packbits(bits, axis=1, bitorder='little').view(WORD)
+
+def unpack(packed, n):
+    return np.unpackbits(packed.view(np.uint8), axis=1, count=n, bitorder='little').astype(bool)
+
+def from_bytes(blob, n):
+    # Row-major rows of ceil(n/8) bytes, bit j of a row (LSB first) = edge to node j
+    stride = (n + 7) // 8
+    raw = np.frombuffer(blob, dtype=np.uint8)
+    if n < 0 or raw.size != n * stride:
+        raise ValueError(f'Packed matrix must be {n} rows of {stride} bytes.')
+    words = (n + 63) // 64
+    out = np.zeros((n, words * 8), dtype=np.uint8)
+    out[:, :stride] = raw.reshape(n, stride)
+    if n % 8:
+        out[:, stride - 1] &= (1 << (n % 8)) - 1
+    return out.view(WORD)
+
+def to_bytes(packed, n):
+    return packed.view(np.uint8)[:, :(n + 7) // 8].tobytes()
+
+def bitset_warshall(packed):
+    # In place on the uint64 rows from pack()/from_bytes()
+    n = packed.shape[0]
+    one = np.uint64(1)
+    for k in range(n):
+        rows = np.flatnonzero((packed[:, k >> 6] >> np.uint64(k & 63)) & one)
+        if not rows.size:
+            continue
+        # Only the words where row k has bits can change
+        words = np.flatnonzero(packed[k])
+        if not words.size:
+            continue
+        lo, hi = words[0], words[-1] + 1
+        packed[rows, lo:hi] |= packed[k, lo:hi]
+    return packed
+
+def reachable(packed, u, v):
+    return bool((int(packed[u, v >> 6]) >> (v & 63)) & 1)
@@ -0,0 +1,148 @@
+# Dynamic DAGs whose topological order is kept up to date edge by edge.
+#
+# DynamicDAG maintains the order with the Pearce-Kelly algorithm: pos[u] is u's
+# index in the order and order[i] the node at index i. Inserting u -> v with
+# pos[u] < pos[v] changes nothing. Otherwise only the affected region between
+# pos[v] and pos[u] is searched: forward from v (nodes before u) and backward from
+# u (nodes after v). Reaching u from v means the edge would close a cycle, which is
+# reported before anything is modified; else the two visited sets are laid out
+# again on the positions they already held, backward set first. Removing an edge
+# never invalidates an order, so it is O(1).
+from collections import deque
+
+class CycleError(ValueError):
+    def __init__(self, message, cycle=None):
+        super().__init__(message)
+        self.cycle = cycle
+
+class DynamicDAG:
+    def __init__(self, n=0):
+        self.succ = [set() for _ in range(n)]
+        self.pred = [set() for _ in range(n)]
+        self.pos = list(range(n))
+        self.order = list(range(n))
+        self.edge_count = 0
+
+    @property
+    def n(self):
+        return len(self.order)
+
+    @classmethod
+    def from_graph(cls, graph):
+        # Initial order by Kahn's algorithm over the CSR graph, O(V + E)
+        dag = cls(graph.n)
+        indegree = graph.indegrees()
+        queue = deque(u for u in range(graph.n) if indegree[u] == 0)
+        order = []
+        while queue:
+            u = queue.popleft()
+            order.append(u)
+            for v, _ in graph.neighbors(u):
+                indegree[v] -= 1
+                if indegree[v] == 0:
+                    queue.append(v)
+        if len(order) != graph.n:
+            raise CycleError('Graph has a cycle; no topological order exists.')
+        dag.order = order
+        for i, u in enumerate(order):
+            dag.pos[u] = i
+        for u, v, _ in graph.edges():
+            if v not in dag.succ[u]:
+                dag.succ[u].add(v)
+                dag.pred[v].add(u)
+                dag.edge_count += 1
+        return dag
+
+    def _check(self, u):
+        if not isinstance(u, int) or isinstance(u, bool) or not 0 <= u < self.n:
+            raise ValueError(f'Node index {u!r} is out of range for {self.n} nodes.')
+
+    def add_nodes(self, count):
+        # New nodes have no edges, so they can go at the end of the order
+        start = self.n
+        for u in range(start, start + count):
+            self.succ.append(set())
+            self.pred.append(set())
+            self.pos.append(u)
+            self.order.append(u)
+        return list(range(start, start + count))
+
+    def add_edge(self, u, v):
+        # Returns the nodes that moved, as [(node, new position), ...]. Raises
+        # CycleError, leaving the DAG untouched, if the edge would close a cycle.
+        self._check(u)
+        self._check(v)
+        if u == v:
+            raise CycleError(f'Edge {u} -> {v} is a self-loop.', [u, u])
+        if v in self.succ[u]:
+            return []
+        pos = self.pos
+        lb, ub = pos[v], pos[u]
+        moved = []
+        if lb < ub:
+            forward = self._search_forward(v, u, ub)
+            backward = self._search_backward(u, lb)
+            moved = self._reorder(backward, forward)
+        self.succ[u].add(v)
+        self.pred[v].add(u)
+        self.edge_count += 1
+        return moved
+
+    def remove_edge(self, u, v):
+        self._check(u)
+        self._check(v)
+        if v not in self.succ[u]:
+            return False
+        self.succ[u].discard(v)
+        self.pred[v].discard(u)
+        self.edge_count -= 1
+        return True
+
+    def _search_forward(self, v, u, ub):
+        # Nodes reachable from v that sit before u; reaching u is a cycle
+        pos, succ = self.pos, self.succ
+        parent = {v: None}
+        stack = [v]
+        while stack:
+            x = stack.pop()
+            for w in succ[x]:
+                if w == u:
+                    path = [u, x]
+                    while parent[x] is not None:
+                        x = parent[x]
+                        path.append(x)
+                    raise CycleError(f'Edge {u} -> {v} would create a cycle.', [u] + path[:0:-1] + [u])
+                if w not in parent and pos[w] < ub:
+                    parent[w] = x
+                    stack.append(w)
+        return list(parent)
+
+    def _search_backward(self, u, lb):
+        # Nodes that reach u and sit after v
+        pos, pred = self.pos, self.pred
+        seen = {u}
+        stack = [u]
+        while stack:
+            x = stack.pop()
+            for w in pred[x]:
+                if w not in seen and pos[w] > lb:
+                    seen.add(w)
+                    stack.append(w)
+        return list(seen)
+
+    def _reorder(self, backward, forward):
+        pos, order = self.pos, self.order
+        backward.sort(key=pos.__getitem__)
+        forward.sort(key=pos.__getitem__)
+        nodes = backward + forward
+        slots = sorted(pos[x] for x in nodes)
+        moved = []
+        for x, i in zip(nodes, slots):
+            if pos[x] != i:
+                moved.append((x, i))
+            pos[x] = i
+            order[i] = x
+        return moved
+
+    def edges(self):
+        return [[u, v] for u in range(self.n) for v in sorted(self.succ[u])]
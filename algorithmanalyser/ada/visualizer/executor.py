@@ -0,0 +1,238 @@
+# Pre-warmed worker processes for the CPU-bound endpoint work.
+#
+# WorkerPool keeps `size` processes, each running one task at a time over a pipe.
+# A task that outlives its wall-clock timeout is killed together with its process
+# group (so pools the task started itself go too) and the worker is replaced. The
+# CPU-time limit is set in the worker with RLIMIT_CPU, so the kernel ends a runaway
+# task with SIGXCPU even inside a NumPy loop. Workers are spawned rather than forked,
+# so they never inherit the server's threads or locks, and they are not daemonic so
+# tasks can still start process pools of their own (blocked Floyd-Warshall).
+# stream() runs a generator function the same way and relays its items in chunks as
+# the worker sends them, so a streamed response is held to the same limits.
+import atexit
+import importlib
+import math
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: wall-clock timeouts only
+    resource = None
+
+class TaskTimeout(Exception):
+    def __init__(self, limit, seconds):
+        kind = 'CPU time' if limit == 'cpu' else 'time'
+        super().__init__(f'Computation exceeded the {seconds:g} s {kind} limit.')
+        self.limit = limit
+        self.seconds = seconds
+
+class PoolBusy(Exception):
+    pass
+
+class WorkerCrashed(Exception):
+    pass
+
+def _limit_cpu(seconds):
+    # Soft RLIMIT_CPU at the CPU time used so far + seconds; None lifts it again
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if seconds is None:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    limit = math.ceil(usage.ru_utime + usage.ru_stime + seconds)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+def _send_items(conn, gen, chunk):
+    # Send a generator's items as (None, [item, ...]) messages of up to `chunk` items;
+    # returns its return value
+    buf = []
+    while True:
+        try:
+            item = next(gen)
+        except StopIteration as stop:
+            if buf:
+                conn.send((None, buf))
+            return stop.value
+        buf.append(item)
+        if len(buf) >= chunk:
+            conn.send((None, buf))
+            buf = []
+
+def _worker_main(conn, preload):
+    if hasattr(os, 'setsid'):
+        os.setsid()
+    # Ctrl+C is for the server, which shuts the workers down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for name in preload:
+        importlib.import_module(name)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        func, args, cpu_timeout, chunk = task
+        _limit_cpu(cpu_timeout)
+        try:
+            reply = (True, _send_items(conn, func(*args), chunk) if chunk else func(*args))
+        except Exception as e:
+            reply = (False, e)
+        _limit_cpu(None)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # An unpicklable result or exception
+            conn.send((False, WorkerCrashed(f'{type(e).__name__}: {e}')))
+
+class _Worker:
+    def __init__(self, ctx, preload):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, preload), name='analyser-worker')
+        self.process.start()
+        child.close()
+
+    def stop(self, timeout=1):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (AttributeError, OSError):
+            # No process groups here, or the worker has not called setsid() yet
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class WorkerPool:
+    def __init__(self, size, preload=()):
+        self.size = max(0, size)
+        self.preload = tuple(preload)
+        self.ctx = multiprocessing.get_context('spawn')
+        self.idle = queue.Queue()
+        self.workers = set()
+        self.lock = threading.Lock()
+        self.started = False
+        self.tasks = 0
+        self.timeouts = 0
+        self.crashes = 0
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def start(self):
+        with self.lock:
+            if self.started:
+                return
+            for _ in range(self.size):
+                self._add()
+            self.started = True
+        atexit.register(self.shutdown)
+
+    def _add(self):
+        worker = _Worker(self.ctx, self.preload)
+        self.workers.add(worker)
+        self.idle.put(worker)
+
+    def _replace(self, worker):
+        worker.kill()
+        with self.lock:
+            self.workers.discard(worker)
+            if self.started:
+                self._add()
+
+    def run(self, func, *args, timeout=None, cpu_timeout=None):
+        # func(*args) in a worker; func and args must be picklable. Waiting for a free
+        # worker and running the task may each take up to `timeout` seconds. An exception
+        # raised by func is raised again here.
+        task = self._task(func, args, timeout, cpu_timeout, 0)
+        while True:
+            try:
+                next(task)
+            except StopIteration as stop:
+                return stop.value
+
+    def stream(self, func, *args, timeout=None, cpu_timeout=None, chunk=1000):
+        # Like run() for a generator function: yields lists of up to `chunk` of its
+        # items as the worker sends them and returns the generator's return value. The
+        # whole run, however slowly it is read, must end within `timeout`; closing the
+        # stream early kills the task.
+        return (yield from self._task(func, args, timeout, cpu_timeout, chunk))
+
+    def _task(self, func, args, timeout, cpu_timeout, chunk):
+        self.start()
+        try:
+            worker = self.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolBusy('All workers are busy; try again later.')
+        deadline = time.monotonic() + timeout if timeout else None
+        healthy = False
+        try:
+            try:
+                worker.conn.send((func, args, cpu_timeout, chunk))
+            except OSError as e:
+                self.crashes += 1
+                raise WorkerCrashed(f'Worker is gone: {e}')
+            while True:
+                remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                if not worker.conn.poll(remaining):
+                    self.timeouts += 1
+                    raise TaskTimeout('wall', timeout)
+                try:
+                    ok, value = worker.conn.recv()
+                except EOFError:
+                    worker.process.join()
+                    code = worker.process.exitcode
+                    if cpu_timeout and code in (-getattr(signal, 'SIGXCPU', 0), -signal.SIGKILL):
+                        self.timeouts += 1
+                        raise TaskTimeout('cpu', cpu_timeout)
+                    self.crashes += 1
+                    raise WorkerCrashed(f'Worker exited with code {code}.')
+                if ok is not None:
+                    break
+                yield value
+            healthy = True
+        finally:
+            self.tasks += 1
+            if healthy:
+                self.idle.put(worker)
+            else:
+                self._replace(worker)
+        if not ok:
+            raise value
+        return value
+
+    def shutdown(self):
+        with self.lock:
+            self.started = False
+            workers, self.workers = self.workers, set()
+        for worker in workers:
+            worker.stop()
+        self.idle = queue.Queue()
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'started': self.started,
+            'idle': self.idle.qsize(),
+            'tasks': self.tasks,
+            'timeouts': self.timeouts,
+            'crashes': self.crashes,
+        }
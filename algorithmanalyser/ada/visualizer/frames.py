@@ -0,0 +1,62 @@
+# Checkpoint-plus-delta matrix history for the Floyd-Warshall and Warshall visualizers.
+#
+# The `matrices` output holds a full copy of the matrix after every intermediate node
+# k, (n+1) n^2 cells. A FrameLog keeps a full checkpoint only every `every` frames and,
+# for each k, just the cells that k changed: their flat indices (int32) and, for
+# distances, the new values (Warshall's cells can only become 1). frame(k) copies the
+# checkpoint at or below k and replays at most every - 1 deltas onto it. By default
+# `every` is chosen so the checkpoints together take about CHECKPOINT_BYTES.
+import math
+
+import numpy as np
+
+CHECKPOINT_BYTES = 64 * 1024 * 1024
+
+def default_every(n, itemsize, budget=CHECKPOINT_BYTES):
+    # Smallest interval whose n + 1 frames' checkpoints fit in budget
+    return max(1, math.ceil((n + 1) * n * n * itemsize / budget)) if n else 1
+
+class FrameLog:
+    def __init__(self, initial, every=None, integral=True):
+        self.n = initial.shape[0]
+        self.every = every or default_every(self.n, initial.dtype.itemsize)
+        self.integral = integral
+        self.checkpoints = [initial.copy()]
+        self.indices = []
+        self.values = [] if initial.dtype != bool else None
+
+    def record(self, matrix, rows, cols, new=None):
+        # The cells frame len(indices) + 1 changed, after they are written to matrix
+        self.indices.append((rows * self.n + cols).astype(np.int32))
+        if self.values is not None:
+            self.values.append(np.asarray(new, dtype=matrix.dtype))
+        if len(self.indices) % self.every == 0:
+            self.checkpoints.append(matrix.copy())
+
+    @property
+    def count(self):
+        return len(self.indices) + 1
+
+    @property
+    def nbytes(self):
+        total = sum(c.nbytes for c in self.checkpoints) + sum(i.nbytes for i in self.indices)
+        return total + (sum(v.nbytes for v in self.values) if self.values is not None else 0)
+
+    def frame(self, k):
+        # The matrix after the first k intermediate nodes (0: the initial matrix)
+        base = k // self.every
+        matrix = self.checkpoints[base].copy()
+        flat = matrix.reshape(-1)
+        for step in range(base * self.every, k):
+            flat[self.indices[step]] = self.values[step] if self.values is not None else True
+        return matrix
+
+    def delta(self, k):
+        # (rows, cols, new values) of the cells frame k changed, k >= 1
+        rows, cols = np.divmod(self.indices[k - 1], self.n)
+        values = self.values[k - 1] if self.values is not None else np.ones(len(rows), dtype=bool)
+        return rows, cols, values
+
+    def summary(self):
+        return {'count': self.count, 'n': self.n, 'checkpoint_every': self.every,
+                'checkpoints': len(self.checkpoints), 'bytes': self.nbytes}
@@ -0,0 +1,129 @@
+# Compact graph structure shared by the graph endpoints.
+#
+# Graphs are stored in CSR form: the neighbours of u are indices[indptr[u]:indptr[u+1]]
+# (ascending for matrix input) with matching weights. Requests can send any of
+#   {"matrix": [[...], ...]}                       dense n x n, 0 / inf = no edge
+#   {"edges": [[u, v, w], ...], "n": 5}            edge list, w defaults to 1, n is optional
+#   {"indptr": [...], "indices": [...], "weights": [...]}   CSR, weights default to 1
+INF = float('inf')
+
+class Graph:
+    __slots__ = ('n', 'indptr', 'indices', 'weights')
+
+    def __init__(self, n, indptr, indices, weights):
+        self.n = n
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    @property
+    def edge_count(self):
+        return self.indptr[-1] if self.indptr else 0
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        n = len(matrix)
+        indptr = [0]
+        indices = []
+        weights = []
+        for row in matrix:
+            for v, w in enumerate(row):
+                if w and w != INF:
+                    indices.append(v)
+                    weights.append(w)
+            indptr.append(len(indices))
+        return cls(n, indptr, indices, weights)
+
+    @classmethod
+    def from_edges(cls, n, edges, undirected=False):
+        # edges: iterable of (u, v, w); bucketed by source in O(V + E), keeping input order
+        if undirected:
+            edges = [e for u, v, w in edges for e in ((u, v, w), (v, u, w))]
+        counts = [0]*(n+1)
+        for u, _, _ in edges:
+            counts[u+1] += 1
+        for u in range(n):
+            counts[u+1] += counts[u]
+        indptr = counts[:]
+        indices = [0]*indptr[-1]
+        weights = [0]*indptr[-1]
+        for u, v, w in edges:
+            pos = counts[u]
+            indices[pos] = v
+            weights[pos] = w
+            counts[u] = pos + 1
+        return cls(n, indptr, indices, weights)
+
+    def neighbors(self, u):
+        indices, weights = self.indices, self.weights
+        for idx in range(self.indptr[u], self.indptr[u+1]):
+            yield indices[idx], weights[idx]
+
+    def edges(self):
+        for u in range(self.n):
+            for v, w in self.neighbors(u):
+                yield u, v, w
+
+    def indegrees(self):
+        indegree = [0]*self.n
+        for v in self.indices:
+            indegree[v] += 1
+        return indegree
+
+def _is_number(x):
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+def _check_node(x, n):
+    if not isinstance(x, int) or isinstance(x, bool) or not 0 <= x < n:
+        raise ValueError(f'Node index {x!r} is out of range for {n} nodes.')
+
+def parse_graph(data, undirected=False):
+    # Build a Graph from whichever input form the request used. Raises ValueError
+    # on malformed input. undirected=True mirrors edge lists and CSR input; dense
+    # matrices are taken as given, as before.
+    if 'matrix' in data:
+        matrix = data['matrix']
+        if not (isinstance(matrix, list) and all(isinstance(row, list) and len(row) == len(matrix) for row in matrix)):
+            raise ValueError('Input must be a square adjacency matrix.')
+        return Graph.from_matrix(matrix)
+    if 'edges' in data:
+        raw = data['edges']
+        if not isinstance(raw, list):
+            raise ValueError('edges must be a list of [u, v] or [u, v, w] entries.')
+        edges = []
+        for e in raw:
+            if not (isinstance(e, list) and len(e) in (2, 3)):
+                raise ValueError('edges must be a list of [u, v] or [u, v, w] entries.')
+            w = e[2] if len(e) == 3 else 1
+            if not _is_number(w):
+                raise ValueError(f'Edge weight {w!r} is not a number.')
+            edges.append((e[0], e[1], w))
+        n = data.get('n')
+        if n is None:
+            n = 1 + max((max(u, v) for u, v, _ in edges if isinstance(u, int) and isinstance(v, int)), default=-1)
+        if not isinstance(n, int) or n < 0:
+            raise ValueError('n must be a non-negative integer.')
+        for u, v, _ in edges:
+            _check_node(u, n)
+            _check_node(v, n)
+        return Graph.from_edges(n, edges, undirected)
+    if 'indptr' in data:
+        indptr = data['indptr']
+        indices = data.get('indices')
+        if not (isinstance(indptr, list) and isinstance(indices, list) and indptr and indptr[0] == 0):
+            raise ValueError('CSR input needs indptr (starting at 0) and indices lists.')
+        if any(not isinstance(p, int) or a > p for a, p in zip(indptr, indptr[1:])) or indptr[-1] != len(indices):
+            raise ValueError('indptr must be non-decreasing and end at len(indices).')
+        n = len(indptr) - 1
+        weights = data.get('weights')
+        if weights is None:
+            weights = [1]*len(indices)
+        if not (isinstance(weights, list) and len(weights) == len(indices) and all(_is_number(w) for w in weights)):
+            raise ValueError('weights must be a list of numbers, one per index.')
+        for v in indices:
+            _check_node(v, n)
+        graph = Graph(n, indptr, indices, weights)
+        if undirected:
+            graph = Graph.from_edges(n, list(graph.edges()), undirected=True)
+        return graph
+    raise ValueError('Input must be a matrix, an edge list, or CSR arrays.')
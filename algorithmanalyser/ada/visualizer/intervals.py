@@ -0,0 +1,67 @@
+# Interval scheduling beyond the traced activity selection: input checks and NDJSON
+# reading around the backend's implementations (algorithms/greedy.py).
+#
+# select_sorted takes intervals already ordered by end from any iterator (a request
+# body read line by line, a feed) and selects in one pass, holding nothing but the last
+# end, so a client that keeps its calendar sorted never pays for the O(n log n) sort.
+# weighted is weighted interval scheduling: sort by end, then the classic DP with
+# p(j) found by bisect over the sorted ends, O(n log n) in all.
+import json
+
+import shared  # puts backend/ on sys.path, for `algorithms`
+from algorithms.greedy import UnsortedInput
+from algorithms.greedy import activity_selection_sorted as select_sorted
+from algorithms.greedy import weighted_interval_scheduling as weighted
+
+def _is_number(x):
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+def check_interval(x, weighted=False):
+    size = 3 if weighted else 2
+    if not (isinstance(x, list) and len(x) == size and all(_is_number(v) for v in x)):
+        raise ValueError(f"Each interval must be [start, end{', weight' if weighted else ''}] numbers, got {x!r}.")
+    return x
+
+def select_sorted_list(intervals):
+    return list(select_sorted(intervals))
+
+def _blocks(stream, size=1 << 16):
+    # The complete lines of each block read from a binary stream (line-at-a-time reads
+    # of a WSGI input stream cost more than the parsing)
+    rest = b''
+    while True:
+        block = stream.read(size)
+        if not block:
+            break
+        lines = (rest + block).split(b'\n')
+        rest = lines.pop()
+        yield lines
+    if rest:
+        yield [rest]
+
+def _parse_line(line, number):
+    try:
+        return check_interval(json.loads(line))
+    except ValueError as e:
+        raise ValueError(f'Line {number}: {e}') from None
+
+def read_lines(stream):
+    # [start, end] per NDJSON line of a binary stream, blank lines skipped. Each block
+    # is parsed as one JSON array; only a block that fails is gone through line by
+    # line, to report the bad line.
+    number = 0
+    for lines in _blocks(stream):
+        filled = [line for line in lines if line.strip()]
+        try:
+            rows = json.loads(b'[' + b','.join(filled) + b']')
+            if len(rows) != len(filled):
+                raise ValueError
+            for x in rows:
+                check_interval(x)
+        except ValueError:
+            for k, line in enumerate(lines, 1):
+                if line.strip():
+                    yield _parse_line(line, number + k)
+        else:
+            yield from rows
+        number += len(lines)
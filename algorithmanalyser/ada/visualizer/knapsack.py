@@ -0,0 +1,75 @@
+# Memory-lean 0/1 knapsack.
+#
+# Only one row of the DP table is kept (a NumPy vector of W+1 values, updated per
+# item with a single vectorized max). Whether item i was taken at capacity w is
+# recorded as one bit in a packed (n, ceil((W+1)/8)) matrix, which is all the
+# traceback needs: dp[i][w] != dp[i-1][w] exactly when the include branch won.
+# Given an outputs dict, knapsack_lean puts the cells it compared and the ones the
+# include branch overwrote in outputs['counts'] (opcount.py).
+import numpy as np
+
+def validate(weights, profits, capacity):
+    if len(weights) != len(profits):
+        raise ValueError('weights and profits must have the same length.')
+    if capacity < 0:
+        raise ValueError('capacity must be non-negative.')
+    for w in weights:
+        if not isinstance(w, int) or isinstance(w, bool) or w < 0:
+            raise ValueError('weights must be non-negative integers.')
+    for p in profits:
+        if not isinstance(p, (int, float)) or isinstance(p, bool):
+            raise ValueError('profits must be numbers.')
+
+def _value_dtype(profits):
+    if any(isinstance(p, float) for p in profits):
+        return np.float64
+    if sum(abs(p) for p in profits) < 2**62:
+        return np.int64
+    return object
+
+def sample_indices(size, limit):
+    # At most `limit` evenly spaced indices in [0, size), always keeping the last one
+    if not limit or size <= limit:
+        return list(range(size))
+    return sorted(set(np.linspace(0, size - 1, limit).round().astype(int).tolist()))
+
+def knapsack_lean(weights, profits, capacity, table_limit=None, outputs=None):
+    # Returns (best value, selected items, sampled table or None). With table_limit,
+    # rows/cols of the full (n+1) x (W+1) table are sampled down to at most that many
+    # each and captured while the rolling row passes through them.
+    n, W = len(weights), capacity
+    best = np.zeros(W + 1, dtype=_value_dtype(profits))
+    taken = np.zeros((n, (W + 8) // 8), dtype=np.uint8)
+    table = None
+    if table_limit:
+        rows = sample_indices(n + 1, table_limit)
+        cols = sample_indices(W + 1, table_limit)
+        table = {'rows': rows, 'cols': cols, 'values': []}
+        wanted = set(rows)
+    if table is not None and 0 in wanted:
+        table['values'].append(best[cols].tolist())
+    comparisons = writes = 0
+    for i in range(n):
+        wt, p = weights[i], profits[i]
+        if wt <= W:
+            include = best[:W + 1 - wt] + p
+            better = include > best[wt:]
+            bits = np.zeros(W + 1, dtype=bool)
+            bits[wt:] = better
+            taken[i] = np.packbits(bits, bitorder='little')
+            np.maximum(best[wt:], include, out=best[wt:])
+            if outputs is not None:
+                comparisons += W + 1 - wt
+                writes += int(np.count_nonzero(better))
+        if table is not None and i + 1 in wanted:
+            table['values'].append(best[cols].tolist())
+    items = []
+    w = W
+    for i in range(n - 1, -1, -1):
+        if (taken[i, w >> 3] >> (w & 7)) & 1:
+            items.append(i)
+            w -= weights[i]
+    items.reverse()
+    if outputs is not None:
+        outputs['counts'] = {'comparisons': comparisons, 'writes': writes}
+    return best[W:].tolist()[0], items, table
@@ -0,0 +1,227 @@
+# Minimum spanning forest engine with density-based strategy selection.
+#
+# Every strategy works on the undirected edges u < v of a parsed Graph (the upper
+# triangle of a matrix, or the mirrored edge list / CSR) and returns the positions of
+# the chosen edges in those arrays; a disconnected graph gives one tree per component.
+#   dense-prim  array Prim: n NumPy passes over a dense n x n weight matrix, O(V^2),
+#               no heap and no per-edge work
+#   heap-prim   Prim with a binary heap, pushing a node only when its key improves
+#   kruskal     edges ordered by one NumPy sort, joined with a DisjointSet (union by
+#               rank, path compression); stops once the tree is complete
+#   boruvka     rounds of "lightest edge leaving every component", all NumPy; a large
+#               round's scan is split into chunks the caller can run on separate workers
+# choose() picks one from the node count and edge density. Given an outputs dict, each
+# strategy puts the work it did in outputs['counts'] (opcount.py).
+import heapq
+
+import numpy as np
+
+STRATEGIES = ('dense-prim', 'heap-prim', 'kruskal', 'boruvka')
+DENSE_MIN = 0.5               # density from which array Prim beats sorting the edges
+DENSE_MAX_NODES = 4096        # dense-prim holds n^2 weights and edge positions (12 B each)
+BORUVKA_MIN_NODES = 5000      # from here Boruvka's NumPy rounds beat Kruskal's union loop
+CHUNK_EDGES = 250_000         # a round's scan is only split past this many edges
+NONE = np.iinfo(np.int64).max
+
+class DisjointSet:
+    __slots__ = ('parent', 'rank')
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.rank = [0]*n
+
+    def find(self, x):
+        parent = self.parent
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, a, b):
+        # False if a and b were already in one set
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        rank = self.rank
+        if rank[ra] < rank[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        if rank[ra] == rank[rb]:
+            rank[ra] += 1
+        return True
+
+def edge_arrays(graph):
+    # (u, v, w, ids) of the graph's edges with u < v; ids index graph.indices/weights
+    counts = np.diff(np.asarray(graph.indptr, dtype=np.int64))
+    src = np.repeat(np.arange(graph.n, dtype=np.int64), counts)
+    dst = np.asarray(graph.indices, dtype=np.int64)
+    ids = np.flatnonzero(src < dst)
+    return src[ids], dst[ids], np.asarray(graph.weights, dtype=np.float64)[ids], ids
+
+def density(n, m):
+    # Undirected edges over the n(n-1)/2 possible; parallel edges can push it past 1
+    return m / (n * (n - 1) / 2) if n > 1 else 0.0
+
+def choose(n, m):
+    # Measured on random graphs: array Prim wins from about half the possible edges,
+    # Kruskal's early exit wins on small sparse graphs, and Boruvka on large ones
+    if n <= DENSE_MAX_NODES and density(n, m) >= DENSE_MIN:
+        return 'dense-prim'
+    if n >= BORUVKA_MIN_NODES:
+        return 'boruvka'
+    return 'kruskal'
+
+def dense_prim(n, u, v, w, outputs=None):
+    weights = np.full((n, n), np.inf)
+    pos = np.full((n, n), -1, dtype=np.int32)
+    # Heaviest first, so the lightest of any parallel edges is written last
+    order = np.argsort(-w, kind='stable')
+    for a, b in ((u, v), (v, u)):
+        weights[a[order], b[order]] = w[order]
+        pos[a[order], b[order]] = order
+    key = np.full(n, np.inf)
+    via = np.full(n, -1, dtype=np.int64)
+    done = np.zeros(n, dtype=bool)
+    picked = []
+    comparisons = writes = 0
+    for _ in range(n):
+        x = int(np.argmin(key))
+        if key[x] == np.inf:
+            # Nothing left is reachable from the current tree: start the next one
+            x = int(np.argmin(done))
+        else:
+            picked.append(int(pos[via[x], x]))
+        done[x] = True
+        key[x] = np.inf
+        row = weights[x]
+        better = (row < key) & ~done
+        key[better] = row[better]
+        via[better] = x
+        if outputs is not None:
+            # argmin over the keys, then the row against them
+            comparisons += 2 * n
+            writes += int(np.count_nonzero(better))
+    if outputs is not None:
+        outputs['counts'] = {'comparisons': comparisons, 'writes': writes}
+    return picked
+
+def heap_prim(n, u, v, w, outputs=None):
+    m = len(u)
+    src = np.concatenate((u, v))
+    order = np.argsort(src, kind='stable')
+    indptr = np.searchsorted(src[order], np.arange(n + 1)).tolist()
+    dst = np.concatenate((v, u))[order].tolist()
+    weights = np.concatenate((w, w))[order].tolist()
+    eids = (order % m).tolist() if m else []
+    key = [float('inf')]*n
+    done = [False]*n
+    picked = []
+    counting = outputs is not None
+    trees = scans = writes = 0
+    for root in range(n):
+        if done[root]:
+            continue
+        heap = [(0, root, -1)]
+        if counting:
+            trees += 1
+        while heap:
+            _, x, e = heapq.heappop(heap)
+            if done[x]:
+                continue
+            done[x] = True
+            if e >= 0:
+                picked.append(e)
+            if counting:
+                scans += indptr[x+1] - indptr[x]
+            for i in range(indptr[x], indptr[x+1]):
+                y = dst[i]
+                if not done[y] and weights[i] < key[y]:
+                    key[y] = weights[i]
+                    heapq.heappush(heap, (weights[i], y, eids[i]))
+                    if counting:
+                        writes += 1
+    if counting:
+        # A push per tree root and per lowered key; every heap drains
+        pushes = trees + writes
+        outputs['counts'] = {'edge_scans': scans, 'heap_pushes': pushes, 'heap_pops': pushes, 'writes': writes}
+    return picked
+
+def kruskal(n, u, v, w, outputs=None):
+    order = np.lexsort((v, u, w)).tolist()
+    us, vs = u.tolist(), v.tolist()
+    dsu = DisjointSet(n)
+    picked = []
+    for e in order:
+        if dsu.union(us[e], vs[e]):
+            picked.append(e)
+            if len(picked) == n - 1:
+                break
+    if outputs is not None:
+        # The loop stopped at the edge that completed the tree, if it got that far
+        scanned = order.index(picked[-1]) + 1 if picked and len(picked) == n - 1 else len(order)
+        outputs['counts'] = {'edges_sorted': len(order), 'finds': 2 * scanned, 'unions': len(picked)}
+    return picked
+
+def component_minima(chunk, comp):
+    # For the edges (u, v, rank) in chunk: every component with an edge leaving it,
+    # and the lowest rank among those edges
+    cu, cv = comp[chunk[0]], comp[chunk[1]]
+    cross = cu != cv
+    cu, cv, rank = cu[cross], cv[cross], chunk[2][cross]
+    best = np.full(len(comp), NONE)
+    np.minimum.at(best, cu, rank)
+    np.minimum.at(best, cv, rank)
+    found = np.flatnonzero(best != NONE)
+    return found, best[found]
+
+def boruvka(n, u, v, w, minima=None, parts=1, outputs=None):
+    # minima(chunks, comp) -> [component_minima(chunk, comp) for chunk in chunks], for
+    # up to `parts` chunks a round; by default they run here, one after another.
+    # Ranks in (w, u, v) order break weight ties, so the chosen edges never form a
+    # cycle longer than two components picking the same edge.
+    if minima is None:
+        minima = lambda chunks, comp: [component_minima(chunk, comp) for chunk in chunks]
+    order = np.lexsort((v, u, w))
+    su, sv = u[order], v[order]
+    edges = np.stack((su, sv, np.arange(len(order), dtype=np.int64)))
+    comp = np.arange(n, dtype=np.int64)
+    picked = []
+    rounds = scans = 0
+    while edges.shape[1]:
+        rounds += 1
+        scans += edges.shape[1]
+        count = max(1, min(parts, -(-edges.shape[1] // CHUNK_EDGES)))
+        best = np.full(n, NONE)
+        for found, rank in minima(np.array_split(edges, count, axis=1), comp):
+            np.minimum.at(best, found, rank)
+        labels = np.flatnonzero(best != NONE)
+        chosen = best[labels]
+        picked.append(order[np.unique(chosen)])
+        # Point every component at the one across its chosen edge; of two components
+        # that chose the same edge, the lower label stays a root
+        a, b = comp[su[chosen]], comp[sv[chosen]]
+        succ = np.arange(n, dtype=np.int64)
+        succ[labels] = np.where(a == labels, b, a)
+        mutual = (succ[succ] == np.arange(n)) & (np.arange(n) < succ)
+        succ[mutual] = np.flatnonzero(mutual)
+        while True:
+            jumped = succ[succ]
+            if np.array_equal(jumped, succ):
+                break
+            succ = jumped
+        comp = succ[comp]
+        edges = edges[:, comp[edges[0]] != comp[edges[1]]]
+    picked = np.concatenate(picked).tolist() if picked else []
+    if outputs is not None:
+        outputs['counts'] = {'rounds': rounds, 'edge_scans': scans, 'unions': len(picked)}
+    return picked
+
+def spanning_forest(strategy, n, u, v, w, outputs=None):
+    return {'dense-prim': dense_prim, 'heap-prim': heap_prim, 'kruskal': kruskal, 'boruvka': boruvka}[strategy](n, u, v, w, outputs=outputs)
+
+def forest_edges(graph, u, v, ids, picked):
+    # ([(u, v, weight)], total) with the weights as given in the request
+    edges = [(int(u[e]), int(v[e]), graph.weights[ids[e]]) for e in picked]
+    return edges, sum(w for _, _, w in edges)
@@ -0,0 +1,67 @@
+# Operation counting.
+#
+# The counters live in the kernels the endpoints run: the tracing.*_trace sorts, the
+# iter_*_steps generators of api_server.py, knapsack.knapsack_lean and the mst.py
+# strategies each take an emit='counts' mode or an outputs dict and tally comparisons,
+# swaps, writes, relaxations, heap pushes/pops, ... as plain local ints at the sites
+# where the operations happen, so the normal code paths pay nothing. The functions
+# here run a kernel that way (for the matrix closures, drain the endpoint's update
+# generator) and return (result, counts). The endpoints only call
+# them when a request asks for metrics, and no trace is kept, so they scale far beyond
+# a step-by-step response.
+import random
+
+import apsp
+import closure as closure_engine
+import knapsack as knapsack_engine
+import mst as mst_engine
+import tracing
+
+def counted(make_gen, *args):
+    # Drain a step generator in its counting mode: (its return value, counts)
+    outputs = {}
+    gen = make_gen(*args, emit='counts', outputs=outputs)
+    while True:
+        try:
+            next(gen)
+        except StopIteration as stop:
+            return stop.value, outputs['counts']
+
+def _traced(trace, arr, *args):
+    # Sort a copy of arr with the tracing kernel the endpoint traces
+    a = arr[:]
+    outputs = {}
+    for _ in trace(a, *args, emit='counts', outputs=outputs):
+        pass
+    return a, outputs['counts']
+
+def merge_sort(arr):
+    return _traced(tracing.merge_sort_trace, arr)
+
+def quick_sort(arr, pivot_strategy='last', pivot_index=None, rng=random):
+    return _traced(tracing.quick_sort_trace, arr, pivot_strategy, pivot_index, rng)
+
+def selection_sort(arr):
+    return _traced(tracing.selection_sort_trace, arr)
+
+def knapsack_lean(weights, profits, capacity):
+    outputs = {}
+    res, items, _ = knapsack_engine.knapsack_lean(weights, profits, capacity, outputs=outputs)
+    return (res, items), outputs['counts']
+
+def spanning_forest(strategy, n, u, v, w):
+    outputs = {}
+    picked = mst_engine.spanning_forest(strategy, n, u, v, w, outputs=outputs)
+    return picked, outputs['counts']
+
+def floyd_warshall(dist):
+    # dist: float64 matrix from apsp.dist_array, updated in place by the endpoint's
+    # update kernel; every k relaxes all n^2 cells and writes the improved ones
+    n = dist.shape[0]
+    updates = sum(len(rows) for _, rows, _, _, _ in apsp.floyd_warshall_updates(dist))
+    return dist, {'relaxations': n ** 3, 'writes': updates}
+
+def warshall(reach):
+    n = reach.shape[0]
+    updates = sum(len(rows) for _, rows, _ in closure_engine.warshall_updates(reach))
+    return reach, {'comparisons': n ** 3, 'writes': updates}
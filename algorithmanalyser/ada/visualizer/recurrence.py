@@ -0,0 +1,58 @@
+# Linear recurrences in O(log n) steps for /api/fibonacci and /api/recurrence.
+#
+# The solver is backend/algorithms/dp.py's: a(i) = c1 a(i-1) + ... + ck a(i-k) by
+# Kitamasa (x^n modulo the characteristic polynomial, square-and-multiply over the bits
+# of n, O(k^2 log n)), and Fibonacci fast doubling for (1, 1) recurrences, both as step
+# generators that yield once per bit of n for the traces. linear_recurrence memoizes
+# solved queries per process. This module checks request input and formats results:
+# always a string (decimal, or hex with base=16), so the type never depends on n and
+# JavaScript clients never lose digits.
+import decimal
+
+import shared  # puts backend/ on sys.path, for `algorithms`
+from algorithms.dp import combine, fib_doubling, linear_recurrence, recurrence_steps
+
+_DEC = decimal.Context(prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN)
+
+def validate(coefficients, initial, n, mod):
+    def ints(xs):
+        return isinstance(xs, (list, tuple)) and all(isinstance(x, int) and not isinstance(x, bool) for x in xs)
+    if not (ints(coefficients) and coefficients):
+        raise ValueError('coefficients must be a non-empty list of integers.')
+    if not (ints(initial) and len(initial) == len(coefficients)):
+        raise ValueError('initial must be a list of integers, one per coefficient.')
+    if not (isinstance(n, int) and not isinstance(n, bool) and n >= 0):
+        raise ValueError('n must be a non-negative integer.')
+    if mod is not None and not (isinstance(mod, int) and not isinstance(mod, bool) and mod >= 1):
+        raise ValueError('mod must be a positive integer.')
+
+def _to_decimal(x, bits, powers):
+    # x >= 0 as a Decimal: split on bit halves, x = hi * 2^k + lo, and join the halves
+    # with libmpdec's fast multiplication, O(M(n) log n) where str(int) is quadratic
+    if bits <= 8192:
+        return decimal.Decimal(x)
+    k = bits // 2
+    if k not in powers:
+        powers[k] = _DEC.power(decimal.Decimal(2), k)
+    hi = _to_decimal(x >> k, bits - k, powers)
+    return _DEC.add(_DEC.multiply(hi, powers[k]), _to_decimal(x & ((1 << k) - 1), k, powers))
+
+def to_decimal_string(x):
+    if x < 0:
+        return '-' + to_decimal_string(-x)
+    return str(_to_decimal(x, x.bit_length(), {}))
+
+def output(x, base=10):
+    # The JSON result for any a(n): a decimal string, or with base=16 a hex string
+    # (linear time, for huge values)
+    return hex(x) if base == 16 else to_decimal_string(x)
+
+def value(coefficients, initial, n, mod=None, base=10):
+    # linear_recurrence() for list arguments, as an output()
+    return output(linear_recurrence(tuple(coefficients), tuple(initial), n, mod), base)
+
+def brief(x):
+    # A number for a trace line: in full up to about 300 digits
+    if x.bit_length() <= 1000:
+        return str(x)
+    return f'<{x.bit_length()}-bit number>'
@@ -0,0 +1,254 @@
+# Cost model and shortest-job-first admission for the algorithm endpoints.
+#
+# The *_cost functions predict what a request will cost from the shape of its input
+# alone (n^3 for Floyd-Warshall, n*W for knapsack, n^2 for selection sort, ...), before
+# anything is parsed or run. An Estimate holds the compute cost in rough nanoseconds
+# and the number of trace lines the response would carry. Scheduler hands its slots
+# (one per worker process) to waiting requests in order of arrival time + estimated
+# run time, so short requests overtake queued long ones, and a long one is only
+# overtaken by requests that arrive within its own run time, so it cannot starve.
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import namedtuple
+
+PY_OP = 50        # ns per step of an interpreted loop
+NP_OP = 1         # ns per element of a NumPy kernel
+TRACE_LINE = 400  # ns to format and serialize one step, event or matrix cell
+
+class Estimate(namedtuple('Estimate', 'cost trace result_cost', defaults=(None,))):
+    # cost: ns of computation; trace: steps/events/cells the response would hold;
+    # result_cost: cost of the result-only run, when that uses a different kernel
+    @property
+    def total(self):
+        return self.cost + self.trace * TRACE_LINE
+
+    def result_only(self):
+        return Estimate(self.cost if self.result_cost is None else self.result_cost, 0)
+
+    @property
+    def seconds(self):
+        return self.total / 1e9
+
+def _size(value):
+    return len(value) if isinstance(value, (list, str)) else 0
+
+def _included(opts, name):
+    value = opts.get('include')
+    if value is None:
+        return True
+    names = value if isinstance(value, list) else str(value).split(',')
+    return name in {x.strip() for x in names}
+
+def _nlogn(n):
+    return n * max(1, math.ceil(math.log2(n))) if n > 1 else n
+
+def graph_shape(opts):
+    # (nodes, edges) of any graph form, without parsing it; a matrix counts all n^2 cells
+    if isinstance(opts.get('matrix'), list):
+        n = len(opts['matrix'])
+        return n, n * n
+    if isinstance(opts.get('indptr'), list):
+        return max(0, len(opts['indptr']) - 1), _size(opts.get('indices'))
+    n = opts.get('n')
+    return (n if isinstance(n, int) else 0), _size(opts.get('edges'))
+
+def _matrix_trace(opts, n):
+    # Worst case: every (i, j) pair updates for every k, and n + 1 matrix snapshots
+    lines = 0
+    if _included(opts, 'steps'):
+        lines += n ** 3
+    if _included(opts, 'matrices'):
+        lines += (n + 1) * n * n
+    return lines
+
+def _spooled_n(opts):
+    n = opts.get('n')
+    return n if isinstance(n, int) else 0
+
+def floyd_warshall_cost(opts):
+    if 'matrix_id' in opts:
+        # Result-only, on the memory-mapped matrix
+        return Estimate(_spooled_n(opts) ** 3 * NP_OP, 0)
+    n = _size(opts.get('matrix'))
+    if opts.get('mode') == 'blocked' or opts.get('metrics') == 'only':
+        return Estimate(n ** 3 * NP_OP, 0)
+    return Estimate(n ** 3 * NP_OP, _matrix_trace(opts, n))
+
+def warshall_cost(opts):
+    if 'packed' in opts or 'matrix_id' in opts:
+        # Both run the bitset kernel
+        return Estimate(_spooled_n(opts) ** 3 // 64 * NP_OP, 0)
+    n = _size(opts.get('matrix'))
+    if opts.get('mode') == 'bitset':
+        return Estimate(n ** 3 // 64 * NP_OP, 0)
+    if opts.get('metrics') == 'only':
+        return Estimate(n ** 3 * NP_OP, 0)
+    return Estimate(n ** 3 * NP_OP, _matrix_trace(opts, n))
+
+def knapsack_cost(opts):
+    n = _size(opts.get('weights'))
+    capacity = opts.get('capacity')
+    cells = n * (capacity + 1) if isinstance(capacity, int) and capacity > 0 else n
+    if opts.get('mode') == 'lean':
+        return Estimate(cells * NP_OP, 0)
+    if opts.get('metrics') == 'only':
+        return Estimate(cells * PY_OP, 0)
+    # One step per cell, plus the table itself; result-only runs the lean NumPy kernel
+    return Estimate(cells * PY_OP, 2 * cells, cells * NP_OP)
+
+def _sort_cost(opts, ops):
+    if opts.get('metrics') == 'only':
+        return Estimate(ops * PY_OP, 0)
+    if opts.get('trace') == 'events' or _included(opts, 'steps') or _included(opts, 'tree'):
+        return Estimate(ops * PY_OP, ops)
+    return Estimate(ops * PY_OP, 0)
+
+def merge_sort_cost(opts):
+    return _sort_cost(opts, _nlogn(_size(opts.get('array'))))
+
+def quick_sort_cost(opts):
+    # Expected case; a sorted input with a fixed pivot is n^2 and ends at the CPU limit
+    return _sort_cost(opts, _nlogn(_size(opts.get('array'))))
+
+def selection_sort_cost(opts):
+    return _sort_cost(opts, _size(opts.get('array')) ** 2)
+
+def _traced_cost(opts, ops, trace):
+    if opts.get('metrics') == 'only':
+        return Estimate(ops * PY_OP, 0)
+    return Estimate(ops * PY_OP, trace)
+
+def dijkstra_cost(opts):
+    n, m = graph_shape(opts)
+    if isinstance(opts.get('sources'), list):
+        # Result-only, once per source
+        return Estimate((m + _nlogn(n + m)) * PY_OP * len(opts['sources']), 0)
+    return _traced_cost(opts, m + _nlogn(n + m), n + m)
+
+def prims_cost(opts):
+    n, m = graph_shape(opts)
+    return _traced_cost(opts, m + _nlogn(m), n)
+
+def kruskal_cost(opts):
+    n, m = graph_shape(opts)
+    return _traced_cost(opts, m + _nlogn(m), n)
+
+def _bigint_mul(bits):
+    # Karatsuba on 30-bit digits
+    return (max(bits, 30) / 30) ** 1.585
+
+def _recurrence_estimate(opts, k, growth):
+    # One square (k^2 products) per bit of n. Without a modulus the numbers reach about
+    # growth * n bits, and the halving sizes sum to twice the last step.
+    n = opts.get('n')
+    n = n if isinstance(n, int) and n > 0 else 0
+    bits = n.bit_length()
+    mod = opts.get('mod')
+    if isinstance(mod, int) and mod > 0:
+        cost = k * k * bits * (PY_OP + _bigint_mul(mod.bit_length()) * NP_OP)
+    else:
+        cost = k * k * (bits * PY_OP + 2 * _bigint_mul(growth * n) * NP_OP)
+    if opts.get('include') is not None and not _included(opts, 'steps'):
+        return Estimate(cost, 0)
+    return Estimate(cost, bits)
+
+def fibonacci_cost(opts):
+    return _recurrence_estimate(opts, 2, 0.7)
+
+def recurrence_cost(opts):
+    coefficients = opts.get('coefficients')
+    if not isinstance(coefficients, list):
+        return Estimate(0, 0)
+    k = len(coefficients)
+    # a(n) grows at most like (sum |c|)^n
+    total = sum(abs(c) for c in coefficients if isinstance(c, int))
+    return _recurrence_estimate(opts, k, max(1, total).bit_length())
+
+def mst_cost(opts):
+    # Result-only; reading the graph in dominates every strategy
+    n, m = graph_shape(opts)
+    return Estimate((n + m) * PY_OP, 0)
+
+def topo_sort_cost(opts):
+    n, m = graph_shape(opts)
+    return _traced_cost(opts, n + m, n + m)
+
+def activity_selection_cost(opts):
+    n = _size(opts.get('activities'))
+    if opts.get('mode') == 'sorted':
+        return Estimate(n * PY_OP, 0)
+    if opts.get('mode') == 'weighted':
+        return Estimate(_nlogn(n) * PY_OP, 0)
+    return _traced_cost(opts, _nlogn(n), n)
+
+def batch_cost(item_cost):
+    # A /batch endpoint runs each input result-only
+    def cost(opts):
+        inputs = opts.get('inputs')
+        items = [x for x in inputs if isinstance(x, dict)] if isinstance(inputs, list) else []
+        return Estimate(sum(item_cost(x).result_only().cost for x in items), 0)
+    return cost
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__('Too much work is queued; try again later.')
+        self.retry_after = retry_after
+
+class Scheduler:
+    def __init__(self, slots, max_queued=0):
+        # max_queued: ns of estimated work allowed to wait at once (0: unbounded)
+        self.slots = slots
+        self.free = slots
+        self.max_queued = max_queued
+        self.waiting = []  # heap of (arrival + estimated seconds, seq)
+        self.queued = 0
+        self.cond = threading.Condition()
+        self.seq = itertools.count()
+        self.admitted = 0
+        self.rejected = 0
+
+    def acquire(self, cost, timeout=None):
+        # Wait for a slot, shortest estimated job first. False if none came up within
+        # `timeout`; QueueFull if the work already waiting is over max_queued.
+        with self.cond:
+            if self.free and not self.waiting:
+                self.free -= 1
+                self.admitted += 1
+                return True
+            if self.max_queued and self.queued + cost > self.max_queued:
+                self.rejected += 1
+                raise QueueFull(max(1, math.ceil(self.queued / 1e9 / max(1, self.slots))))
+            ticket = (time.monotonic() + cost / 1e9, next(self.seq))
+            heapq.heappush(self.waiting, ticket)
+            self.queued += cost
+            ready = bool(self.cond.wait_for(lambda: self.free and self.waiting[0] == ticket, timeout))
+            if ready:
+                heapq.heappop(self.waiting)
+                self.free -= 1
+                self.admitted += 1
+            else:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+            self.queued -= cost
+            # The next ticket may be able to go now
+            self.cond.notify_all()
+            return ready
+
+    def release(self):
+        with self.cond:
+            self.free += 1
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {
+                'slots': self.slots,
+                'free': self.free,
+                'waiting': len(self.waiting),
+                'queued_seconds': self.queued / 1e9,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+            }
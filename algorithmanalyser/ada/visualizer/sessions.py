@@ -0,0 +1,53 @@
+# Server-side sessions for the stateful endpoints (DAG and APSP sessions, and
+# cached Dijkstra shortest-path trees).
+#
+# A SessionStore maps random ids to live objects, each with its own lock so
+# concurrent requests on one session are serialized. The least recently used
+# session is dropped past max_sessions, and sessions idle for ttl seconds expire.
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+class SessionStore:
+    def __init__(self, max_sessions=256, ttl=3600):
+        self.max_sessions = max_sessions
+        self.ttl = ttl or None
+        self.sessions = OrderedDict()  # id -> [state, lock, last used]
+        self.lock = threading.Lock()
+
+    def create(self, state, session_id=None):
+        # A given session_id (e.g. a content hash) replaces any session under that id
+        session_id = session_id or uuid.uuid4().hex
+        with self.lock:
+            self._expire()
+            self.sessions.pop(session_id, None)
+            self.sessions[session_id] = [state, threading.Lock(), time.monotonic()]
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return session_id
+
+    def get(self, session_id):
+        # (state, lock) or None; hold the lock while reading or updating the state
+        with self.lock:
+            self._expire()
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                return None
+            entry[2] = time.monotonic()
+            self.sessions.move_to_end(session_id)
+            return entry[0], entry[1]
+
+    def drop(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        if not self.ttl:
+            return
+        cutoff = time.monotonic() - self.ttl
+        while self.sessions:
+            session_id, entry = next(iter(self.sessions.items()))
+            if entry[2] > cutoff:
+                break
+            del self.sessions[session_id]
@@ -0,0 +1,11 @@
+# The backend's `algorithms` package (algorithmanalyser/backend/algorithms), used by
+# the visualizer modules instead of keeping copies of the same algorithms. Importing
+# this module puts the backend directory on sys.path, the way running
+# backend/benchmark.py from backend/ does; pool workers inherit sys.path.
+import os
+import sys
+
+BACKEND_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'backend'))
+
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
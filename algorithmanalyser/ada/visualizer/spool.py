@@ -0,0 +1,226 @@
+# On-disk matrices for Floyd-Warshall / Warshall inputs too large for JSON.
+#
+# An upload (an .npy file, or raw little-endian values plus dtype and shape) is streamed
+# to SPOOL_DIR/<id>.npy in blocks, so nothing is parsed per cell; raw buffers get an
+# .npy header written in front of them. The kernels run in a worker on memory-mapped
+# files: only paths cross the process boundary, the input is read in row bands (which is
+# also where its values are checked), and the result is written to an .npy file of its
+# own under <id>-<algorithm>, fetched like any other spooled matrix. Files expire after
+# ttl seconds, and the oldest are dropped once the spool holds more than max_bytes.
+import os
+import re
+import threading
+import time
+import uuid
+
+import numpy as np
+
+import apsp
+import closure
+
+ROW_BAND = 256
+BLOCK = 1 << 20
+NPY_MAGIC = b'\x93NUMPY'
+ID = re.compile(r'[0-9a-f]{32}(-[a-z-]+)?')
+
+class SpoolFull(Exception):
+    pass
+
+def open_matrix(path):
+    # The spooled matrix, memory-mapped read-only; ValueError unless square and numeric
+    arr = np.load(path, mmap_mode='r', allow_pickle=False)
+    if arr.ndim != 2 or arr.shape[0] != arr.shape[1]:
+        raise ValueError(f'Input must be a square matrix, got shape {list(arr.shape)}.')
+    if arr.dtype.kind not in 'biuf':
+        raise ValueError(f'Matrix entries must be numbers, got dtype {arr.dtype}.')
+    return arr
+
+def describe(arr):
+    return {'dtype': arr.dtype.name, 'shape': list(arr.shape)}
+
+def _discard(tmp):
+    # A half-written file never stays behind in the spool
+    if os.path.exists(tmp):
+        os.unlink(tmp)
+
+def floyd_warshall_file(src, out):
+    # src .npy adjacency (0 off the diagonal = no edge) -> out .npy float64 distances
+    raw = open_matrix(src)
+    n = raw.shape[0]
+    tmp = out + '.tmp'
+    dist = None
+    try:
+        dist = np.lib.format.open_memmap(tmp, mode='w+', dtype='<f8', shape=(n, n))
+        for r0 in range(0, n, ROW_BAND):
+            band = np.array(raw[r0:r0 + ROW_BAND], dtype=np.float64)
+            if np.isnan(band).any() or np.isneginf(band).any():
+                raise ValueError('Matrix entries must be finite numbers or Infinity.')
+            band[band == 0] = np.inf
+            dist[r0:r0 + ROW_BAND] = band
+        dist[np.arange(n), np.arange(n)] = 0
+        apsp.floyd_warshall_bands(dist, ROW_BAND)
+        negative = apsp.negative_cycle_nodes(dist)
+        dist.flush()
+        result = describe(dist)
+        dist = None  # unmap before the rename
+        os.replace(tmp, out)
+    except BaseException:
+        dist = None
+        _discard(tmp)
+        raise
+    return dict(result, negative_cycle=bool(negative), integral=raw.dtype.kind != 'f')
+
+def warshall_file(src, out):
+    # src .npy 0/1 matrix -> out .npy uint8 closure, through the uint64 bitset kernel
+    raw = open_matrix(src)
+    n = raw.shape[0]
+    packed = np.zeros((n, (n + 63) // 64), dtype=closure.WORD)
+    for r0 in range(0, n, ROW_BAND):
+        band = np.asarray(raw[r0:r0 + ROW_BAND])
+        if not np.isin(band, (0, 1)).all():
+            raise ValueError('Matrix must contain only 0 or 1.')
+        packed[r0:r0 + ROW_BAND] = closure.pack(band.astype(bool))
+    packed = closure.bitset_warshall(packed)
+    tmp = out + '.tmp'
+    reach = None
+    try:
+        reach = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.uint8, shape=(n, n))
+        for r0 in range(0, n, ROW_BAND):
+            reach[r0:r0 + ROW_BAND] = closure.unpack(packed[r0:r0 + ROW_BAND], n)
+        reach.flush()
+        result = describe(reach)
+        reach = None  # unmap before the rename
+        os.replace(tmp, out)
+    except BaseException:
+        reach = None
+        _discard(tmp)
+        raise
+    return result
+
+class Spool:
+    def __init__(self, directory, max_bytes=0, ttl=3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, matrix_id):
+        # The file of an existing entry, or None (also for ids that are not ours)
+        if not isinstance(matrix_id, str) or not ID.fullmatch(matrix_id):
+            return None
+        path = os.path.join(self.directory, matrix_id + '.npy')
+        return path if os.path.exists(path) else None
+
+    def result_path(self, matrix_id, algorithm):
+        result_id = f'{matrix_id}-{algorithm}'
+        return result_id, os.path.join(self.directory, result_id + '.npy')
+
+    def info(self, matrix_id):
+        path = self.path(matrix_id)
+        if path is None:
+            return None
+        return describe(np.load(path, mmap_mode='r', allow_pickle=False))
+
+    def save(self, stream, dtype=None, shape=None, size=None):
+        # Write an uploaded body to a new entry: an .npy file, or with dtype and shape
+        # raw little-endian values. Returns (id, describe()); ValueError for a bad
+        # body, SpoolFull when it does not fit in max_bytes.
+        self.expire()
+        room = self.max_bytes - self.used() if self.max_bytes else None
+        if room is not None and size is not None and size > room:
+            raise SpoolFull(f'The upload needs {size} bytes; the spool has {max(room, 0)} free.')
+        matrix_id = uuid.uuid4().hex
+        path = os.path.join(self.directory, matrix_id + '.npy')
+        tmp = path + '.part'
+        try:
+            if dtype is None:
+                with open(tmp, 'wb') as f:
+                    self._copy(stream, f, room)
+                with open(tmp, 'rb') as f:
+                    if f.read(len(NPY_MAGIC)) != NPY_MAGIC:
+                        raise ValueError('Not an .npy file; raw values need ?dtype=...&shape=n,n.')
+            else:
+                offset, expected = self._save_raw(stream, tmp, dtype, shape, room)
+                if os.path.getsize(tmp) - offset != expected:
+                    raise ValueError(f'Expected {expected} bytes of values for that dtype and shape, got {os.path.getsize(tmp) - offset}.')
+            try:
+                arr = open_matrix(tmp)
+            except (OSError, EOFError) as e:
+                raise ValueError(f'Not a readable .npy file: {e}') from None
+            info = describe(arr)
+            del arr
+            os.replace(tmp, path)
+        except BaseException:
+            _discard(tmp)
+            raise
+        return matrix_id, info
+
+    def _save_raw(self, stream, tmp, dtype, shape, room):
+        try:
+            dtype = np.dtype(dtype).newbyteorder('<')
+        except TypeError:
+            raise ValueError(f'Unknown dtype {dtype!r}.') from None
+        if not (isinstance(shape, tuple) and len(shape) == 2 and all(isinstance(x, int) and x >= 0 for x in shape)):
+            raise ValueError('shape must be two non-negative integers, e.g. 5000,5000.')
+        # An .npy header for the given layout, then the body as it arrives
+        with open(tmp, 'wb') as f:
+            np.lib.format.write_array_header_1_0(f, {
+                'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': shape})
+            offset = f.tell()
+            self._copy(stream, f, room)
+        return offset, dtype.itemsize * shape[0] * shape[1]
+
+    def _copy(self, stream, f, room):
+        written = 0
+        while True:
+            block = stream.read(BLOCK)
+            if not block:
+                return
+            written += len(block)
+            if room is not None and written > room:
+                raise SpoolFull(f'The upload is larger than the {max(room, 0)} bytes the spool has free.')
+            f.write(block)
+
+    def drop(self, matrix_id):
+        path = self.path(matrix_id)
+        if path is None:
+            return False
+        os.unlink(path)
+        return True
+
+    def entries(self):
+        # [(mtime, bytes, path)] oldest first
+        out = []
+        for name in os.listdir(self.directory):
+            if ID.fullmatch(name[:-4]) and name.endswith('.npy'):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                out.append((st.st_mtime, st.st_size, path))
+        return sorted(out)
+
+    def used(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def expire(self):
+        # Drop entries older than ttl, then the oldest while over max_bytes
+        with self.lock:
+            entries = self.entries()
+            cutoff = time.time() - self.ttl if self.ttl else None
+            total = sum(size for _, size, _ in entries)
+            for mtime, size, path in entries:
+                if (cutoff is None or mtime > cutoff) and (not self.max_bytes or total <= self.max_bytes):
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def stats(self):
+        entries = self.entries()
+        return {'directory': self.directory, 'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes, 'ttl': self.ttl}
@@ -0,0 +1,58 @@
+# Compact shortest-path-tree responses for Dijkstra.
+#
+# A single-source result is sent as its distances and `prev` predecessor array,
+# both O(n), instead of one explicit path per target (O(n^2) on path-like graphs).
+# By default they are typed arrays: {"dtype": "float64", "data": <base64>} of the
+# little-endian values, which a browser decodes with new Float64Array(bytes.buffer).
+# Unreachable nodes are inf in the float64 distances and -1 in the int32 `prev`;
+# the plain-list form uses null for both, so the JSON never holds `Infinity`. Binary
+# responses (wire.py) take the NumPy arrays themselves.
+# Trees are kept under a content-addressed id for per-target path queries.
+import base64
+import math
+
+import numpy as np
+
+from cache import cache_key
+
+GRAPH_FIELDS = ('matrix', 'edges', 'n', 'indptr', 'indices', 'weights')
+
+def encode_array(values, dtype):
+    return {'dtype': dtype, 'data': base64.b64encode(np.asarray(values, dtype=np.dtype(dtype).newbyteorder('<')).tobytes()).decode('ascii')}
+
+def decode_array(obj):
+    return np.frombuffer(base64.b64decode(obj['data']), dtype=np.dtype(obj['dtype']).newbyteorder('<'))
+
+def distances(dist, form='typed'):
+    # form: 'typed' (base64 typed array), 'array' (ndarray) or 'list'
+    if form == 'list':
+        return [None if math.isinf(d) else d for d in dist]
+    values = np.asarray(dist, dtype=np.float64)
+    return values if form == 'array' else encode_array(values, 'float64')
+
+def predecessors(prev, form='typed'):
+    if form == 'list':
+        return prev
+    values = np.array([-1 if p is None else p for p in prev], dtype=np.int32)
+    return values if form == 'array' else encode_array(values, 'int32')
+
+def path_to(prev, dist, target):
+    # source -> target along prev, or None if target is unreachable
+    if math.isinf(dist[target]):
+        return None
+    path = []
+    x = target
+    while x is not None:
+        path.append(x)
+        x = prev[x]
+    return path[::-1]
+
+def all_paths(prev, dist):
+    # The old response's explicit paths: one per reachable target, in node order
+    return [path_to(prev, dist, t) for t in range(len(dist)) if not math.isinf(dist[t])]
+
+def graph_key(data):
+    return cache_key('dijkstra-graph', {k: data[k] for k in GRAPH_FIELDS if k in data})
+
+def tree_id(graph_hash, source):
+    return cache_key(graph_hash, source)[:32]
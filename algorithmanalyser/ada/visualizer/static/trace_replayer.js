@@ -0,0 +1,73 @@
+// Rebuilds visualization frames from the compact event traces returned with
+// `trace=events` (see tracing.py). Frame t is the state after events[0..t].
+
+function applyEvent(state, event) {
+  switch (event.op) {
+    case 'init':
+    case 'checkpoint':
+      for (const key of Object.keys(event)) {
+        if (key !== 'op') state[key] = event[key].slice();
+      }
+      break;
+    case 'swap': {
+      const a = state.array;
+      const tmp = a[event.i];
+      a[event.i] = a[event.j];
+      a[event.j] = tmp;
+      break;
+    }
+    case 'write':
+      state.array[event.i] = event.v;
+      break;
+    case 'pop':
+      state.order.push(event.v);
+      break;
+    case 'dec':
+      state.indegree[event.v] -= 1;
+      break;
+    default:
+      break;
+  }
+  return state;
+}
+
+export class TraceReplayer {
+  constructor(events) {
+    this.events = events;
+    this.checkpoints = [];
+    events.forEach((event, idx) => {
+      if (event.op === 'init' || event.op === 'checkpoint') this.checkpoints.push(idx);
+    });
+    this.state = null;
+    this.position = -1;
+  }
+
+  get length() {
+    return this.events.length;
+  }
+
+  // State after applying events[0..t]; stepping forward reuses the current state.
+  frame(t) {
+    if (this.state === null || t < this.position || this.nearestCheckpoint(t) > this.position) {
+      const start = this.nearestCheckpoint(t);
+      this.state = {};
+      this.position = start - 1;
+    }
+    for (let idx = this.position + 1; idx <= t; idx++) {
+      applyEvent(this.state, this.events[idx]);
+    }
+    this.position = t;
+    return this.state;
+  }
+
+  nearestCheckpoint(t) {
+    let lo = 0;
+    let hi = this.checkpoints.length - 1;
+    while (lo < hi) {
+      const mid = (lo + hi + 1) >> 1;
+      if (this.checkpoints[mid] <= t) lo = mid;
+      else hi = mid - 1;
+    }
+    return this.checkpoints[lo];
+  }
+}
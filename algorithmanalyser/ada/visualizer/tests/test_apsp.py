@@ -0,0 +1,39 @@
+# Tiled Floyd-Warshall against the single-pass kernel, on random matrices.
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import apsp
+
+def random_matrix(rng, n, density, negative=False):
+    # Integer weights, 0 = no edge; with negative weights only the i < j edges are kept
+    # (a DAG), so there is no negative cycle
+    weights = rng.integers(1, 100, size=(n, n))
+    edges = rng.random((n, n)) < density
+    if negative:
+        weights = np.where(weights > 50, weights - 101, weights)
+        edges &= np.triu(np.ones((n, n), dtype=bool), 1)
+    return np.where(edges, weights, 0).tolist()
+
+@pytest.mark.parametrize('n', [1, 2, 7, 33, 64])
+@pytest.mark.parametrize('tile_size', [1, 3, 8, 16, 64, 256])
+@pytest.mark.parametrize('negative', [False, True])
+def test_blocked_matches_floyd_warshall(n, tile_size, negative):
+    rng = np.random.default_rng(n * 1000 + tile_size)
+    for density in (0.1, 0.5, 1.0):
+        dist, _ = apsp.dist_array(random_matrix(rng, n, density, negative))
+        expected = apsp.floyd_warshall(dist.copy())
+        for workers in (1, 2):
+            out = apsp.blocked_floyd_warshall(dist, tile_size, workers)
+            np.testing.assert_array_equal(out, expected)
+
+def test_blocked_leaves_input_alone():
+    rng = np.random.default_rng(0)
+    dist, _ = apsp.dist_array(random_matrix(rng, 20, 0.3))
+    before = dist.copy()
+    apsp.blocked_floyd_warshall(dist, 4)
+    np.testing.assert_array_equal(dist, before)
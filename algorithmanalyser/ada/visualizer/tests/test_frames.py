@@ -0,0 +1,33 @@
+# GET /api/*/frames/<id>: frames of a logged Floyd-Warshall run.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('ANALYSER_WORKERS', '1')
+os.environ.setdefault('ANALYSER_CACHE_BYTES', '0')
+os.environ.setdefault('ANALYSER_TRACE_LIMIT', '0')
+
+import api_server
+
+@pytest.fixture(scope='module')
+def frames():
+    client = api_server.app.test_client()
+    matrix = [[0, 4, 0], [0, 0, 1], [2, 0, 0]]
+    out = client.post('/api/floyd-warshall', json={'matrix': matrix, 'include': 'frames'}).get_json()
+    yield client, f"/api/floyd-warshall/frames/{out['frames']['id']}"
+    api_server.worker_pool.shutdown()
+
+def test_default_is_the_last_frame(frames):
+    client, url = frames
+    out = client.get(url).get_json()
+    assert out['k'] == out['count'] - 1
+    assert out['matrix'] == [[0, 4, 5], [3, 0, 1], [2, 6, 0]]
+
+@pytest.mark.parametrize('k', ['abc', '1.5', '-1', '', '99'])
+def test_invalid_k_is_rejected(frames, k):
+    client, url = frames
+    response = client.get(f'{url}?k={k}')
+    assert response.status_code == 400
+    assert 'k must be a frame index' in response.get_json()['error']
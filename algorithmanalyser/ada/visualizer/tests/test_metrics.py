@@ -0,0 +1,67 @@
+# metrics=1 / metrics=only count the kernel that produced the response.
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('ANALYSER_WORKERS', '1')
+os.environ.setdefault('ANALYSER_CACHE_BYTES', '0')
+os.environ.setdefault('ANALYSER_TRACE_LIMIT', '0')
+
+import api_server
+import opcount
+from graph import parse_graph
+
+@pytest.fixture(scope='module')
+def client():
+    yield api_server.app.test_client()
+    api_server.worker_pool.shutdown()
+
+def random_graph(n, density, seed=0):
+    rng = np.random.default_rng(seed)
+    weights = rng.integers(1, 100, size=(n, n))
+    weights = np.triu(np.where(rng.random((n, n)) < density, weights, 0), 1)
+    return (weights + weights.T).tolist()
+
+@pytest.mark.parametrize('kernel, args', [
+    (api_server.iter_activity_selection_steps, ([[5, 9], [1, 2], [3, 4], [0, 6], [5, 7], [8, 9]],)),
+    (api_server.iter_knapsack_steps, ([1, 3, 4, 5], [1, 4, 5, 7], 7)),
+    (api_server.iter_topo_sort_kahn_steps, (parse_graph({'matrix': [[0, 1, 1, 0], [0, 0, 0, 1], [0, 0, 0, 1], [0, 0, 0, 0]]}),)),
+    (api_server.iter_prims_steps, (parse_graph({'matrix': random_graph(12, 0.4)}, undirected=True),)),
+    (api_server.iter_kruskal_steps, (parse_graph({'matrix': random_graph(12, 0.4)}, undirected=True),)),
+    (api_server.iter_dijkstra_steps, (parse_graph({'matrix': random_graph(12, 0.4)}), 0)),
+])
+def test_counting_mode_returns_the_traced_result(kernel, args):
+    _, traced = api_server.collect_trace(kernel, *args)
+    counted, counts = opcount.counted(kernel, *args)
+    assert counted == traced
+    assert counts and all(isinstance(c, int) for c in counts.values())
+
+def test_activity_selection_counts_the_sort(client):
+    activities = [[i, i + 1] for i in range(50, 0, -1)]
+    out = client.post('/api/activity-selection', json={'activities': activities, 'metrics': 'only'}).get_json()
+    assert out['metrics']['sort_comparisons'] >= len(activities) - 1
+    assert out['metrics']['comparisons'] == out['metrics']['sort_comparisons'] + len(activities)
+
+def test_knapsack_counts_the_kernel_that_answers(client):
+    body = {'weights': [1, 3, 4, 5], 'profits': [1, 4, 5, 7], 'capacity': 7, 'metrics': 'only'}
+    table = client.post('/api/knapsack', json=body).get_json()
+    lean = client.post('/api/knapsack', json=dict(body, mode='lean')).get_json()
+    assert table['result'] == lean['result'] == 9
+    # The full table writes every cell; the lean row only the cells the include branch won
+    assert table['metrics']['writes'] == 4 * 8
+    assert lean['metrics']['writes'] < table['metrics']['writes']
+
+def test_knapsack_validates_before_counting(client):
+    body = {'weights': [1, -3], 'profits': [1, 4], 'capacity': 7, 'metrics': 1}
+    response = client.post('/api/knapsack', json=body)
+    assert response.status_code == 400
+    assert 'non-negative' in response.get_json()['error']
+
+@pytest.mark.parametrize('density, strategy, key', [(0.9, 'dense-prim', 'comparisons'), (0.1, 'kruskal', 'finds')])
+def test_mst_counts_the_chosen_strategy(client, density, strategy, key):
+    out = client.post('/api/mst', json={'matrix': random_graph(40, density, 1), 'metrics': 1}).get_json()
+    assert out['strategy'] == strategy
+    assert key in out['metrics']
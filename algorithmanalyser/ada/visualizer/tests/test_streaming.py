@@ -0,0 +1,51 @@
+# Streamed responses run in the worker pool under the same limits as the others.
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('ANALYSER_WORKERS', '1')
+os.environ.setdefault('ANALYSER_CACHE_BYTES', '0')
+os.environ.setdefault('ANALYSER_TRACE_LIMIT', '0')  # keep the full trace of the big matrix
+
+import api_server
+
+@pytest.fixture(scope='module')
+def client():
+    client = api_server.app.test_client()
+    # Start the pool, so the limits below time the work and not a worker's start-up
+    assert client.post('/api/merge-sort?stream=1', json={'array': [2, 1]}).status_code == 200
+    yield client
+    api_server.worker_pool.shutdown()
+
+def lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def big_matrix(n=150):
+    rng = np.random.default_rng(0)
+    return rng.integers(1, 100, size=(n, n)).tolist()
+
+def test_stream_runs_to_the_result(client):
+    out = lines(client.post('/api/merge-sort?stream=1', json={'array': [3, 1, 2]}))
+    assert out[-1]['result'] == [1, 2, 3]
+    assert all('step' in line for line in out[:-1])
+
+def test_stream_hits_the_timeout(client):
+    body = {'matrix': big_matrix()}
+    assert client.post('/api/floyd-warshall?timeout=0.05', json=body).status_code == 504
+    response = client.post('/api/floyd-warshall?timeout=0.05&stream=1', json=body)
+    last = lines(response)[-1]
+    assert last['limit'] == 'wall' and 'result' not in last
+    # The killed worker is replaced and the pool keeps serving
+    out = lines(client.post('/api/merge-sort?stream=1', json={'array': [2, 1]}))
+    assert out[-1]['result'] == [1, 2]
+
+def test_stream_closed_early_frees_the_worker(client):
+    response = client.post('/api/floyd-warshall?stream=1', json={'matrix': big_matrix()}, buffered=False)
+    next(response.response)
+    response.close()
+    out = lines(client.post('/api/merge-sort?stream=1', json={'array': [2, 1]}))
+    assert out[-1]['result'] == [1, 2]
@@ -0,0 +1,136 @@
+# Per-request phase timings, Prometheus metrics and profiles for the API.
+#
+# A Timer (one per request) adds up the wall time of named phases: parse (decoding the
+# body), validate (checking and converting the input), queue (waiting for a worker),
+# compute (the algorithm in a worker; "trace" when the run also builds steps or events,
+# which interleaves the two), serialize (jsonify / wire encoding) and gzip. They go
+# back in a Server-Timing header. Metrics keeps per-endpoint counters and histograms
+# (request time, phase times, body and response sizes, trace lines) and renders them
+# in the Prometheus text format. profiled() runs a function under cProfile, in a worker
+# if need be, and returns its top entries by cumulative time. cProfile is deterministic,
+# not sampling: it traces every call, so the counts are exact and a profiled run is
+# slower than an unprofiled one, most of all for code making many small calls.
+import cProfile
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+SECONDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES = tuple(256 * 4**i for i in range(12))  # 256 B .. 1 GiB
+LINES = tuple(10**i for i in range(8))
+PROFILE_TOP = 25
+
+class Timer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.lines = None  # steps / events the response carries, when it has a trace
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def header(self):
+        # Server-Timing: milliseconds per phase, in the order they first ran, then total
+        parts = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.phases.items()]
+        return ', '.join(parts + [f'total;dur={self.elapsed() * 1000:.2f}'])
+
+def phase(timer, name):
+    return nullcontext() if timer is None else timer.phase(name)
+
+def _labels(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{k}="{escape(v)}"' for k, v in labels)
+
+def _number(x):
+    if isinstance(x, bool):
+        return str(int(x))
+    return repr(float(x)) if isinstance(x, float) else str(x)
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help = {}
+        self.counters = {}    # name -> {labels: value}
+        self.histograms = {}  # name -> (buckets, {labels: [count per bucket..., over the last, sum, count]})
+
+    def counter(self, name, help):
+        self.help[name] = help
+        self.counters[name] = {}
+
+    def histogram(self, name, help, buckets):
+        self.help[name] = help
+        self.histograms[name] = (buckets, {})
+
+    def inc(self, name, labels, amount=1):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets, series = self.histograms[name]
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * (len(buckets) + 3)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(buckets)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def render(self, gauges=()):
+        # The text exposition format; gauges: (name, help, [(labels, value)]) taken now
+        out = []
+        with self.lock:
+            for name, series in self.counters.items():
+                out += [f'# HELP {name} {self.help[name]}', f'# TYPE {name} counter']
+                out += [f'{name}{{{_labels(k)}}} {_number(v)}' for k, v in series.items()]
+            for name, (buckets, series) in self.histograms.items():
+                out += [f'# HELP {name} {self.help[name]}', f'# TYPE {name} histogram']
+                for key, counts in series.items():
+                    total = 0
+                    for bound, count in zip(buckets + ('+Inf',), counts):
+                        total += count
+                        out.append(f'{name}_bucket{{{_labels(key + (("le", _number(bound)),))}}} {total}')
+                    out.append(f'{name}_sum{{{_labels(key)}}} {_number(counts[-2])}')
+                    out.append(f'{name}_count{{{_labels(key)}}} {counts[-1]}')
+        for name, help, series in gauges:
+            out += [f'# HELP {name} {help}', f'# TYPE {name} gauge']
+            out += [f'{name}{{{_labels(sorted(k.items()))}}} {_number(v)}' for k, v in series]
+        return '\n'.join(out) + '\n'
+
+def summary(profiler, top=PROFILE_TOP):
+    # The top entries of a finished cProfile.Profile, by cumulative time
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    return [{'function': pstats.func_std_string(pstats.func_strip_path(func)), 'calls': nc,
+             'tottime': round(tt, 6), 'cumtime': round(ct, 6)} for func, (_, nc, tt, ct, _) in rows]
+
+def profiled(func, *args, top=PROFILE_TOP):
+    # (func(*args), summary of its top entries) from a full deterministic profile of the
+    # call; picklable, so it runs in a worker too
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = func(*args)
+    finally:
+        profiler.disable()
+    return result, summary(profiler, top)
@@ -0,0 +1,266 @@
+# Structured trace events for the sort and topological sort visualizations.
+#
+# Every event is a small dict keyed by "op" that only carries the indices/values it
+# touches, e.g. {"op": "swap", "i": 3, "j": 7}. The full state is only emitted in
+# "init" / "checkpoint" events, once every `every` events, so building a trace is
+# linear in the number of operations. static/trace_replayer.js rebuilds the state at
+# any event index on the client from the nearest checkpoint.
+#
+# The sorts are single-pass: each *_trace generator runs its algorithm once, in
+# place, and emits whichever trace was asked for -- events, the step strings of the
+# /api/*-sort responses (emit='steps'), or nothing -- and, given an outputs dict,
+# fills in the other outputs it can build on the way (the merge sort tree). With
+# emit='counts' it yields nothing and puts the comparisons, swaps and writes it made
+# in outputs['counts'] (opcount.py); swaps of an element with itself are not counted.
+import random
+
+MIN_CHECKPOINT_EVERY = 64
+
+def checkpointed(ops, snapshot, every=None, size=0):
+    # Wrap an op generator: emit an "init" snapshot first and a "checkpoint"
+    # snapshot after every `every` ops. Returns whatever the op generator returns.
+    every = every or max(size, MIN_CHECKPOINT_EVERY)
+    yield dict(op='init', **snapshot())
+    since = 0
+    while True:
+        try:
+            event = next(ops)
+        except StopIteration as stop:
+            return stop.value
+        yield event
+        since += 1
+        if since >= every:
+            since = 0
+            yield dict(op='checkpoint', **snapshot())
+
+def merge_sort_trace(a, emit='events', outputs=None):
+    # Recursion order of the top-down sort, on an explicit stack. With outputs,
+    # outputs['tree'] is the recursion tree: {'range', 'array', 'left', 'right',
+    # 'merged'} per call, 'array' as the call received it, 'merged' after its merge.
+    steps, events, counting = emit == 'steps', emit == 'events', emit == 'counts'
+    tree = outputs is not None and not counting
+    comparisons = writes = 0
+    node = lambda l, r: {'range': [l, r], 'array': a[l:r+1], 'left': None, 'right': None, 'merged': None}
+    nodes = {}  # (l, r) -> node of a call that has not been merged into its parent yet
+    root = node(0, len(a)-1) if tree and a else None
+    stack = [(0, len(a)-1, False, 0)]
+    while stack:
+        l, r, merging, depth = stack.pop()
+        if l >= r:
+            continue
+        m = (l + r) // 2
+        if not merging:
+            if events:
+                yield {'op': 'split', 'l': l, 'm': m, 'r': r}
+            elif steps:
+                yield f"{'  '*depth}Dividing: {a[l:r+1]}"
+            if tree:
+                parent = nodes.get((l, r), root)
+                parent['left'] = nodes[(l, m)] = node(l, m)
+                parent['right'] = nodes[(m+1, r)] = node(m+1, r)
+            stack.append((l, r, True, depth))
+            stack.append((m+1, r, False, depth+1))
+            stack.append((l, m, False, depth+1))
+            continue
+        left = a[l:m+1]
+        right = a[m+1:r+1]
+        if tree:
+            # Both halves are final by the time their parent merges
+            for child, merged in ((nodes.pop((l, m)), left), (nodes.pop((m+1, r)), right)):
+                if child['left'] is not None:
+                    child['merged'] = merged
+        indent = '  '*depth
+        if events:
+            yield {'op': 'merge', 'l': l, 'm': m, 'r': r}
+        elif steps:
+            yield f"{indent}Merging: {left} and {right}"
+        i = j = 0
+        k = l
+        while i < len(left) and j < len(right):
+            # Indices refer to the segment as it was when the merge started
+            if events:
+                yield {'op': 'cmp', 'i': l+i, 'j': m+1+j}
+            elif steps:
+                yield f"{indent}Compare {left[i]} and {right[j]}"
+            elif counting:
+                comparisons += 1
+            if left[i] < right[j]:
+                a[k] = left[i]
+                i += 1
+            else:
+                a[k] = right[j]
+                j += 1
+            if events:
+                yield {'op': 'write', 'i': k, 'v': a[k]}
+            elif steps:
+                yield f"{indent}Insert {a[k]} at position {k}"
+            elif counting:
+                writes += 1
+            k += 1
+        while i < len(left):
+            a[k] = left[i]
+            if events:
+                yield {'op': 'write', 'i': k, 'v': a[k]}
+            elif steps:
+                yield f"{indent}Insert {a[k]} at position {k}"
+            elif counting:
+                writes += 1
+            i += 1
+            k += 1
+        while j < len(right):
+            a[k] = right[j]
+            if events:
+                yield {'op': 'write', 'i': k, 'v': a[k]}
+            elif steps:
+                yield f"{indent}Insert {a[k]} at position {k}"
+            elif counting:
+                writes += 1
+            j += 1
+            k += 1
+        if steps:
+            yield f"{indent}After merge: {a[l:r+1]}"
+    if steps:
+        yield f"Sorted array: {a}"
+    if tree:
+        if root is not None and root['left'] is not None:
+            root['merged'] = a[:]
+        outputs['tree'] = root
+    if counting:
+        outputs['counts'] = {'comparisons': comparisons, 'writes': writes}
+    return a
+
+def quick_sort_trace(a, pivot_strategy='last', pivot_index=None, rng=random, emit='events', outputs=None):
+    # Lomuto partition, left part first as the recursive version would (so the rng
+    # sees the same calls). Events leave out swaps of an element with itself.
+    steps, events, counting = emit == 'steps', emit == 'events', emit == 'counts'
+    comparisons = swaps = 0
+    stack = [(0, len(a)-1, 0)]
+    while stack:
+        l, r, depth = stack.pop()
+        if l >= r:
+            continue
+        if pivot_strategy == 'first':
+            idx, label = l, f"first element (index {l})"
+        elif pivot_strategy == 'random':
+            idx = rng.randint(l, r)
+            label = f"random element (index {idx})"
+        elif pivot_strategy == 'custom' and pivot_index is not None and l <= pivot_index <= r:
+            idx, label = pivot_index, f"custom index {pivot_index}"
+        else:
+            idx, label = r, f"last element (index {r})"
+        if events:
+            yield {'op': 'pivot', 'i': idx}
+        if idx != r:
+            a[idx], a[r] = a[r], a[idx]
+            if events:
+                yield {'op': 'swap', 'i': idx, 'j': r}
+            elif counting:
+                swaps += 1
+        pivot = a[r]
+        indent = '  '*depth
+        if events:
+            yield {'op': 'partition', 'l': l, 'r': r}
+        elif steps:
+            yield f"{indent}Pivot strategy: {label}"
+            yield f"{indent}Partitioning: {a[l:r+1]}, pivot={pivot}"
+        i = l - 1
+        for j in range(l, r):
+            if events:
+                yield {'op': 'cmp', 'i': j, 'j': r}
+            elif steps:
+                yield f"{indent}Compare a[{j}]={a[j]} with pivot={pivot}"
+            elif counting:
+                comparisons += 1
+            if a[j] <= pivot:
+                i += 1
+                a[i], a[j] = a[j], a[i]
+                if events:
+                    if i != j:
+                        yield {'op': 'swap', 'i': i, 'j': j}
+                elif steps:
+                    yield f"{indent}Swap a[{i}] and a[{j}]: {a}"
+                elif counting and i != j:
+                    swaps += 1
+        pi = i + 1
+        a[pi], a[r] = a[r], a[pi]
+        if events:
+            if pi != r:
+                yield {'op': 'swap', 'i': pi, 'j': r}
+            yield {'op': 'place', 'i': pi}
+        elif steps:
+            yield f"{indent}Swap a[{pi}] and a[{r}]: {a}"
+            yield f"{indent}Pivot {pivot} placed at index {pi}"
+        elif counting and pi != r:
+            swaps += 1
+        stack.append((pi+1, r, depth+1))
+        stack.append((l, pi-1, depth+1))
+    if steps:
+        yield f"Sorted array: {a}"
+    if counting:
+        outputs['counts'] = {'comparisons': comparisons, 'swaps': swaps, 'writes': 2 * swaps}
+    return a
+
+def selection_sort_trace(a, emit='events', outputs=None):
+    steps, events, counting = emit == 'steps', emit == 'events', emit == 'counts'
+    comparisons = swaps = 0
+    n = len(a)
+    for i in range(n):
+        min_idx = i
+        if events:
+            yield {'op': 'pass', 'i': i}
+        elif steps:
+            yield f"Step {i+1}: Start from index {i}, current array: {a}"
+        for j in range(i+1, n):
+            if events:
+                yield {'op': 'cmp', 'i': j, 'j': min_idx}
+            elif steps:
+                yield f"  Compare arr[{j}]={a[j]} with current min arr[{min_idx}]={a[min_idx]}"
+            elif counting:
+                comparisons += 1
+            if a[j] < a[min_idx]:
+                min_idx = j
+                if events:
+                    yield {'op': 'min', 'i': j}
+                elif steps:
+                    yield f"  New min found at index {min_idx}: {a[min_idx]}"
+        a[i], a[min_idx] = a[min_idx], a[i]
+        if events:
+            if min_idx != i:
+                yield {'op': 'swap', 'i': i, 'j': min_idx}
+        elif steps:
+            yield f"  Swap arr[{i}] and arr[{min_idx}]: {a}"
+        elif counting and min_idx != i:
+            swaps += 1
+    if steps:
+        yield f"Sorted array: {a}"
+    if counting:
+        outputs['counts'] = {'comparisons': comparisons, 'swaps': swaps, 'writes': 2 * swaps}
+    return a
+
+def _topo_sort_kahn_ops(graph, indegree, order):
+    from collections import deque
+    n = graph.n
+    queue = deque(i for i in range(n) if indegree[i] == 0)
+    for u in queue:
+        yield {'op': 'push', 'v': u}
+    while queue:
+        u = queue.popleft()
+        order.append(u)
+        yield {'op': 'pop', 'v': u}
+        for v, _ in graph.neighbors(u):
+            indegree[v] -= 1
+            yield {'op': 'dec', 'v': v}
+            if indegree[v] == 0:
+                queue.append(v)
+                yield {'op': 'push', 'v': v}
+    if len(order) != n:
+        yield {'op': 'cycle'}
+        return None
+    return order
+
+def topo_sort_kahn_events(graph, every=None):
+    # graph: graph.Graph
+    indegree = graph.indegrees()
+    order = []
+    snapshot = lambda: {'indegree': indegree[:], 'order': order[:]}
+    return checkpointed(_topo_sort_kahn_ops(graph, indegree, order), snapshot, every, graph.n)
@@ -0,0 +1,148 @@
+# Binary encodings for request and response bodies.
+#
+# Besides JSON, bodies can be sent and requested (Content-Type / Accept) as
+#   application/x-analyser-arrays   b'ADA1', uint32 header length, a JSON header
+#                                   {"body": ..., "arrays": [{dtype, shape, offset}]}
+#                                   padded to 8 bytes, then the raw little-endian
+#                                   arrays, each 8-byte aligned. In the body an array
+#                                   is {"$array": index}.
+#   application/msgpack             MessagePack, when the msgpack package is installed;
+#                                   an array is a map {"dtype", "shape", "data": bin}.
+# Any numeric vector or rectangular matrix in a payload (a NumPy array, or nested
+# lists of at least ARRAY_MIN numbers) travels as a typed array; everything else is
+# encoded as usual. Decoded request arrays are turned back into lists, so endpoints
+# see the same body as from JSON.
+import json
+import struct
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # the x-analyser-arrays format needs nothing extra
+    msgpack = None
+
+JSON = 'application/json'
+ARRAYS = 'application/x-analyser-arrays'
+MSGPACK = 'application/msgpack'
+MAGIC = b'ADA1'
+ARRAY_MIN = 16
+
+def formats():
+    return [JSON, ARRAYS] + ([MSGPACK] if msgpack is not None else [])
+
+def is_binary(mimetype):
+    return mimetype in (ARRAYS, MSGPACK)
+
+def to_array(value):
+    # The value as a little-endian ndarray if it is a numeric vector/matrix, else None
+    if isinstance(value, np.ndarray):
+        arr = value
+    else:
+        leaf = value
+        while isinstance(leaf, (list, tuple)) and leaf:
+            leaf = leaf[0]
+        if isinstance(leaf, bool) or not isinstance(leaf, (int, float)):
+            return None
+        try:
+            arr = np.asarray(value)
+        except (ValueError, OverflowError):  # ragged, or ints past int64
+            return None
+        if arr.size < ARRAY_MIN:
+            return None
+    if arr.dtype.kind not in 'biuf':
+        return None
+    return np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder('<'))
+
+def _pack(value, store):
+    # The payload with every numeric array replaced by store(array)
+    if isinstance(value, dict):
+        return {k: _pack(v, store) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        arr = to_array(value)
+        if arr is not None:
+            return store(arr)
+        return [_pack(v, store) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _unpack(value, load):
+    # The decoded payload with load(obj) applied to every array reference
+    if isinstance(value, dict):
+        arr = load(value)
+        if arr is not None:
+            return arr
+        return {k: _unpack(v, load) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_unpack(v, load) for v in value]
+    return value
+
+def _pad(size):
+    return -size % 8
+
+def encode_arrays(payload):
+    blobs, meta = [], []
+    def store(arr):
+        meta.append({'dtype': arr.dtype.name, 'shape': list(arr.shape)})
+        blobs.append(arr.tobytes())
+        return {'$array': len(meta) - 1}
+    body = _pack(payload, store)
+    offset = 0
+    for entry, blob in zip(meta, blobs):
+        entry['offset'] = offset
+        offset += len(blob) + _pad(len(blob))
+    header = json.dumps({'body': body, 'arrays': meta}, separators=(',', ':')).encode('utf-8')
+    header += b' ' * _pad(len(MAGIC) + 4 + len(header))
+    parts = [MAGIC, struct.pack('<I', len(header)), header]
+    for blob in blobs:
+        parts.append(blob)
+        parts.append(b'\0' * _pad(len(blob)))
+    return b''.join(parts)
+
+def decode_arrays(data, as_lists=True):
+    if data[:4] != MAGIC:
+        raise ValueError('Not an x-analyser-arrays body.')
+    (size,) = struct.unpack_from('<I', data, 4)
+    header = json.loads(data[8:8 + size])
+    start = 8 + size
+    arrays = []
+    for entry in header['arrays']:
+        dtype = np.dtype(entry['dtype']).newbyteorder('<')
+        count = int(np.prod(entry['shape'], dtype=np.int64))
+        arr = np.frombuffer(data, dtype=dtype, count=count, offset=start + entry['offset']).reshape(entry['shape'])
+        arrays.append(arr.tolist() if as_lists else arr)
+    def load(obj):
+        if len(obj) == 1 and '$array' in obj:
+            return arrays[obj['$array']]
+        return None
+    return _unpack(header['body'], load)
+
+def encode_msgpack(payload):
+    def store(arr):
+        return {'dtype': arr.dtype.name, 'shape': list(arr.shape), 'data': arr.tobytes()}
+    return msgpack.packb(_pack(payload, store), use_bin_type=True)
+
+def decode_msgpack(data, as_lists=True):
+    def load(obj):
+        if obj.keys() != {'dtype', 'shape', 'data'} or not isinstance(obj['data'], bytes):
+            return None
+        arr = np.frombuffer(obj['data'], dtype=np.dtype(obj['dtype']).newbyteorder('<')).reshape(obj['shape'])
+        return arr.tolist() if as_lists else arr
+    return _unpack(msgpack.unpackb(data, raw=False), load)
+
+def encode(mimetype, payload):
+    if mimetype == ARRAYS:
+        return encode_arrays(payload)
+    if mimetype == MSGPACK:
+        return encode_msgpack(payload)
+    raise ValueError(f'Unsupported format {mimetype!r}.')
+
+def decode(mimetype, data):
+    if mimetype == ARRAYS:
+        return decode_arrays(data)
+    if mimetype == MSGPACK:
+        if msgpack is None:
+            raise ValueError('MessagePack bodies need the msgpack package.')
+        return decode_msgpack(data)
+    return json.loads(data)
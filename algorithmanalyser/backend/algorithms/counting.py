@@ -0,0 +1,73 @@
+# Operation counting for the sequence algorithms in this package.
+#
+# count_ops(func, arr) runs func on a CountingList whose elements (and the items of
+# nested tuples/lists) are wrapped in Counted: every comparison between elements
+# bumps counts['comparisons'], every item assignment on the list (or a slice taken
+# from it) bumps counts['writes']. The algorithms themselves are untouched, so a
+# normal call pays nothing.
+class Counted:
+    __slots__ = ('value', 'counts')
+
+    def __init__(self, value, counts):
+        self.value = value
+        self.counts = counts
+
+    def _cmp(self, other):
+        self.counts['comparisons'] += 1
+        return other.value if isinstance(other, Counted) else other
+
+    def __lt__(self, other):
+        return self.value < self._cmp(other)
+
+    def __le__(self, other):
+        return self.value <= self._cmp(other)
+
+    def __gt__(self, other):
+        return self.value > self._cmp(other)
+
+    def __ge__(self, other):
+        return self.value >= self._cmp(other)
+
+    def __eq__(self, other):
+        return self.value == self._cmp(other)
+
+    def __ne__(self, other):
+        return self.value != self._cmp(other)
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self):
+        return repr(self.value)
+
+class CountingList(list):
+    def __init__(self, items, counts):
+        super().__init__(items)
+        self.counts = counts
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CountingList(super().__getitem__(index), self.counts)
+        return super().__getitem__(index)
+
+    def __setitem__(self, index, value):
+        self.counts['writes'] += len(value) if isinstance(index, slice) else 1
+        super().__setitem__(index, value)
+
+def wrap(x, counts):
+    if isinstance(x, (list, tuple)):
+        return type(x)(wrap(y, counts) for y in x)
+    return Counted(x, counts)
+
+def unwrap(x):
+    if isinstance(x, Counted):
+        return x.value
+    if isinstance(x, (list, tuple)):
+        return (list if isinstance(x, list) else type(x))(unwrap(y) for y in x)
+    return x
+
+def count_ops(func, arr, *args):
+    # Returns (func's result with plain values, {'comparisons': ..., 'writes': ...})
+    counts = {'comparisons': 0, 'writes': 0}
+    result = func(CountingList((wrap(x, counts) for x in arr), counts), *args)
+    return unwrap(result), counts
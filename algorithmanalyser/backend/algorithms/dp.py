@@ -1,17 +1,118 @@
-def fibonacci(n):
-    dp = [0, 1]
-    for i in range(2, n+1):
-        dp.append(dp[-1] + dp[-2])
-    return dp[n]
+import functools
 
+# Solved (coefficients, initial, n, mod) kept by linear_recurrence
+RECURRENCE_CACHE_SIZE = 128
+
+def fib_doubling(n, mod=None):
+    # Fast doubling, most significant bit of n first:
+    # F(2k) = F(k)(2F(k+1) - F(k)), F(2k+1) = F(k)^2 + F(k+1)^2.
+    # Yields (bit, k, F(k), F(k+1)) after each bit; returns (F(n), F(n+1)).
+    a, b = 0, 1
+    k = 0
+    for bit in bin(n)[2:]:
+        c = a * (2*b - a)
+        d = a*a + b*b
+        if mod:
+            c, d = c % mod, d % mod
+        a, b = (d, c + d) if bit == '1' else (c, d)
+        if mod:
+            b %= mod
+        k = 2*k + (bit == '1')
+        yield bit, k, a, b
+    return a, b
+
+def drain(gen):
+    # Run a step generator to the end; its return value
+    while True:
+        try:
+            next(gen)
+        except StopIteration as stop:
+            return stop.value
+
+def fibonacci(n, mod=None):
+    # O(log n) multiplications and O(1) numbers held, instead of a list of all n values
+    if n < 0:
+        raise ValueError('n must be non-negative.')
+    f = drain(fib_doubling(n, mod))[0]
+    return f % mod if mod else f
+
+def _mulmod(p, q, coefficients, mod):
+    # p * q reduced modulo x^k - c1 x^(k-1) - ... - ck (polynomials as coefficient lists)
+    k = len(coefficients)
+    prod = [0]*(2*k - 1)
+    for i, a in enumerate(p):
+        if a:
+            for j, b in enumerate(q):
+                prod[i+j] += a * b
+    for d in range(2*k - 2, k - 1, -1):
+        top = prod[d]
+        if top:
+            for j, c in enumerate(coefficients, 1):
+                prod[d-j] += top * c
+    out = prod[:k]
+    return [x % mod for x in out] if mod else out
+
+def _mulx(p, coefficients, mod):
+    # p * x, reduced the same way
+    k = len(coefficients)
+    top = p[-1]
+    out = [0] + p[:-1]
+    for j, c in enumerate(coefficients, 1):
+        out[k-j] += top * c
+    return [x % mod for x in out] if mod else out
+
+def kitamasa(coefficients, n, mod=None):
+    # x^n mod the characteristic polynomial by square-and-multiply over the bits of n.
+    # Yields (bit, m, x^m mod P) after each bit; returns x^n's coefficients.
+    poly = [1] + [0]*(len(coefficients) - 1)
+    m = 0
+    for bit in bin(n)[2:]:
+        poly = _mulmod(poly, poly, coefficients, mod)
+        if bit == '1':
+            poly = _mulx(poly, coefficients, mod)
+        m = 2*m + (bit == '1')
+        yield bit, m, poly
+    return poly
+
+def recurrence_steps(coefficients, n, mod=None):
+    # The step generator linear_recurrence runs for a(n), or None when n < k needs no
+    # work: Fibonacci doubling on n - 1 for (1, 1) recurrences, Kitamasa otherwise
+    if n < len(coefficients):
+        return None
+    if tuple(coefficients) == (1, 1):
+        return fib_doubling(n - 1, mod)
+    return kitamasa(coefficients, n, mod)
+
+def combine(coefficients, initial, n, mod, solved):
+    # a(n) from what recurrence_steps' generator returned: a(n) = a(0) F(n-1) + a(1) F(n)
+    # from (F(n-1), F(n)), or x^n's coefficients against the initial values
+    if tuple(coefficients) == (1, 1):
+        f, g = solved
+        value = initial[0] * f + initial[1] * g
+    else:
+        value = sum(p * a for p, a in zip(solved, initial))
+    return value % mod if mod else value
+
+@functools.lru_cache(maxsize=RECURRENCE_CACHE_SIZE)
+def linear_recurrence(coefficients, initial, n, mod=None):
+    # a(n) for a(i) = c1 a(i-1) + ... + ck a(i-k), given a(0..k-1) = initial, in
+    # O(k^2 log n); tuples, so repeated queries come from the cache
+    k = len(coefficients)
+    if k == 0 or len(initial) != k:
+        raise ValueError('Need k >= 1 coefficients and k initial values.')
+    if n < 0:
+        raise ValueError('n must be non-negative.')
+    gen = recurrence_steps(coefficients, n, mod)
+    if gen is None:
+        return initial[n] % mod if mod else initial[n]
+    return combine(coefficients, initial, n, mod, drain(gen))
 
 def knapsack(weights, values, capacity):
-    n = len(weights)
-    dp = [[0]*(capacity+1) for _ in range(n+1)]
-    for i in range(1, n+1):
-        for w in range(capacity+1):
-            if weights[i-1] <= w:
-                dp[i][w] = max(dp[i-1][w], values[i-1] + dp[i-1][w-weights[i-1]])
-            else:
-                dp[i][w] = dp[i-1][w]
-    return dp[n][capacity] 
\ No newline at end of file
+    # One rolling row: dp[w] is the best value with capacity w using the items seen so far.
+    # Iterating w downwards keeps dp[w-weight] at its value from the previous item.
+    dp = [0]*(capacity+1)
+    for weight, value in zip(weights, values):
+        for w in range(capacity, weight-1, -1):
+            if value + dp[w-weight] > dp[w]:
+                dp[w] = value + dp[w-weight]
+    return dp[capacity] 
\ No newline at end of file
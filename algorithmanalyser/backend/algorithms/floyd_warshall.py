@@ -1,3 +1,5 @@
+import numpy as np
+
 def floyd_warshall(graph):
     # graph: adjacency matrix, graph[i][j] = weight or float('inf')
     n = len(graph)
@@ -7,4 +9,11 @@ def floyd_warshall(graph):
             for j in range(n):
                 if dist[i][j] > dist[i][k] + dist[k][j]:
                     dist[i][j] = dist[i][k] + dist[k][j]
-    return dist 
\ No newline at end of file
+    return dist
+
+def floyd_warshall_numpy(graph):
+    # Same result as floyd_warshall, one broadcast np.minimum per intermediate node k
+    dist = np.array(graph, dtype=float)
+    for k in range(len(dist)):
+        np.minimum(dist, dist[:, k, None] + dist[None, k, :], out=dist)
+    return dist.tolist()
@@ -1,3 +1,15 @@
+from bisect import bisect_right
+
+class UnsortedInput(ValueError):
+    # args: (message, index of the first interval out of order); plain args so it
+    # survives the trip back from a worker process
+    @property
+    def index(self):
+        return self.args[1]
+
+    def __str__(self):
+        return self.args[0]
+
 def activity_selection(activities):
     # activities: list of (start, end) tuples
     activities.sort(key=lambda x: x[1])
@@ -7,4 +19,42 @@ def activity_selection(activities):
         if start >= last_end:
             selected.append((start, end))
             last_end = end
-    return selected 
\ No newline at end of file
+    return selected
+
+def activity_selection_sorted(intervals):
+    # intervals: any iterable of (start, end) already ordered by end, e.g. a file or
+    # feed read lazily. Yields the selected intervals in one pass, holding only the
+    # last end; raises UnsortedInput as soon as an end goes backwards.
+    last_end = -float('inf')
+    prev_end = None
+    for index, (start, end) in enumerate(intervals):
+        if prev_end is not None and end < prev_end:
+            raise UnsortedInput(f'Intervals must be sorted by end: interval {index} ends at {end}, before {prev_end}.', index)
+        prev_end = end
+        if start >= last_end:
+            last_end = end
+            yield start, end
+
+def weighted_interval_scheduling(intervals):
+    # intervals: list of (start, end, weight). Maximum total weight of pairwise
+    # compatible intervals (end <= next start), O(n log n): sort by end, then
+    # best[j] = max(best[j-1], weight_j + best[p(j)]) where p(j), the number of
+    # intervals ending by start_j, is a bisect over the sorted ends.
+    # Returns (total weight, chosen intervals ordered by end).
+    order = sorted(intervals, key=lambda x: x[1])
+    ends = [end for _, end, _ in order]
+    best = [0]*(len(order)+1)
+    for j, (start, end, weight) in enumerate(order):
+        take = weight + best[bisect_right(ends, start, 0, j)]
+        best[j+1] = take if take > best[j] else best[j]
+    chosen = []
+    j = len(order)
+    while j > 0:
+        if best[j] == best[j-1]:
+            j -= 1
+        else:
+            start, end, weight = order[j-1]
+            chosen.append((start, end, weight))
+            j = bisect_right(ends, start, 0, j-1)
+    chosen.reverse()
+    return best[-1], chosen
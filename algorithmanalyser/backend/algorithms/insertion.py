@@ -0,0 +1,12 @@
+def insertion_sort(arr, lo=0, hi=None):
+    # Sorts arr[lo:hi] in place; also the small-run cutoff of introsort and merge_sort_bottom_up
+    if hi is None:
+        hi = len(arr)
+    for i in range(lo + 1, hi):
+        x = arr[i]
+        j = i - 1
+        while j >= lo and x < arr[j]:
+            arr[j + 1] = arr[j]
+            j -= 1
+        arr[j + 1] = x
+    return arr
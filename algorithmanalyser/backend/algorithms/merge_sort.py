@@ -1,3 +1,5 @@
+from .insertion import insertion_sort
+
 def merge_sort(arr):
     if len(arr) > 1:
         mid = len(arr) // 2
@@ -22,4 +24,43 @@ def merge_sort(arr):
             arr[k] = R[j]
             j += 1
             k += 1
-    return arr 
\ No newline at end of file
+    return arr
+
+
+# Runs of this length are insertion-sorted before the first merge pass
+RUN_SIZE = 32
+
+def _merge_into(src, dst, lo, mid, hi):
+    # Stable merge of src[lo:mid] and src[mid:hi] into dst[lo:hi]
+    i, j, k = lo, mid, lo
+    while i < mid and j < hi:
+        if src[j] < src[i]:
+            dst[k] = src[j]
+            j += 1
+        else:
+            dst[k] = src[i]
+            i += 1
+        k += 1
+    if i < mid:
+        dst[k:hi] = src[i:mid]
+    else:
+        dst[k:hi] = src[j:hi]
+
+def merge_sort_bottom_up(arr):
+    # In place, no recursion: insertion-sort runs of RUN_SIZE, then merge runs of
+    # doubling width back and forth between arr and one preallocated buffer
+    n = len(arr)
+    for lo in range(0, n, RUN_SIZE):
+        insertion_sort(arr, lo, min(lo + RUN_SIZE, n))
+    src, dst = arr, arr[:]
+    width = RUN_SIZE
+    while width < n:
+        for lo in range(0, n, 2 * width):
+            mid = min(lo + width, n)
+            hi = min(lo + 2 * width, n)
+            _merge_into(src, dst, lo, mid, hi)
+        src, dst = dst, src
+        width *= 2
+    if src is not arr:
+        arr[:] = src
+    return arr
@@ -1,3 +1,5 @@
+from .insertion import insertion_sort
+
 def quick_sort(arr):
     if len(arr) <= 1:
         return arr
@@ -5,4 +7,100 @@ def quick_sort(arr):
     left = [x for x in arr if x < pivot]
     middle = [x for x in arr if x == pivot]
     right = [x for x in arr if x > pivot]
-    return quick_sort(left) + middle + quick_sort(right) 
\ No newline at end of file
+    return quick_sort(left) + middle + quick_sort(right)
+
+
+# Segments this short are finished by insertion sort
+INSERTION_CUTOFF = 16
+# Above this length the pivot is Tukey's ninther instead of a median of three
+NINTHER_THRESHOLD = 40
+
+def _sift_down(arr, lo, root, size):
+    # Max-heap over arr[lo:lo+size], heap indices relative to lo
+    x = arr[lo + root]
+    while True:
+        child = 2 * root + 1
+        if child >= size:
+            break
+        if child + 1 < size and arr[lo + child] < arr[lo + child + 1]:
+            child += 1
+        if not x < arr[lo + child]:
+            break
+        arr[lo + root] = arr[lo + child]
+        root = child
+    arr[lo + root] = x
+
+def heap_sort(arr, lo=0, hi=None):
+    # Sorts arr[lo:hi] in place
+    if hi is None:
+        hi = len(arr)
+    size = hi - lo
+    for root in range(size // 2 - 1, -1, -1):
+        _sift_down(arr, lo, root, size)
+    for end in range(size - 1, 0, -1):
+        arr[lo], arr[lo + end] = arr[lo + end], arr[lo]
+        _sift_down(arr, lo, 0, end)
+    return arr
+
+def _median_of_three(a, b, c):
+    if a < b:
+        if b < c:
+            return b
+        return c if a < c else a
+    if a < c:
+        return a
+    return c if b < c else b
+
+def _choose_pivot(arr, lo, hi):
+    mid = (lo + hi) // 2
+    if hi - lo <= NINTHER_THRESHOLD:
+        return _median_of_three(arr[lo], arr[mid], arr[hi - 1])
+    s = (hi - lo) // 8
+    return _median_of_three(
+        _median_of_three(arr[lo], arr[lo + s], arr[lo + 2 * s]),
+        _median_of_three(arr[mid - s], arr[mid], arr[mid + s]),
+        _median_of_three(arr[hi - 1 - 2 * s], arr[hi - 1 - s], arr[hi - 1]),
+    )
+
+def _partition3(arr, lo, hi, pivot):
+    # Dutch national flag: arr[lo:lt] < pivot, arr[lt:gt] == pivot, arr[gt:hi] > pivot
+    lt, i, gt = lo, lo, hi
+    while i < gt:
+        x = arr[i]
+        if x < pivot:
+            arr[i] = arr[lt]
+            arr[lt] = x
+            lt += 1
+            i += 1
+        elif pivot < x:
+            gt -= 1
+            arr[i] = arr[gt]
+            arr[gt] = x
+        else:
+            i += 1
+    return lt, gt
+
+def introsort(arr):
+    # In place. 3-way quicksort on an explicit stack: the larger side is pushed and
+    # the smaller one continued, so the stack stays O(log n). A segment that is still
+    # being partitioned after 2*log2(n) levels is heap-sorted instead, and short
+    # segments are left to insertion sort.
+    n = len(arr)
+    stack = [(0, n, 2 * n.bit_length())]
+    while stack:
+        lo, hi, depth = stack.pop()
+        while hi - lo > INSERTION_CUTOFF:
+            if depth == 0:
+                heap_sort(arr, lo, hi)
+                break
+            depth -= 1
+            lt, gt = _partition3(arr, lo, hi, _choose_pivot(arr, lo, hi))
+            if lt - lo < hi - gt:
+                stack.append((gt, hi, depth))
+                hi = lt
+            else:
+                stack.append((lo, lt, depth))
+                lo = gt
+        else:
+            insertion_sort(arr, lo, hi)
+    return arr
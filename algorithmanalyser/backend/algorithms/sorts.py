@@ -0,0 +1,22 @@
+# Sorting algorithms by name: the teaching versions next to the production ones
+# (in place, no recursion, insertion sort for short runs).
+from .insertion import insertion_sort
+from .merge_sort import merge_sort, merge_sort_bottom_up
+from .quick_sort import heap_sort, introsort, quick_sort
+from .selection import selection_sort
+
+SORTS = {
+    'merge_sort': merge_sort,
+    'quick_sort': quick_sort,
+    'selection_sort': selection_sort,
+    'insertion_sort': insertion_sort,
+    'heap_sort': heap_sort,
+    'introsort': introsort,
+    'merge_sort_bottom_up': merge_sort_bottom_up,
+}
+
+def get_sort(name):
+    try:
+        return SORTS[name]
+    except KeyError:
+        raise ValueError(f"Unknown sort {name!r}; expected one of {', '.join(SORTS)}.") from None
@@ -0,0 +1,334 @@
+# Empirical complexity benchmarks for backend/algorithms.
+#
+# Every algorithm is run on generated inputs of growing size and several shapes
+# (random, sorted, reversed, few-unique). Wall time (the median of several runs, and
+# their spread) and peak traced memory are recorded, the time curve is fitted against
+# the usual complexity classes, and the results are stored as a JSON baseline under
+# baselines/. Timings only compare on the host that made them, so baselines are not
+# committed: save one before a change and check against it after, on the same machine.
+#
+#   python benchmark.py                   # run and print
+#   python benchmark.py --save before     # write baselines/before.json
+#   python benchmark.py --check before    # exit 1 if anything got slower than the baseline
+#   python benchmark.py --ops             # also record comparison/write counts per point
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from algorithms.counting import count_ops
+from algorithms.dp import fibonacci, knapsack, linear_recurrence
+from algorithms.floyd_warshall import floyd_warshall, floyd_warshall_numpy
+from algorithms.greedy import activity_selection, activity_selection_sorted, weighted_interval_scheduling
+from algorithms.insertion import insertion_sort
+from algorithms.merge_sort import merge_sort, merge_sort_bottom_up
+from algorithms.quick_sort import heap_sort, introsort, quick_sort
+from algorithms.selection import selection_sort
+from algorithms.topo_sort import topological_sort
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+SHAPES = ('random', 'sorted', 'reversed', 'few_unique')
+DEFAULT_REPEAT = 7
+# A curve regresses when its median time ratio to the baseline is over this, plus the
+# relative spread both runs measured (see compare). On a shared 1-vCPU VM unchanged
+# code drifted by up to 1.8x, unevenly across algorithms, between runs half an hour
+# apart, so the default only catches large slowdowns; on a quiet machine
+# --tolerance 1.25 is usable.
+DEFAULT_TOLERANCE = 2.0
+# Relative run-to-run noise assumed even when the repeats happened to agree
+MIN_SPREAD = 0.05
+# Times a flagged curve is timed again before it counts as a regression
+CONFIRM_ROUNDS = 2
+
+COMPLEXITY_CLASSES = {
+    'O(1)': lambda n: 1.0,
+    'O(log n)': lambda n: math.log2(n + 1),
+    'O(n)': lambda n: float(n),
+    'O(n log n)': lambda n: n * math.log2(n + 1),
+    'O(n^2)': lambda n: float(n) ** 2,
+    'O(n^3)': lambda n: float(n) ** 3,
+}
+# Polynomial degree of each class; n vs n log n is too close to call from timings,
+# so the regression gate only compares degrees
+DEGREE = {'O(1)': 0, 'O(log n)': 0, 'O(n)': 1, 'O(n log n)': 1, 'O(n^2)': 2, 'O(n^3)': 3}
+
+def make_array(n, shape, rng):
+    if shape == 'few_unique':
+        return [rng.randrange(4) for _ in range(n)]
+    arr = [rng.randrange(n * 10 + 1) for _ in range(n)]
+    if shape == 'sorted':
+        arr.sort()
+    elif shape == 'reversed':
+        arr.sort(reverse=True)
+    return arr
+
+def make_intervals(n, shape, rng):
+    starts = make_array(n, shape, rng)
+    return [(s, s + 1 + rng.randrange(20)) for s in starts]
+
+def make_sorted_intervals(n, shape, rng):
+    return sorted(make_intervals(n, shape, rng), key=lambda x: x[1])
+
+def make_weighted_intervals(n, shape, rng):
+    return [(s, e, rng.randrange(1, 100)) for s, e in make_intervals(n, shape, rng)]
+
+def make_knapsack(n, shape, rng):
+    weights = [w % 50 + 1 for w in make_array(n, shape, rng)]
+    values = [v % 100 + 1 for v in make_array(n, 'random', rng)]
+    return weights, values, 5 * n
+
+def make_graph(n, shape, rng):
+    inf = float('inf')
+    graph = [[0 if i == j else inf for j in range(n)] for i in range(n)]
+    for i in range(n):
+        for _ in range(4):
+            j = rng.randrange(n)
+            if j != i:
+                graph[i][j] = rng.randrange(1, 100)
+    return graph
+
+def make_dag(n, shape, rng):
+    # Edges only go from lower to higher labels; sorted/reversed control the insertion order
+    nodes = list(range(n))
+    if shape == 'reversed':
+        nodes.reverse()
+    elif shape != 'sorted':
+        rng.shuffle(nodes)
+    return {u: [rng.randrange(u + 1, n) for _ in range(3)] if u < n - 1 else [] for u in nodes}
+
+# name -> (function, build(size, shape, rng) -> args tuple, sizes, shapes)
+CASES = {
+    'merge_sort': (merge_sort, lambda n, s, r: (make_array(n, s, r),), [500, 1000, 2000, 4000, 8000, 16000], SHAPES),
+    'quick_sort': (quick_sort, lambda n, s, r: (make_array(n, s, r),), [500, 1000, 2000, 4000, 8000, 16000], SHAPES),
+    'selection_sort': (selection_sort, lambda n, s, r: (make_array(n, s, r),), [100, 200, 400, 800, 1600], SHAPES),
+    'insertion_sort': (insertion_sort, lambda n, s, r: (make_array(n, s, r),), [100, 200, 400, 800, 1600], SHAPES),
+    'heap_sort': (heap_sort, lambda n, s, r: (make_array(n, s, r),), [500, 1000, 2000, 4000, 8000, 16000], SHAPES),
+    'introsort': (introsort, lambda n, s, r: (make_array(n, s, r),), [500, 1000, 2000, 4000, 8000, 16000], SHAPES),
+    'merge_sort_bottom_up': (merge_sort_bottom_up, lambda n, s, r: (make_array(n, s, r),), [500, 1000, 2000, 4000, 8000, 16000], SHAPES),
+    'knapsack': (knapsack, make_knapsack, [20, 40, 80, 160, 320], ('random',)),
+    'fibonacci': (fibonacci, lambda n, s, r: (n,), [1000, 2000, 4000, 8000, 16000], ('random',)),
+    # Uncached, so every run solves
+    'linear_recurrence': (linear_recurrence.__wrapped__, lambda n, s, r: ((1, 2, 3), (1, 1, 1), n * 1000, 10**9 + 7), [1000, 2000, 4000, 8000, 16000], ('random',)),
+    'floyd_warshall': (floyd_warshall, lambda n, s, r: (make_graph(n, s, r),), [10, 20, 40, 80], ('random',)),
+    'floyd_warshall_numpy': (floyd_warshall_numpy, lambda n, s, r: (make_graph(n, s, r),), [50, 100, 200, 400], ('random',)),
+    'topological_sort': (topological_sort, lambda n, s, r: (make_dag(n, s, r),), [100, 200, 400, 800], ('random', 'sorted', 'reversed')),
+    'activity_selection': (activity_selection, lambda n, s, r: (make_intervals(n, s, r),), [1000, 2000, 4000, 8000, 16000], SHAPES),
+    'activity_selection_sorted': (lambda xs: list(activity_selection_sorted(xs)), lambda n, s, r: (make_sorted_intervals(n, s, r),), [1000, 2000, 4000, 8000, 16000], SHAPES),
+    'weighted_interval_scheduling': (weighted_interval_scheduling, lambda n, s, r: (make_weighted_intervals(n, s, r),), [1000, 2000, 4000, 8000, 16000], SHAPES),
+}
+
+# Cases whose first argument is a sequence that algorithms.counting can instrument
+COUNTABLE = {
+    'merge_sort', 'quick_sort', 'selection_sort', 'insertion_sort', 'heap_sort',
+    'introsort', 'merge_sort_bottom_up', 'activity_selection',
+}
+
+def _fresh(args):
+    # Algorithms may sort or fill their input in place, so every run gets its own copy
+    return tuple(arg[:] if isinstance(arg, list) else dict(arg) if isinstance(arg, dict) else arg for arg in args)
+
+def measure(func, args, repeat=DEFAULT_REPEAT):
+    # (median seconds, relative spread: interquartile range / median, peak bytes), after
+    # one untimed warm-up run
+    func(*_fresh(args))
+    times = []
+    for _ in range(max(1, repeat)):
+        run_args = _fresh(args)
+        start = time.perf_counter()
+        func(*run_args)
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times)
+    low, _, high = statistics.quantiles(times, n=4) if len(times) > 1 else (median, None, median)
+    run_args = _fresh(args)
+    tracemalloc.start()
+    try:
+        func(*run_args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return median, (high - low) / median if median > 0 else 0.0, peak
+
+def _reference_work():
+    a = [(i * 7919) % 1000 for i in range(20000)]
+    a.sort()
+    return a
+
+def calibrate(repeat=DEFAULT_REPEAT):
+    # Median seconds of a fixed pure-Python workload, timed next to each curve so
+    # compare can factor out the host running faster or slower than when the baseline
+    # was taken (see host_speed)
+    times = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        _reference_work()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def fit_complexity(sizes, times):
+    # Least-squares t ~ c * f(n) for every class; the smallest relative error wins
+    best_name, best_err, best_c = None, float('inf'), 0.0
+    for name, f in COMPLEXITY_CLASSES.items():
+        fs = [f(n) for n in sizes]
+        c = sum(t * x for t, x in zip(times, fs)) / sum(x * x for x in fs)
+        err = sum(((t - c * x) / t) ** 2 for t, x in zip(times, fs) if t > 0)
+        if err < best_err:
+            best_name, best_err, best_c = name, err, c
+    return {'class': best_name, 'coefficient': best_c, 'error': best_err}
+
+def run(names=None, scale=1.0, seed=0, repeat=DEFAULT_REPEAT, ops=False, shapes=None):
+    results = {}
+    only_shapes = shapes
+    for name, (func, build, sizes, shapes) in CASES.items():
+        if names and name not in names:
+            continue
+        sizes = sorted({max(2, int(n * scale)) for n in sizes})
+        results[name] = {}
+        for shape in shapes:
+            if only_shapes and shape not in only_shapes:
+                continue
+            calibration = calibrate(repeat)
+            points = []
+            for n in sizes:
+                args = build(n, shape, random.Random(f'{seed}:{name}:{shape}:{n}'))
+                seconds, spread, peak = measure(func, args, repeat)
+                point = {'n': n, 'seconds': seconds, 'spread': spread, 'peak_bytes': peak}
+                if ops and name in COUNTABLE:
+                    point['ops'] = count_ops(func, *_fresh(args))[1]
+                points.append(point)
+            fit = fit_complexity([p['n'] for p in points], [p['seconds'] for p in points])
+            results[name][shape] = {'points': points, 'fit': fit, 'calibration': calibration}
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'host': host(),
+        'scale': scale,
+        'repeat': repeat,
+        'results': results,
+    }
+
+def host():
+    # Where the timings were taken; they only compare against the same host
+    return {'node': platform.node(), 'machine': platform.machine(),
+            'processor': platform.processor(), 'cpus': os.cpu_count()}
+
+def baseline_path(name):
+    return os.path.join(BASELINE_DIR, f'{name}.json')
+
+def save_baseline(report, name):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    with open(baseline_path(name), 'w') as f:
+        json.dump(report, f, indent=2)
+
+def load_baseline(name):
+    with open(baseline_path(name)) as f:
+        return json.load(f)
+
+def host_speed(report, baseline):
+    # How much slower this run's host was than the baseline's: the median over the
+    # curves of the calibration workload's time ratio (one curve's is too noisy)
+    ratios = [cur['calibration'] / base['calibration']
+              for name, shapes in report['results'].items() for shape, cur in shapes.items()
+              for base in [baseline['results'].get(name, {}).get(shape)]
+              if base and base.get('calibration') and cur.get('calibration')]
+    return statistics.median(ratios) if ratios else 1.0
+
+def _curve_ratios(current, base, tolerance, speed=1.0):
+    # (per-size time ratios to the baseline over the host speed ratio, their median,
+    # the limit it is held to), or None with no sizes in common
+    base_points = {p['n']: p for p in base['points']}
+    pairs = [(p, base_points[p['n']]) for p in current['points']
+             if p['n'] in base_points and base_points[p['n']]['seconds'] > 0]
+    if not pairs:
+        return None
+    ratios = {p['n']: p['seconds'] / ref['seconds'] / speed for p, ref in pairs}
+    limit = (tolerance + max(MIN_SPREAD, statistics.median(p.get('spread', 0) for p, _ in pairs))
+             + max(MIN_SPREAD, statistics.median(ref.get('spread', 0) for _, ref in pairs)))
+    return ratios, statistics.median(ratios.values()), limit
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    # Regressions, per algorithm and shape: the median over the curve's sizes of the
+    # time ratio to the baseline is over the limit -- tolerance plus the relative spread
+    # of both runs (their medians over the curve, at least MIN_SPREAD each) -- so one
+    # noisy size does not trip it; or the fitted class moved to a higher polynomial
+    # degree and the largest size is over the limit too (a fit that flips between close
+    # classes with no slowdown is noise).
+    regressions = []
+    speed = host_speed(report, baseline)
+    for name, shapes in report['results'].items():
+        for shape, current in shapes.items():
+            base = baseline['results'].get(name, {}).get(shape)
+            if base is None:
+                continue
+            curve = _curve_ratios(current, base, tolerance, speed)
+            if curve is None:
+                continue
+            ratios, ratio, limit = curve
+            largest = max(ratios)
+            if ratio > limit:
+                regressions.append({
+                    'algorithm': name, 'shape': shape, 'ratio': ratio, 'limit': limit,
+                    'points': {n: round(r, 3) for n, r in ratios.items()},
+                })
+            elif DEGREE[current['fit']['class']] > DEGREE[base['fit']['class']] and ratios[largest] > limit:
+                regressions.append({
+                    'algorithm': name, 'shape': shape, 'n': largest, 'ratio': ratios[largest], 'limit': limit,
+                    'baseline_class': base['fit']['class'], 'class': current['fit']['class'],
+                })
+    return regressions
+
+def confirm(report, baseline, tolerance=DEFAULT_TOLERANCE, repeat=DEFAULT_REPEAT, rounds=CONFIRM_ROUNDS, seed=0):
+    # compare(), after timing each flagged curve again up to `rounds` times and keeping
+    # the run closest to the baseline: a slowdown that does not reproduce was the host
+    speed = host_speed(report, baseline)
+    for _ in range(rounds):
+        regressions = compare(report, baseline, tolerance)
+        if not regressions:
+            break
+        for r in regressions:
+            name, shape = r['algorithm'], r['shape']
+            base = baseline['results'][name][shape]
+            kept = report['results'][name][shape]
+            again = run([name], report['scale'], seed, repeat, shapes=[shape])['results'][name][shape]
+            if _curve_ratios(again, base, tolerance, speed)[1] < _curve_ratios(kept, base, tolerance, speed)[1]:
+                report['results'][name][shape] = again
+    return compare(report, baseline, tolerance)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark backend/algorithms.')
+    parser.add_argument('--only', nargs='*', help='algorithms to run (default: all)')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every input size')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='timed runs per point (the median is kept)')
+    parser.add_argument('--save', metavar='NAME', help='store the report as baselines/NAME.json')
+    parser.add_argument('--check', metavar='NAME', help='compare against baselines/NAME.json')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--ops', action='store_true', help='count comparisons/writes of the sequence algorithms')
+    args = parser.parse_args(argv)
+
+    report = run(args.only, args.scale, repeat=args.repeat, ops=args.ops)
+    for name, shapes in report['results'].items():
+        for shape, res in shapes.items():
+            last = res['points'][-1]
+            print(f"{name:22} {shape:10} {res['fit']['class']:11} n={last['n']:<6} "
+                  f"{last['seconds']*1000:9.2f} ms  peak {last['peak_bytes']/1024:9.1f} KiB"
+                  + (f"  {last['ops']['comparisons']} cmp {last['ops']['writes']} writes" if 'ops' in last else ''))
+    if args.save:
+        save_baseline(report, args.save)
+    if args.check:
+        baseline = load_baseline(args.check)
+        if baseline.get('host') != report['host']:
+            print(f"warning: baseline {args.check!r} was taken on another host ({baseline.get('host') or baseline.get('platform')}); timings may not compare")
+        regressions = confirm(report, baseline, args.tolerance, args.repeat)
+        for r in regressions:
+            print('REGRESSION', json.dumps(r))
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())